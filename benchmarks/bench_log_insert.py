@@ -0,0 +1,100 @@
+"""
+日志写入基准测试 - 对比 ORM 写入与 Core 批量写入的吞吐量（行/秒）
+
+用法（在项目根目录执行）：
+    python benchmarks/bench_log_insert.py --rows 20000 --batch 200
+
+在临时目录中创建独立数据库，不影响 data/data.db。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _message_row(i: int):
+    return {
+        "group_id": str(100000 + i % 50),
+        "user_id": str(200000 + i % 500),
+        "user_name": f"用户{i % 500}",
+        "message_type": "group",
+        "message_content": f"这是第 {i} 条测试消息 benchmark message",
+        "raw_message": f"这是第 {i} 条测试消息 benchmark message",
+        "timestamp": datetime.now()
+    }
+
+
+async def bench_orm_per_row(rows: int) -> float:
+    """原有路径：每条消息一个 ORM 对象、一次提交"""
+    from modules.log.service import LogService
+
+    start = time.perf_counter()
+    for i in range(rows):
+        row = _message_row(i)
+        await LogService.add_message_log(
+            row["group_id"], row["user_id"], row["user_name"],
+            row["message_type"], row["message_content"], row["raw_message"]
+        )
+    return time.perf_counter() - start
+
+
+async def bench_orm_batched(rows: int, batch: int) -> float:
+    """ORM 批量：每批 add_all 后提交一次"""
+    from core.database import get_db_session
+    from modules.log.models import MessageLog
+
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        async with get_db_session() as session:
+            session.add_all([MessageLog(**_message_row(i)) for i in range(offset, min(rows, offset + batch))])
+            await session.commit()
+    return time.perf_counter() - start
+
+
+async def bench_core_bulk(rows: int, batch: int) -> float:
+    """Core 批量：add_message_logs_bulk（insert + executemany）"""
+    from modules.log.service import LogService
+
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        await LogService.add_message_logs_bulk([_message_row(i) for i in range(offset, min(rows, offset + batch))])
+    return time.perf_counter() - start
+
+
+async def main(args):
+    from core.database import init_database, close_database
+
+    await init_database()
+    try:
+        results = []
+        per_row = min(args.rows, args.per_row_rows)
+        results.append(("ORM 逐条提交", per_row, await bench_orm_per_row(per_row)))
+        results.append((f"ORM 批量 ({args.batch}/批)", args.rows, await bench_orm_batched(args.rows, args.batch)))
+        results.append((f"Core 批量 ({args.batch}/批)", args.rows, await bench_core_bulk(args.rows, args.batch)))
+    finally:
+        await close_database()
+
+    print()
+    print(f"{'写入方式':<24}{'行数':>10}{'耗时(秒)':>12}{'行/秒':>14}")
+    for name, count, elapsed in results:
+        print(f"{name:<24}{count:>10}{elapsed:>12.3f}{count / elapsed:>14.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="日志写入基准测试")
+    parser.add_argument("--rows", type=int, default=20000, help="批量写入的行数")
+    parser.add_argument("--batch", type=int, default=200, help="每批行数")
+    parser.add_argument("--per-row-rows", type=int, default=1000, help="逐条提交测试的行数（较慢）")
+    args = parser.parse_args()
+
+    # 在临时目录中运行，init_database 会在当前目录下创建 data/data.db
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        asyncio.run(main(args))
@@ -0,0 +1,187 @@
+"""
+插件拦截基准测试 - 对比每个事件的插件拦截开销
+
+- none:    不拦截（基线）
+- legacy:  原实现：全局 on_message 规则中遍历调用栈的 f_locals 查找 Matcher
+- current: core.plugin_interceptor 的 run_preprocessor，按 matcher.plugin 查内存索引
+
+用法（在项目根目录执行）：
+    python benchmarks/bench_plugin_gating.py --plugins 50 --disabled 10 --events 500
+
+每种方式在独立子进程中运行（NoneBot 的处理器注册是全局的），插件为临时生成的空处理插件。
+“执行插件数/事件”用于核对拦截是否生效：应为 插件数 - 禁用数。
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODES = ("none", "legacy", "current")
+
+# 每个插件处理一次事件计一次
+RUNS = 0
+
+PLUGIN_TEMPLATE = '''
+from nonebot import on_message
+from nonebot.plugin import PluginMetadata
+
+__plugin_meta__ = PluginMetadata(name="{name}", description="", usage="", extra={{"plugin_name": "{name}"}})
+
+matcher = on_message(priority=10, block=False)
+
+
+@matcher.handle()
+async def _():
+    import __main__
+    __main__.RUNS += 1
+'''
+
+
+def write_plugins(directory: Path, count: int):
+    for i in range(count):
+        package = directory / f"bench_plugin_{i}"
+        package.mkdir()
+        (package / "__init__.py").write_text(PLUGIN_TEMPLATE.format(name=f"bench_plugin_{i}"), encoding="utf-8")
+
+
+def install_legacy_interceptor():
+    """原实现（已移除）：规则中遍历调用栈查找 Matcher 实例"""
+    import inspect
+    from nonebot import on_message
+    from nonebot.adapters.onebot.v11 import MessageEvent
+    from nonebot.matcher import Matcher
+    from nonebot.message import event_preprocessor
+    from nonebot.plugin import get_loaded_plugins
+    from nonebot.rule import Rule
+    from modules.plugin.enablement import plugin_enablement
+
+    plugin_matcher_map = {}
+    for plugin in get_loaded_plugins():
+        for matcher in plugin.matcher:
+            plugin_matcher_map[id(matcher)] = plugin.name
+
+    @event_preprocessor
+    async def intercept_plugins(event: MessageEvent):
+        disabled_plugins = await plugin_enablement.disabled_plugins(str(event.group_id))
+        if disabled_plugins:
+            setattr(event, '_disabled_plugins', disabled_plugins)
+
+    async def check_plugin_enabled(event: MessageEvent) -> bool:
+        disabled_plugins = getattr(event, '_disabled_plugins', None)
+        if not disabled_plugins:
+            return True
+        frame = inspect.currentframe()
+        while frame:
+            for var_name, var_value in frame.f_locals.items():
+                if isinstance(var_value, Matcher):
+                    plugin_name = plugin_matcher_map.get(id(var_value))
+                    if plugin_name and plugin_name in disabled_plugins:
+                        return False
+            frame = frame.f_back
+        return True
+
+    global_interceptor = on_message(rule=Rule(check_plugin_enabled), priority=1, block=False)
+
+    @global_interceptor.handle()
+    async def handle_global_intercept():
+        pass
+
+
+def make_event(i: int):
+    from nonebot.adapters.onebot.v11 import GroupMessageEvent, Message
+    from nonebot.adapters.onebot.v11.event import Sender
+
+    return GroupMessageEvent(
+        time=int(time.time()), self_id=1, post_type="message", sub_type="normal", user_id=10000 + i % 100,
+        message_type="group", message_id=i, message=Message("hello"), original_message=Message("hello"),
+        raw_message="hello", font=0, sender=Sender(user_id=10000 + i % 100, nickname="bench", card=""),
+        group_id=123456, to_me=False
+    )
+
+
+async def run_mode(args):
+    import nonebot
+    from nonebot.adapters.onebot.v11 import Adapter, Bot
+    from nonebot.message import handle_event
+
+    nonebot.init(driver="~fastapi", log_level="WARNING")
+    driver = nonebot.get_driver()
+    driver.register_adapter(Adapter)
+
+    # 插件目录需位于当前目录下（子进程已切换到临时目录）
+    plugin_dir = Path("bench_plugins")
+    plugin_dir.mkdir()
+    write_plugins(plugin_dir, args.plugins)
+    sys.path.insert(0, os.getcwd())
+    nonebot.load_plugins(str(plugin_dir))
+
+    # 全局禁用前 N 个插件（写入临时数据库后加载索引）
+    from core.database import init_database
+    from modules.plugin.enablement import plugin_enablement
+    from modules.plugin.service import PluginService
+    await init_database()
+    await PluginService.register_plugins([
+        {"plugin_name": f"bench_plugin_{i}", "is_global_enabled": i >= args.disabled} for i in range(args.plugins)
+    ])
+    await plugin_enablement.load()
+
+    if args.mode == "legacy":
+        install_legacy_interceptor()
+    elif args.mode == "current":
+        from core.plugin_interceptor import plugin_interceptor  # noqa: F401
+
+    bot = Bot(Adapter(driver), "1")
+    events = [make_event(i) for i in range(args.events)]
+
+    for event in events[:50]:
+        await handle_event(bot, event)
+
+    global RUNS
+    RUNS = 0
+    start = time.perf_counter()
+    for event in events:
+        await handle_event(bot, event)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.mode},{elapsed / args.events * 1e6:.1f},{RUNS / args.events:.1f}")
+
+
+def main(args):
+    results = {}
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--plugins", str(args.plugins),
+             "--disabled", str(args.disabled), "--events", str(args.events)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        _, per_event, runs = output.split(",")
+        results[mode] = (float(per_event), float(runs))
+
+    baseline = results["none"][0]
+    print()
+    print(f"插件 {args.plugins} 个（全局禁用 {args.disabled} 个），事件 {args.events} 条")
+    print(f"{'方式':<10}{'微秒/事件':>12}{'拦截开销':>12}{'执行插件数/事件':>18}")
+    for mode in MODES:
+        per_event, runs = results[mode]
+        print(f"{mode:<10}{per_event:>12.1f}{per_event - baseline:>12.1f}{runs:>18.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="插件拦截基准测试")
+    parser.add_argument("--plugins", type=int, default=50, help="加载的插件数")
+    parser.add_argument("--disabled", type=int, default=10, help="全局禁用的插件数")
+    parser.add_argument("--events", type=int, default=500, help="处理的事件数")
+    parser.add_argument("--child", choices=MODES, dest="mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        sys.path.insert(0, str(ROOT))
+        os.chdir(tempfile.mkdtemp())
+        asyncio.run(run_mode(args))
+    else:
+        main(args)
@@ -0,0 +1,107 @@
+"""
+活动时间跟踪 - 在内存中合并群组/用户/成员的最后活动时间，定期批量写回
+"""
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from sqlalchemy import update, bindparam
+
+from core.database import get_db_session
+from core.flusher import PeriodicFlusher
+from modules.group.models import Group, GroupUser
+from modules.user.models import UserProfile
+
+DEFAULT_TRACKER_CONFIG = {
+    "flush_interval": 5  # 写回间隔（秒）
+}
+
+_groups = Group.__table__
+_members = GroupUser.__table__
+_users = UserProfile.__table__
+
+_GROUP_UPDATE = (
+    update(_groups)
+    .where(_groups.c.group_id == bindparam("b_group_id"))
+    .values(last_active=bindparam("b_time"))
+)
+_USER_UPDATE = (
+    update(_users)
+    .where(_users.c.user_id == bindparam("b_user_id"))
+    .values(last_active=bindparam("b_time"))
+)
+_MEMBER_UPDATE = (
+    update(_members)
+    .where(_members.c.group_id == bindparam("b_group_id"), _members.c.user_id == bindparam("b_user_id"))
+    .values(last_speak=bindparam("b_time"))
+)
+
+
+class ActivityTracker(PeriodicFlusher):
+    def __init__(self):
+        super().__init__("活动时间跟踪", DEFAULT_TRACKER_CONFIG["flush_interval"])
+        # 脏数据：只保留每个对象最新的时间
+        self._groups: Dict[str, datetime] = {}
+        self._users: Dict[str, datetime] = {}
+        self._members: Dict[Tuple[str, str], datetime] = {}
+        self.flushed_rows = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        config = {**DEFAULT_TRACKER_CONFIG, **(config or {})}
+        self.interval = max(0.1, float(config["flush_interval"]))
+
+    def touch_group(self, group_id: str, when: datetime = None):
+        self._groups[group_id] = when or datetime.now()
+        self.ensure_started()
+
+    def touch_user(self, user_id: str, when: datetime = None):
+        self._users[user_id] = when or datetime.now()
+        self.ensure_started()
+
+    def touch_member(self, group_id: str, user_id: str, when: datetime = None):
+        self._members[(group_id, user_id)] = when or datetime.now()
+        self.ensure_started()
+
+    def pending_count(self) -> int:
+        return len(self._groups) + len(self._users) + len(self._members)
+
+    async def flush(self):
+        """一次事务内批量写回所有待更新的活动时间"""
+        if not self.pending_count():
+            return
+
+        groups, self._groups = self._groups, {}
+        users, self._users = self._users, {}
+        members, self._members = self._members, {}
+
+        async with get_db_session() as session:
+            try:
+                if groups:
+                    await session.execute(_GROUP_UPDATE, [
+                        {"b_group_id": group_id, "b_time": when} for group_id, when in groups.items()
+                    ])
+                if users:
+                    await session.execute(_USER_UPDATE, [
+                        {"b_user_id": user_id, "b_time": when} for user_id, when in users.items()
+                    ])
+                if members:
+                    await session.execute(_MEMBER_UPDATE, [
+                        {"b_group_id": group_id, "b_user_id": user_id, "b_time": when}
+                        for (group_id, user_id), when in members.items()
+                    ])
+                await session.commit()
+                self.flushed_rows += len(groups) + len(users) + len(members)
+            except Exception:
+                await session.rollback()
+                # 写回失败时放回内存，下次刷新重试（不覆盖更新的时间）
+                for group_id, when in groups.items():
+                    self._groups.setdefault(group_id, when)
+                for user_id, when in users.items():
+                    self._users.setdefault(user_id, when)
+                for key, when in members.items():
+                    self._members.setdefault(key, when)
+                raise
+
+
+# 全局实例
+activity_tracker = ActivityTracker()
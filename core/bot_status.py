@@ -0,0 +1,112 @@
+"""
+机器人状态 - 内存中保存当前状态，修改后异步写入 bot_status 表
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+
+from core.database import get_db_session
+from modules.system.models import BotStatus
+
+STATUS_FIELDS = ("is_running", "start_time", "last_restart", "total_messages", "active_groups", "active_users")
+
+
+class BotStatusStore:
+    """状态以内存为准，读取不访问数据库；每次修改后在后台写回一次，关闭时调用 stop() 写回剩余修改"""
+
+    def __init__(self):
+        self.is_running = False
+        self.start_time: Optional[datetime] = None
+        self.last_restart: Optional[datetime] = None
+        self.total_messages = 0
+        self.active_groups = 0
+        self.active_users = 0
+
+        self._row_id: Optional[int] = None
+        self._dirty = False
+        self._persist_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        """启动时读取最近一次保存的状态（表由 init_database 创建）"""
+        async with get_db_session() as session:
+            result = await session.execute(select(BotStatus).order_by(BotStatus.id.desc()).limit(1))
+            row = result.scalar_one_or_none()
+
+        if row:
+            self._row_id = row.id
+            for field in STATUS_FIELDS:
+                setattr(self, field, getattr(row, field))
+            # 进程刚启动，机器人尚未运行
+            self.is_running = False
+            self.total_messages = self.total_messages or 0
+            self.active_groups = self.active_groups or 0
+            self.active_users = self.active_users or 0
+
+    def update(self, **kwargs):
+        """修改状态并安排后台写回"""
+        for key, value in kwargs.items():
+            if key in STATUS_FIELDS:
+                setattr(self, key, value)
+
+        # 运行状态变化时记录启动/停止时间
+        if "is_running" in kwargs:
+            now = datetime.now()
+            if kwargs["is_running"]:
+                self.start_time = kwargs.get("start_time") or now
+            else:
+                self.last_restart = kwargs.get("last_restart") or now
+
+        self._dirty = True
+        if self._persist_task is None or self._persist_task.done():
+            self._persist_task = asyncio.create_task(self._persist())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "is_running": self.is_running,
+            "start_time": self.start_time.isoformat() if self.start_time else None,
+            "last_restart": self.last_restart.isoformat() if self.last_restart else None,
+            "total_messages": self.total_messages,
+            "active_groups": self.active_groups,
+            "active_users": self.active_users
+        }
+
+    async def _persist(self):
+        """后台写回，失败时保留修改，下次修改或关闭时重试"""
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"❌ 机器人状态写回失败: {e}")
+
+    async def stop(self):
+        """等待后台写回结束，并写回剩余修改（关闭时调用）"""
+        if self._persist_task and not self._persist_task.done():
+            await self._persist_task
+        self._persist_task = None
+        await self._persist()
+
+    async def flush(self):
+        """写回当前状态；写回期间又有修改时继续写，直到与内存一致"""
+        async with self._lock:
+            await self._flush_dirty()
+
+    async def _flush_dirty(self):
+        while self._dirty:
+            self._dirty = False
+            values = {field: getattr(self, field) for field in STATUS_FIELDS}
+            async with get_db_session() as session:
+                try:
+                    row = await session.get(BotStatus, self._row_id) if self._row_id else None
+                    if row is None:
+                        row = BotStatus()
+                        session.add(row)
+                    for field, value in values.items():
+                        setattr(row, field, value)
+                    await session.commit()
+                    self._row_id = row.id
+                except Exception:
+                    await session.rollback()
+                    self._dirty = True
+                    raise
@@ -0,0 +1,45 @@
+"""
+运行配置读取 - 为各子系统提供 bot_config.json 中的配置段
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CONFIG_FILE = Path("config/bot_config.json")
+
+# 配置文件缓存，避免每个子系统重复读取磁盘
+_config_cache: Optional[Dict[str, Any]] = None
+
+
+def load_app_config() -> Dict[str, Any]:
+    """读取配置文件（带缓存）"""
+    global _config_cache
+
+    if _config_cache is None:
+        try:
+            if CONFIG_FILE.exists():
+                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    _config_cache = json.load(f)
+            else:
+                _config_cache = {}
+        except Exception as e:
+            print(f"⚠️ 读取配置文件失败: {e}")
+            _config_cache = {}
+
+    return _config_cache
+
+
+def reload_app_config() -> Dict[str, Any]:
+    """丢弃缓存并重新读取配置文件"""
+    global _config_cache
+    _config_cache = None
+    return load_app_config()
+
+
+def get_config_section(name: str, defaults: Dict[str, Any] = None) -> Dict[str, Any]:
+    """获取配置段，缺失的键使用默认值补齐"""
+    section = dict(defaults or {})
+    value = load_app_config().get(name)
+    if isinstance(value, dict):
+        section.update(value)
+    return section
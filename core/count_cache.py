@@ -0,0 +1,163 @@
+"""
+分页总数统计 - 缓存 COUNT 结果，写入后自动失效
+
+- 带过滤条件的查询：按 SQL 和参数缓存精确总数，相关表有写入提交后失效
+  （stale_seconds > 0 时，统计后 stale_seconds 秒内即使有写入也继续使用，总数最多滞后这么久）
+- 无过滤条件的查询：使用维护中的表行数计数器（INSERT/DELETE 提交时增减）
+- include_total=False 时完全跳过统计
+"""
+import re
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Table, event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from core.config import get_config_section
+
+DEFAULT_COUNT_CONFIG = {
+    "max_entries": 512,  # 精确总数缓存条目上限
+    "stale_seconds": 0  # 精确总数统计后的最长可用时间（秒），期间有写入也不重新统计；0 表示写入后立即失效
+}
+
+# 写语句的目标表：INSERT [OR x] INTO t / REPLACE INTO t / UPDATE [OR x] t / DELETE FROM t
+_WRITE_PATTERN = re.compile(
+    r"^\s*(INSERT|REPLACE|UPDATE|DELETE)\s+(?:OR\s+\w+\s+)?(?:INTO\s+|FROM\s+)?[\"`\[]?(\w+)",
+    re.IGNORECASE
+)
+_PENDING_KEY = "count_cache_pending"
+_UNKNOWN = None  # 行数变化无法确定（如 UPSERT），计数器需要重新统计
+
+
+class CountCache:
+    def __init__(self):
+        self.max_entries = DEFAULT_COUNT_CONFIG["max_entries"]
+        self.stale_seconds = DEFAULT_COUNT_CONFIG["stale_seconds"]
+        # 每张表的写入版本号，提交后递增
+        self._generations: Dict[str, int] = defaultdict(int)
+        # 精确总数：(表名, SQL, 参数) -> (总数, 版本号, 缓存时间)
+        self._entries: "OrderedDict[Tuple, Tuple[int, int, float]]" = OrderedDict()
+        # 表行数计数器
+        self._row_counts: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        if config is None:
+            config = get_config_section("count_cache", DEFAULT_COUNT_CONFIG)
+        else:
+            config = {**DEFAULT_COUNT_CONFIG, **config}
+        self.max_entries = max(1, int(config["max_entries"]))
+        self.stale_seconds = max(0.0, float(config["stale_seconds"]))
+
+    def install(self, engine):
+        """在引擎上注册写入监听"""
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(sync_engine, "commit", self._on_commit)
+        event.listen(sync_engine, "rollback", self._on_rollback)
+
+    # ---- 写入监听 ----
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        match = _WRITE_PATTERN.match(statement)
+        if not match:
+            return
+        verb, table = match.group(1).upper(), match.group(2)
+
+        if verb == "UPDATE":
+            delta = 0
+        elif verb == "REPLACE" or "ON CONFLICT" in statement.upper() or cursor.rowcount < 0:
+            delta = _UNKNOWN
+        else:
+            delta = cursor.rowcount if verb == "INSERT" else -cursor.rowcount
+
+        # 行数变化在提交时才生效，回滚则丢弃
+        pending = conn.info.setdefault(_PENDING_KEY, {})
+        if delta is _UNKNOWN or (table in pending and pending[table] is _UNKNOWN):
+            pending[table] = _UNKNOWN
+        else:
+            pending[table] = pending.get(table, 0) + delta
+
+    def _on_commit(self, conn):
+        pending = conn.info.pop(_PENDING_KEY, None)
+        if not pending:
+            return
+        for table, delta in pending.items():
+            self._generations[table] += 1
+            if delta is _UNKNOWN:
+                self._row_counts.pop(table, None)
+            elif table in self._row_counts:
+                self._row_counts[table] = max(0, self._row_counts[table] + delta)
+
+    def _on_rollback(self, conn):
+        conn.info.pop(_PENDING_KEY, None)
+
+    # ---- 查询 ----
+
+    async def table_rows(self, session: AsyncSession, table: Table) -> int:
+        """表的总行数（首次统计后由计数器维护）"""
+        name = table.name
+        if name in self._row_counts:
+            self.hits += 1
+            return self._row_counts[name]
+
+        self.misses += 1
+        generation = self._generations[name]
+        total = (await session.execute(select(func.count()).select_from(table))).scalar_one()
+        # 统计期间有写入提交时不保存，避免记下过期的行数
+        if self._generations[name] == generation:
+            self._row_counts[name] = total
+        return total
+
+    async def count(self, session: AsyncSession, query: Select, include_total: bool = True) -> Optional[int]:
+        """统计分页查询的总数；include_total=False 时返回 None"""
+        if not include_total:
+            return None
+
+        froms = query.get_final_froms()
+        if len(froms) != 1 or not isinstance(froms[0], Table):
+            return (await session.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+
+        table = froms[0]
+        if query.whereclause is None:
+            return await self.table_rows(session, table)
+
+        compiled = query.compile()
+        key = (table.name, str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+        generation = self._generations[table.name]
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            total, entry_generation, cached_at = entry
+            # 未失效，或虽已失效但距统计时间不超过 stale_seconds
+            if entry_generation == generation or time.monotonic() - cached_at < self.stale_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return total
+
+        self.misses += 1
+        total = (await session.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+        if self._generations[table.name] == generation:
+            self._entries[key] = (total, generation, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return total
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "entries": len(self._entries),
+            "row_counters": dict(self._row_counts),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# 全局实例
+count_cache = CountCache()
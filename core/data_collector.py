@@ -11,6 +11,12 @@ from nonebot.adapters.onebot.v11 import (
 from modules.log.service import LogService
 from modules.user.service import UserService
 from modules.group.service import GroupService
+from core.message_writer import message_log_writer
+from core.entity_registry import entity_registry
+from core.activity_tracker import activity_tracker
+from core.message_counter import message_counter
+from core.database import unit_of_work
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import asyncio
 
@@ -99,12 +105,19 @@ class DataCollector:
 
             print(f"👋 成员离开: 用户{user_id} 离开群 {group_id}")
 
-            # 记录系统日志
-            await LogService.add_system_log(
-                "INFO",
-                f"用户 {user_id} 离开群 {group_id}",
-                "data_collector"
-            )
+            async with unit_of_work() as session:
+                # 移除成员关系，同时递减群组成员数量
+                await GroupService.remove_group_user(group_id, user_id, session)
+
+                # 记录系统日志
+                await LogService.add_system_log(
+                    "INFO",
+                    f"用户 {user_id} 离开群 {group_id}",
+                    "data_collector",
+                    session=session
+                )
+
+            entity_registry.remove_member(group_id, user_id)
 
         except Exception as e:
             print(f"❌ 处理群成员减少失败: {e}")
@@ -117,17 +130,28 @@ class DataCollector:
 
             print(f"💬 处理群组消息: 群{group_id} 用户{user_id}")
 
-            # 1. 首先确保群组存在
-            await self.ensure_group_exists(group_id, event)
+            # 1~3 在同一个工作单元中完成，整个事件只提交一次
+            async with unit_of_work() as session:
+                # 1. 首先确保群组存在
+                await self.ensure_group_exists(group_id, event, session)
+
+                # 2. 确保用户存在
+                await self.ensure_user_exists(user_id, event, session)
+
+                # 3. 确保群组成员关系存在
+                await self.ensure_group_member_exists(group_id, user_id, event, session)
 
-            # 2. 确保用户存在
-            await self.ensure_user_exists(user_id, event)
+            # 事务提交成功后登记为已知实体
+            entity_registry.add_group(group_id)
+            entity_registry.add_user(user_id)
+            entity_registry.add_member(group_id, user_id)
 
-            # 3. 确保群组成员关系存在
-            await self.ensure_group_member_exists(group_id, user_id, event)
+            # 4. 更新最后活动时间和消息计数（内存合并，定期批量写回）
+            self.update_last_activity(group_id, user_id, event)
+            message_counter.count_group_message(group_id, user_id)
 
-            # 4. 保存消息日志
-            success = await LogService.add_message_log(
+            # 5. 保存消息日志（放入写入队列，批量落库）
+            success = message_log_writer.enqueue(
                 group_id=group_id,
                 user_id=user_id,
                 user_name=event.sender.card or event.sender.nickname or f"用户{user_id}",
@@ -137,12 +161,9 @@ class DataCollector:
             )
 
             if success:
-                print("✅ 消息日志保存成功")
+                print("✅ 消息日志已加入写入队列")
             else:
-                print("❌ 消息日志保存失败")
-
-            # 5. 更新最后活动时间
-            await self.update_last_activity(group_id, user_id, event)
+                print("❌ 消息日志写入队列已满，消息被丢弃")
 
             print(f"✅ 群组消息处理完成: 用户{user_id} 在群{group_id}")
 
@@ -151,20 +172,21 @@ class DataCollector:
             import traceback
             traceback.print_exc()
 
-    async def ensure_group_exists(self, group_id: str, event: GroupMessageEvent):
+    async def ensure_group_exists(self, group_id: str, event: GroupMessageEvent, session: AsyncSession = None):
         """确保群组存在"""
         try:
             from modules.group.service import GroupService
 
-            # 检查群组是否已存在
-            existing_group = await GroupService.get_group(group_id)
+            # 检查群组是否已存在（已知群组无需查询数据库）
+            existing_group = entity_registry.has_group(group_id) or await GroupService.get_group(group_id, session)
             if not existing_group:
                 # 群组不存在，创建新群组
                 group_name = event.sender.card or f"群{group_id}"
                 await GroupService.update_group_info(
                     group_id=group_id,
                     group_name=group_name,
-                    last_active=datetime.now()
+                    last_active=datetime.now(),
+                    session=session
                 )
                 print(f"✅ 创建新群组: {group_name}({group_id})")
 
@@ -172,27 +194,23 @@ class DataCollector:
                 await LogService.add_system_log(
                     "INFO",
                     f"创建新群组: {group_name}({group_id})",
-                    "data_collector"
-                )
-            else:
-                # 群组已存在，更新最后活动时间
-                await GroupService.update_group_info(
-                    group_id=group_id,
-                    last_active=datetime.now()
+                    "data_collector",
+                    session=session
                 )
+            # 群组已存在时，最后活动时间由 update_last_activity 合并写回
 
         except Exception as e:
             print(f"❌ 确保群组存在失败: {e}")
             raise
 
-    async def ensure_user_exists(self, user_id: str, event: GroupMessageEvent):
+    async def ensure_user_exists(self, user_id: str, event: GroupMessageEvent, session: AsyncSession = None):
         """确保用户存在"""
         try:
             from modules.user.service import UserService
 
-            # 检查用户是否已存在
-            user_detail = await UserService.get_user_detail(user_id)
-            if not user_detail:
+            # 检查用户是否已存在（已知用户无需查询数据库）
+            existing_user = entity_registry.has_user(user_id) or await UserService.get_user(user_id, session)
+            if not existing_user:
                 # 用户不存在，创建新用户
                 username = event.sender.nickname or f"用户{user_id}"
                 nickname = event.sender.card or ""
@@ -201,7 +219,8 @@ class DataCollector:
                     user_id=user_id,
                     username=username,
                     nickname=nickname,
-                    last_active=datetime.now()
+                    last_active=datetime.now(),
+                    session=session
                 )
                 print(f"✅ 创建新用户: {username}({user_id})")
 
@@ -209,33 +228,26 @@ class DataCollector:
                 await LogService.add_system_log(
                     "INFO",
                     f"创建新用户: {username}({user_id})",
-                    "data_collector"
-                )
-            else:
-                # 用户已存在，更新最后活动时间
-                await UserService.update_user_profile(
-                    user_id=user_id,
-                    last_active=datetime.now()
+                    "data_collector",
+                    session=session
                 )
+            # 用户已存在时，最后活动时间由 update_last_activity 合并写回
 
         except Exception as e:
             print(f"❌ 确保用户存在失败: {e}")
             raise
 
-    async def ensure_group_member_exists(self, group_id: str, user_id: str, event: GroupMessageEvent):
+    async def ensure_group_member_exists(self, group_id: str, user_id: str, event: GroupMessageEvent,
+                                         session: AsyncSession = None):
         """确保群组成员关系存在"""
         try:
             from modules.group.service import GroupService
 
-            # 检查群组成员是否已存在
-            group_users = await GroupService.get_group_users(group_id, page_size=1000)
-            existing_member = None
-
-            if group_users and 'users' in group_users:
-                for user in group_users['users']:
-                    if user['user_id'] == user_id:
-                        existing_member = user
-                        break
+            # 检查群组成员是否已存在（已知成员无需查询数据库）
+            existing_member = (
+                entity_registry.has_member(group_id, user_id)
+                or await GroupService.get_group_user(group_id, user_id, session)
+            )
 
             if not existing_member:
                 # 群组成员不存在，创建新成员
@@ -249,7 +261,8 @@ class DataCollector:
                     user_card=user_card,
                     join_time=datetime.now(),
                     last_speak=datetime.now(),
-                    message_count=1  # 第一条消息
+                    message_count=0,  # 本条消息由消息计数聚合统一累加
+                    session=session
                 )
                 print(f"✅ 创建新群组成员: {user_name}({user_id}) 在群 {group_id}")
 
@@ -257,90 +270,78 @@ class DataCollector:
                 await LogService.add_system_log(
                     "INFO",
                     f"创建新群组成员: {user_name}({user_id}) 在群 {group_id}",
-                    "data_collector"
+                    "data_collector",
+                    session=session
                 )
-            else:
-                # 群组成员已存在，更新最后发言时间和消息计数
-                await GroupService.update_group_user(
-                    group_id=group_id,
-                    user_id=user_id,
-                    last_speak=datetime.now()
-                )
-                # 注意：message_count 会在 GroupService 中自动增加
+            # 群组成员已存在时，最后发言时间和消息计数都在内存中合并后批量写回
 
         except Exception as e:
             print(f"❌ 确保群组成员存在失败: {e}")
             raise
 
-    async def update_last_activity(self, group_id: str, user_id: str, event: GroupMessageEvent):
-        """更新最后活动时间"""
-        try:
-            # 更新群组最后活动时间
-            from modules.group.service import GroupService
-            await GroupService.update_group_info(
-                group_id=group_id,
-                last_active=datetime.now()
-            )
-
-            # 更新用户最后活动时间
-            from modules.user.service import UserService
-            await UserService.update_user_profile(
-                user_id=user_id,
-                last_active=datetime.now()
-            )
-
-            print(f"✅ 更新活动时间: 群{group_id} 用户{user_id}")
-
-        except Exception as e:
-            print(f"❌ 更新活动时间失败: {e}")
+    def update_last_activity(self, group_id: str, user_id: str, event: GroupMessageEvent):
+        """更新最后活动时间 - 只记录到内存，由活动时间跟踪器定期批量写回"""
+        now = datetime.now()
+        activity_tracker.touch_group(group_id, now)
+        activity_tracker.touch_user(user_id, now)
+        activity_tracker.touch_member(group_id, user_id, now)
 
     async def register_user_and_group_member(self, group_id: str, user_id: str, default_name: str = None):
         """注册用户和群组成员（用于成员加入事件）"""
         try:
-            # 确保群组存在
             from modules.group.service import GroupService
-            existing_group = await GroupService.get_group(group_id)
-            if not existing_group:
-                await GroupService.update_group_info(
-                    group_id=group_id,
-                    group_name=f"群{group_id}",
-                    last_active=datetime.now()
-                )
-                print(f"✅ 自动创建群组: {group_id}")
-
-            # 确保用户存在
             from modules.user.service import UserService
-            user_detail = await UserService.get_user_detail(user_id)
-            if not user_detail:
-                user_name = default_name or f"用户{user_id}"
-                await UserService.update_user_profile(
-                    user_id=user_id,
-                    username=user_name,
-                    last_active=datetime.now()
-                )
-                print(f"✅ 自动创建用户: {user_name}({user_id})")
-
-            # 确保群组成员关系存在
-            group_users = await GroupService.get_group_users(group_id, page_size=1000)
-            existing_member = None
 
-            if group_users and 'users' in group_users:
-                for user in group_users['users']:
-                    if user['user_id'] == user_id:
-                        existing_member = user
-                        break
-
-            if not existing_member:
-                user_name = default_name or f"用户{user_id}"
-                await GroupService.update_group_user(
-                    group_id=group_id,
-                    user_id=user_id,
-                    user_name=user_name,
-                    join_time=datetime.now(),
-                    last_speak=datetime.now(),
-                    message_count=0
+            async with unit_of_work() as session:
+                # 确保群组存在
+                existing_group = (
+                    entity_registry.has_group(group_id)
+                    or await GroupService.get_group(group_id, session)
                 )
-                print(f"✅ 自动创建群组成员: {user_name}({user_id}) 在群 {group_id}")
+                if not existing_group:
+                    await GroupService.update_group_info(
+                        group_id=group_id,
+                        group_name=f"群{group_id}",
+                        last_active=datetime.now(),
+                        session=session
+                    )
+                    print(f"✅ 自动创建群组: {group_id}")
+
+                # 确保用户存在
+                existing_user = entity_registry.has_user(user_id) or await UserService.get_user(user_id, session)
+                if not existing_user:
+                    user_name = default_name or f"用户{user_id}"
+                    await UserService.update_user_profile(
+                        user_id=user_id,
+                        username=user_name,
+                        last_active=datetime.now(),
+                        session=session
+                    )
+                    print(f"✅ 自动创建用户: {user_name}({user_id})")
+
+                # 确保群组成员关系存在
+                existing_member = (
+                    entity_registry.has_member(group_id, user_id)
+                    or await GroupService.get_group_user(group_id, user_id, session)
+                )
+
+                if not existing_member:
+                    user_name = default_name or f"用户{user_id}"
+                    await GroupService.update_group_user(
+                        group_id=group_id,
+                        user_id=user_id,
+                        user_name=user_name,
+                        join_time=datetime.now(),
+                        last_speak=datetime.now(),
+                        message_count=0,
+                        session=session
+                    )
+                    print(f"✅ 自动创建群组成员: {user_name}({user_id}) 在群 {group_id}")
+
+            # 事务提交成功后登记为已知实体
+            entity_registry.add_group(group_id)
+            entity_registry.add_user(user_id)
+            entity_registry.add_member(group_id, user_id)
 
         except Exception as e:
             print(f"❌ 注册用户和群组成员失败: {e}")
@@ -352,20 +353,29 @@ class DataCollector:
 
             print(f"💬 处理私聊消息: 用户{user_id}")
 
-            # 确保用户存在
             from modules.user.service import UserService
-            user_detail = await UserService.get_user_detail(user_id)
-            if not user_detail:
-                username = event.sender.nickname or f"用户{user_id}"
-                await UserService.update_user_profile(
-                    user_id=user_id,
-                    username=username,
-                    last_active=datetime.now()
-                )
-                print(f"✅ 私聊创建新用户: {username}({user_id})")
 
-            # 保存消息日志
-            success = await LogService.add_message_log(
+            async with unit_of_work() as session:
+                # 确保用户存在
+                existing_user = entity_registry.has_user(user_id) or await UserService.get_user(user_id, session)
+                if not existing_user:
+                    username = event.sender.nickname or f"用户{user_id}"
+                    await UserService.update_user_profile(
+                        user_id=user_id,
+                        username=username,
+                        last_active=datetime.now(),
+                        session=session
+                    )
+                    print(f"✅ 私聊创建新用户: {username}({user_id})")
+
+            entity_registry.add_user(user_id)
+
+            # 更新用户最后活动时间和消息计数（内存合并，定期批量写回）
+            activity_tracker.touch_user(user_id)
+            message_counter.count_private_message(user_id)
+
+            # 保存消息日志（放入写入队列，批量落库）
+            success = message_log_writer.enqueue(
                 group_id="private",
                 user_id=user_id,
                 user_name=event.sender.nickname or f"用户{user_id}",
@@ -375,15 +385,9 @@ class DataCollector:
             )
 
             if success:
-                print("✅ 私聊消息日志保存成功")
+                print("✅ 私聊消息日志已加入写入队列")
             else:
-                print("❌ 私聊消息日志保存失败")
-
-            # 更新用户最后活动时间
-            await UserService.update_user_profile(
-                user_id=user_id,
-                last_active=datetime.now()
-            )
+                print("❌ 消息日志写入队列已满，私聊消息被丢弃")
 
             print(f"✅ 私聊消息处理完成: 用户{user_id}")
 
@@ -1,7 +1,15 @@
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
 import os
 
+from core.config import get_config_section
+from core.count_cache import count_cache
+from core.query_metrics import query_metrics
+from core.startup import startup_timer
+
 # 必须在导入任何模型之前创建Base
 Base = declarative_base()
 
@@ -9,6 +17,68 @@ Base = declarative_base()
 main_engine = None
 main_async_session = None
 
+# SQLite 连接参数（每个新连接都会应用），可在 bot_config.json 的 database 段覆盖
+DEFAULT_DATABASE_CONFIG = {
+    "journal_mode": "WAL",  # 读写并发：读不阻塞写
+    "synchronous": "NORMAL",  # WAL 模式下的推荐值
+    "mmap_size": 268435456,  # 内存映射大小（字节）
+    "cache_size": -65536,  # 页缓存，负数表示 KiB
+    "temp_store": "MEMORY",  # 临时表/排序放在内存
+    "busy_timeout": 5000,  # 锁等待时间（毫秒）
+    "wal_autocheckpoint": 1000  # 自动检查点间隔（页）
+}
+
+_PRAGMA_CHOICES = {
+    "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+
+def _build_pragmas(config: Dict[str, Any]) -> Dict[str, Any]:
+    """校验配置并生成 PRAGMA 列表，非法值回退默认值"""
+    pragmas = {}
+    for name, default in DEFAULT_DATABASE_CONFIG.items():
+        value = config.get(name, default)
+        try:
+            if name in _PRAGMA_CHOICES:
+                value = str(value).upper()
+                if value not in _PRAGMA_CHOICES[name]:
+                    raise ValueError(value)
+            else:
+                value = int(value)
+        except (TypeError, ValueError):
+            print(f"⚠️ 数据库配置 {name}={config.get(name)!r} 无效，使用默认值 {default}")
+            value = default
+        pragmas[name] = value
+    return pragmas
+
+
+def _install_pragmas(engine, pragmas: Dict[str, Any]):
+    """在每个新建的连接上应用 PRAGMA"""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+async def _report_pragmas(engine):
+    """输出连接上实际生效的参数"""
+    async with engine.connect() as conn:
+        effective = {}
+        for name in DEFAULT_DATABASE_CONFIG:
+            value = (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+            # synchronous / temp_store 返回的是数字，换回名称便于阅读
+            if name in ("synchronous", "temp_store") and isinstance(value, int):
+                value = _PRAGMA_CHOICES[name][value]
+            effective[name] = value
+    print("✅ SQLite 参数: " + ", ".join(f"{name}={value}" for name, value in effective.items()))
+
 
 async def init_database():
     """初始化数据库"""
@@ -24,6 +94,15 @@ async def init_database():
             echo=False,  # 关闭 SQL 调试日志
             future=True
         )
+        _install_pragmas(main_engine, _build_pragmas(get_config_section("database", DEFAULT_DATABASE_CONFIG)))
+        count_cache.configure()
+        count_cache.install(main_engine)
+        query_metrics.configure()
+        query_metrics.install(main_engine)
+
+        # 全文检索用到的 SQL 函数（bigram 模式的触发器依赖）
+        from modules.log.search import register_functions
+        event.listen(main_engine.sync_engine, "connect", register_functions)
         main_async_session = async_sessionmaker(
             main_engine, class_=AsyncSession, expire_on_commit=False
         )
@@ -52,10 +131,18 @@ async def init_database():
         print("所有模型导入完成")
 
         # 创建所有表（现在都在一个数据库中）
-        async with main_engine.begin() as conn:
-            print("创建所有数据库表...")
-            await conn.run_sync(Base.metadata.create_all)
-            print("✅ 所有数据库表创建完成")
+        with startup_timer.phase("创建数据库表"):
+            async with main_engine.begin() as conn:
+                print("创建所有数据库表...")
+                await conn.run_sync(Base.metadata.create_all)
+                print("✅ 所有数据库表创建完成")
+
+        # 已有数据库的结构升级（索引、约束等）
+        from core.migrations import run_migrations
+        with startup_timer.phase("数据库迁移"):
+            await run_migrations(main_engine)
+
+        await _report_pragmas(main_engine)
 
         print("✅ 数据库初始化完成")
 
@@ -85,6 +172,28 @@ def get_db_session() -> AsyncSession:
     return main_async_session()
 
 
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """工作单元 - 一个事件（或一批事件）的全部写入共用一个会话，结束时统一提交，出错时整体回滚"""
+    async with get_db_session() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+@asynccontextmanager
+async def use_session(session: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """加入调用方的会话；未传入会话时开启独立的工作单元"""
+    if session is not None:
+        yield session
+    else:
+        async with unit_of_work() as new_session:
+            yield new_session
+
+
 # 为了兼容性，保留 get_log_session，但返回同一个会话
 def get_log_session() -> AsyncSession:
     """获取日志数据库会话（现在与主数据库相同）"""
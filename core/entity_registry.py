@@ -0,0 +1,57 @@
+"""
+已知实体注册表 - 在内存中记录已入库的群组、用户和群成员关系
+"""
+from typing import Set, Tuple
+
+from sqlalchemy import select
+
+from core.database import get_db_session
+from modules.group.models import Group, GroupUser
+from modules.user.models import UserProfile
+
+
+class EntityRegistry:
+    def __init__(self):
+        self.groups: Set[str] = set()
+        self.users: Set[str] = set()
+        self.members: Set[Tuple[str, str]] = set()
+        self.loaded = False
+
+    async def load(self):
+        """从数据库预加载所有已知实体"""
+        async with get_db_session() as session:
+            groups = await session.execute(select(Group.group_id))
+            users = await session.execute(select(UserProfile.user_id))
+            members = await session.execute(select(GroupUser.group_id, GroupUser.user_id))
+
+            self.groups = set(groups.scalars().all())
+            self.users = set(users.scalars().all())
+            self.members = {(group_id, user_id) for group_id, user_id in members.all()}
+
+        self.loaded = True
+        print(f"✅ 实体注册表已加载: 群组 {len(self.groups)} 个, 用户 {len(self.users)} 个, 成员关系 {len(self.members)} 条")
+
+    def has_group(self, group_id: str) -> bool:
+        return group_id in self.groups
+
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self.users
+
+    def has_member(self, group_id: str, user_id: str) -> bool:
+        return (group_id, user_id) in self.members
+
+    def add_group(self, group_id: str):
+        self.groups.add(group_id)
+
+    def add_user(self, user_id: str):
+        self.users.add(user_id)
+
+    def add_member(self, group_id: str, user_id: str):
+        self.members.add((group_id, user_id))
+
+    def remove_member(self, group_id: str, user_id: str):
+        self.members.discard((group_id, user_id))
+
+
+# 全局实例
+entity_registry = EntityRegistry()
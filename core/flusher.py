@@ -0,0 +1,65 @@
+"""
+周期性刷新任务 - 内存中累积的数据按固定间隔批量写回数据库
+"""
+import asyncio
+from typing import List, Optional
+
+# 所有刷新任务，关闭时统一写回
+_flushers: List["PeriodicFlusher"] = []
+
+
+class PeriodicFlusher:
+    """周期性刷新任务基类，子类实现 flush()"""
+
+    # 关闭时是否再执行一次刷新
+    flush_on_stop = True
+
+    def __init__(self, name: str, interval: float):
+        self.name = name
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        _flushers.append(self)
+
+    def ensure_started(self):
+        """启动后台刷新任务（已启动时忽略）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                # 刷新过程不随任务取消而中断，避免丢失已取出的数据
+                await asyncio.shield(self.flush_now())
+        except asyncio.CancelledError:
+            pass
+
+    async def flush_now(self):
+        """执行一次刷新，同一时间只允许一个刷新进行"""
+        async with self._lock:
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ {self.name} 刷新失败: {e}")
+
+    async def flush(self):
+        raise NotImplementedError
+
+    async def stop(self):
+        """停止后台任务并写回剩余数据"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self.flush_on_stop:
+            await self.flush_now()
+
+
+async def stop_all_flushers():
+    """停止所有刷新任务（关闭时调用）"""
+    for flusher in list(_flushers):
+        await flusher.stop()
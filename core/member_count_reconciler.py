@@ -0,0 +1,34 @@
+"""
+群组成员数量校正 - 定期按 group_users 实际数据批量修正 Group.current_users 的偏差
+"""
+from typing import Any, Dict
+
+from core.flusher import PeriodicFlusher
+from modules.group.service import GroupService
+
+DEFAULT_RECONCILER_CONFIG = {
+    "reconcile_interval": 3600  # 校正间隔（秒）
+}
+
+
+class MemberCountReconciler(PeriodicFlusher):
+    # 成员数量随事件增量维护，关闭时无需校正
+    flush_on_stop = False
+
+    def __init__(self):
+        super().__init__("群组成员数量校正", DEFAULT_RECONCILER_CONFIG["reconcile_interval"])
+        self.last_fixed = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        config = {**DEFAULT_RECONCILER_CONFIG, **(config or {})}
+        self.interval = max(1.0, float(config["reconcile_interval"]))
+
+    async def flush(self):
+        self.last_fixed = await GroupService.reconcile_member_counts()
+        if self.last_fixed:
+            print(f"🔧 已校正 {self.last_fixed} 个群组的成员数量")
+
+
+# 全局实例
+member_count_reconciler = MemberCountReconciler()
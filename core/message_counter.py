@@ -0,0 +1,90 @@
+"""
+消息计数聚合 - 在内存中累积成员/用户的消息增量，定期以原子自增批量写回
+"""
+from collections import defaultdict
+from typing import Any, Dict, Tuple
+
+from sqlalchemy import update, bindparam, func
+
+from core.database import get_db_session
+from core.flusher import PeriodicFlusher
+from modules.group.models import GroupUser
+from modules.user.models import UserStatistics
+
+DEFAULT_COUNTER_CONFIG = {
+    "flush_interval": 5  # 写回间隔（秒）
+}
+
+_members = GroupUser.__table__
+_stats = UserStatistics.__table__
+
+# message_count = message_count + :delta，并发写入时计数依然正确
+_MEMBER_INCREMENT = (
+    update(_members)
+    .where(_members.c.group_id == bindparam("b_group_id"), _members.c.user_id == bindparam("b_user_id"))
+    .values(message_count=func.coalesce(_members.c.message_count, 0) + bindparam("b_delta"))
+)
+_USER_INCREMENT = (
+    update(_stats)
+    .where(_stats.c.user_id == bindparam("b_user_id"))
+    .values(total_messages=func.coalesce(_stats.c.total_messages, 0) + bindparam("b_delta"))
+)
+
+
+class MessageCounter(PeriodicFlusher):
+    def __init__(self):
+        super().__init__("消息计数聚合", DEFAULT_COUNTER_CONFIG["flush_interval"])
+        self._member_deltas: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._user_deltas: Dict[str, int] = defaultdict(int)
+        self.flushed_messages = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        config = {**DEFAULT_COUNTER_CONFIG, **(config or {})}
+        self.interval = max(0.1, float(config["flush_interval"]))
+
+    def count_group_message(self, group_id: str, user_id: str):
+        """记录一条群消息：成员消息数和用户总消息数各加一"""
+        self._member_deltas[(group_id, user_id)] += 1
+        self._user_deltas[user_id] += 1
+        self.ensure_started()
+
+    def count_private_message(self, user_id: str):
+        """记录一条私聊消息：只增加用户总消息数"""
+        self._user_deltas[user_id] += 1
+        self.ensure_started()
+
+    async def flush(self):
+        """一次事务内批量写回所有增量"""
+        if not self._member_deltas and not self._user_deltas:
+            return
+
+        member_deltas, self._member_deltas = self._member_deltas, defaultdict(int)
+        user_deltas, self._user_deltas = self._user_deltas, defaultdict(int)
+
+        async with get_db_session() as session:
+            try:
+                if member_deltas:
+                    await session.execute(_MEMBER_INCREMENT, [
+                        {"b_group_id": group_id, "b_user_id": user_id, "b_delta": delta}
+                        for (group_id, user_id), delta in member_deltas.items()
+                    ])
+                if user_deltas:
+                    await session.execute(_USER_INCREMENT, [
+                        {"b_user_id": user_id, "b_delta": delta}
+                        for user_id, delta in user_deltas.items()
+                    ])
+                await session.commit()
+                self.flushed_messages += sum(user_deltas.values())
+            except Exception:
+                await session.rollback()
+                # 写回失败时把增量加回内存，下次刷新重试
+                for key, delta in member_deltas.items():
+                    self._member_deltas[key] += delta
+                for user_id, delta in user_deltas.items():
+                    self._user_deltas[user_id] += delta
+                raise
+
+
+# 全局实例
+message_counter = MessageCounter()
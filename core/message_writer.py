@@ -0,0 +1,226 @@
+"""
+消息日志写入器 - 将消息日志先放入队列，按批次合并写入数据库
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from core.config import get_config_section
+from modules.log.service import LogService
+
+DEFAULT_WRITER_CONFIG = {
+    "batch_size": 200,  # 每批最多写入的行数
+    "flush_interval_ms": 500,  # 最长等待时间（毫秒）
+    "max_queue_size": 10000  # 队列上限，超出后丢弃（写入失败待重试的消息同样受此上限限制）
+}
+
+
+class MessageLogWriter:
+    def __init__(self):
+        self.batch_size = DEFAULT_WRITER_CONFIG["batch_size"]
+        self.flush_interval = DEFAULT_WRITER_CONFIG["flush_interval_ms"] / 1000
+        self.max_queue_size = DEFAULT_WRITER_CONFIG["max_queue_size"]
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._batch: List[Dict[str, Any]] = []  # 正在凑批的消息
+        self._retry_rows: List[Dict[str, Any]] = []  # 写入失败、等待重试的消息
+        self._write_failed = False
+
+        # 统计计数
+        self.queued_rows = 0
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.failed_rows = 0  # 重试积压超过上限后放弃的消息
+        self.retried_rows = 0
+        self.flush_count = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置（写入器已启动时按新的上限重建队列）"""
+        if config is None:
+            config = get_config_section("message_writer", DEFAULT_WRITER_CONFIG)
+        else:
+            config = {**DEFAULT_WRITER_CONFIG, **config}
+
+        self.batch_size = max(1, int(config["batch_size"]))
+        self.flush_interval = max(1, int(config["flush_interval_ms"])) / 1000
+        self.max_queue_size = max(1, int(config["max_queue_size"]))
+        if self._queue is not None and self._queue.maxsize != self.max_queue_size:
+            self._rebuild_queue()
+
+    def _rebuild_queue(self):
+        """按新的上限重建队列，已排队的消息移入新队列（超出部分丢弃）"""
+        old_queue, self._queue = self._queue, asyncio.Queue(maxsize=self.max_queue_size)
+        while not old_queue.empty():
+            try:
+                self._queue.put_nowait(old_queue.get_nowait())
+            except asyncio.QueueFull:
+                self.dropped_rows += 1
+
+        # 后台任务可能正在等待旧队列，重新启动（正在凑批的消息保留在 _batch 中）
+        if self._task and not self._task.done():
+            self._task.cancel()
+            self._task = asyncio.create_task(self._run())
+
+    def start(self):
+        """启动后台写入任务"""
+        if self._task and not self._task.done():
+            return
+
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+        print(f"✅ 消息日志写入器已启动 (批量 {self.batch_size} 条 / {int(self.flush_interval * 1000)} ms)")
+
+    def enqueue(
+            self,
+            group_id: str,
+            user_id: str,
+            user_name: str,
+            message_type: str,
+            message_content: str,
+            raw_message: str = ""
+    ) -> bool:
+        """将消息日志放入写入队列，队列已满时丢弃"""
+        if self._task is None or self._task.done():
+            self.start()
+
+        row = {
+            "group_id": group_id,
+            "user_id": user_id,
+            "user_name": user_name,
+            "message_type": message_type,
+            "message_content": message_content,
+            "raw_message": raw_message,
+            "timestamp": datetime.now()
+        }
+
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped_rows += 1
+            return False
+
+        self.queued_rows += 1
+        return True
+
+    async def _run(self):
+        """后台循环：凑满一批或等待超时后写入"""
+        try:
+            while True:
+                if self._retry_rows:
+                    # 先重试写入失败的消息，上次失败时等待一个周期，避免数据库被锁时反复重试
+                    if self._write_failed:
+                        await asyncio.sleep(self.flush_interval)
+                    batch = self._retry_rows[:self.batch_size]
+                    del self._retry_rows[:self.batch_size]
+                    await asyncio.shield(self._write_batch(batch))
+                    continue
+
+                self._batch.append(await self._queue.get())
+                deadline = time.monotonic() + self.flush_interval
+
+                while len(self._batch) < self.batch_size:
+                    # 优先直接取出已在队列中的消息，减少等待开销
+                    if not self._queue.empty():
+                        self._batch.append(self._queue.get_nowait())
+                        continue
+
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                batch, self._batch = self._batch, []
+                # 写入过程不随任务取消而中断，避免丢失已出队的消息
+                await asyncio.shield(self._write_batch(batch))
+        except asyncio.CancelledError:
+            pass
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        """单次事务批量写入"""
+        if not batch:
+            return
+
+        async with self._flush_lock:
+            try:
+                self.flushed_rows += await LogService.add_message_logs_bulk(batch)
+                self.flush_count += 1
+                self._write_failed = False
+            except Exception as e:
+                print(f"❌ 批量保存消息日志失败，稍后重试: {e}")
+                self._write_failed = True
+                self._requeue(batch)
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """写入失败的消息放回重试列表（保持原顺序），积压超过队列上限时放弃最早的消息"""
+        self._retry_rows[:0] = batch
+        self.retried_rows += len(batch)
+        self._trim_retry()
+
+    def _trim_retry(self):
+        overflow = len(self._retry_rows) - self.max_queue_size
+        if overflow > 0:
+            del self._retry_rows[:overflow]
+            self.failed_rows += overflow
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        """取出待重试、凑批中和队列中剩余的全部消息"""
+        rows = self._retry_rows + self._batch
+        self._retry_rows, self._batch = [], []
+        if self._queue is None:
+            return rows
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return rows
+
+    async def flush(self):
+        """立即写入队列中的剩余消息（失败的批次留在重试列表中）"""
+        rows = self._drain()
+        for i in range(0, len(rows), self.batch_size):
+            await self._write_batch(rows[i:i + self.batch_size])
+            if self._write_failed:
+                # 数据库暂不可写，其余消息按原顺序排在失败的批次之后
+                rest = rows[i + self.batch_size:]
+                self._retry_rows.extend(rest)
+                self.retried_rows += len(rest)
+                self._trim_retry()
+                break
+
+    async def stop(self):
+        """停止写入任务并写入剩余消息（关闭时调用）"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        await self.flush()
+        if self.queued_rows:
+            print(f"✅ 消息日志写入器已停止: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        return {
+            "queued": self.queued_rows,
+            "flushed": self.flushed_rows,
+            "dropped": self.dropped_rows,
+            "failed": self.failed_rows,
+            "retried": self.retried_rows,
+            "retrying": len(self._retry_rows),
+            "pending": self._queue.qsize() if self._queue else 0,
+            "flush_count": self.flush_count
+        }
+
+
+# 全局实例
+message_log_writer = MessageLogWriter()
@@ -0,0 +1,170 @@
+"""
+数据库结构迁移 - 按版本号依次执行，已执行的版本记录在 schema_migrations 表中
+
+create_all 只会创建缺失的表，不会修改已存在的表；新增的索引、约束等
+都应在这里追加一个新版本的迁移，而不是手动执行 SQL。
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Sequence, Set, Tuple
+
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.engine import Connection
+
+from core.database import Base
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+
+def _ensure_migration_table(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR(200) NOT NULL, "
+        "applied_at DATETIME NOT NULL)"
+    ))
+
+
+def _applied_versions(conn: Connection) -> Set[int]:
+    return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars().all())
+
+
+def _has_unique_index(conn: Connection, table: str, columns: Sequence[str]) -> bool:
+    """检查表上是否已有覆盖指定列的唯一索引（含建表时的 UNIQUE 约束）"""
+    for index in conn.execute(text(f"PRAGMA index_list({table})")).mappings().all():
+        if not index["unique"]:
+            continue
+        index_columns = [row["name"] for row in conn.execute(text(f"PRAGMA index_info('{index['name']}')")).mappings()]
+        if tuple(index_columns) == tuple(columns):
+            return True
+    return False
+
+
+def add_unique_constraint(conn: Connection, table: str, name: str, columns: Sequence[str], keep: str = "MIN",
+                          merge: Dict[str, str] = None):
+    """补建唯一约束：合并并删除重复行，再建唯一索引
+
+    keep=MIN 保留最早的行，MAX 保留最新的行；merge 为 {列名: 聚合函数}（SUM/MIN/MAX），
+    删除前把同组所有行的这些列聚合到保留的行上（如累加计数、取最早的加入时间）
+    """
+    if _has_unique_index(conn, table, columns):
+        return
+    cols = ", ".join(columns)
+    if merge:
+        same_key = " AND ".join(f"d.{column} IS {table}.{column}" for column in columns)
+        assignments = ", ".join(
+            f"{column} = (SELECT {func}(d.{column}) FROM {table} AS d WHERE {same_key})"
+            for column, func in merge.items()
+        )
+        conn.execute(text(
+            f"UPDATE {table} SET {assignments} WHERE id IN "
+            f"(SELECT {keep}(id) FROM {table} GROUP BY {cols} HAVING COUNT(*) > 1)"
+        ))
+    removed = conn.execute(text(
+        f"DELETE FROM {table} WHERE id NOT IN "
+        f"(SELECT {keep}(id) FROM {table} GROUP BY {cols})"
+    )).rowcount
+    if removed:
+        print(f"⚠️ {table}: 已合并并删除重复行 {removed} 行（按 {cols}）")
+    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+
+
+def create_model_indexes(conn: Connection, table: str):
+    """创建模型 __table_args__ 中声明的索引（已存在的跳过）"""
+    for index in Base.metadata.tables[table].indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _migration_0001(conn: Connection):
+    add_unique_constraint(conn, "group_users", "uq_group_users_group_user", ("group_id", "user_id"), merge={
+        "message_count": "SUM", "join_time": "MIN", "last_speak": "MAX", "created_at": "MIN", "updated_at": "MAX"
+    })
+    add_unique_constraint(conn, "user_statistics", "uq_user_statistics_user", ("user_id",), merge={
+        "total_messages": "SUM", "total_commands": "SUM", "active_days": "MAX",
+        "last_command": "MAX", "created_at": "MIN", "updated_at": "MAX"
+    })
+    # 保留最新的开关与设置，累加使用次数
+    add_unique_constraint(conn, "plugin_group_settings", "uq_plugin_group_settings_plugin_group",
+                          ("plugin_name", "group_id"), keep="MAX", merge={"usage_count": "SUM", "created_at": "MIN"})
+
+
+def _migration_0002(conn: Connection):
+    # group_users(group_id, user_id) 与 user_statistics(user_id) 已由 0001 的唯一索引覆盖
+    for table in ("message_logs", "system_logs", "plugin_group_settings", "plugin_usage_logs"):
+        create_model_indexes(conn, table)
+
+
+def _migration_0003(conn: Connection):
+    from modules.log.search import create_message_index
+    create_message_index(conn)
+
+
+def _migration_0004(conn: Connection):
+    from modules.log.search import create_short_term_index
+    create_short_term_index(conn)
+
+
+def _migration_0005(conn: Connection):
+    from modules.log.search import drop_bigram_triggers
+    drop_bigram_triggers(conn)
+
+
+def _migration_0006(conn: Connection):
+    # 游标分页的排序列不能为空：回填旧数据中的空值（新建的表中这些列为 NOT NULL）
+    now = bindparam("now", datetime.now(), type_=DateTime())
+    for sql in (
+        "UPDATE groups SET updated_at = COALESCE(created_at, :now) WHERE updated_at IS NULL",
+        "UPDATE group_users SET message_count = 0 WHERE message_count IS NULL",
+        "UPDATE plugins SET priority = 10 WHERE priority IS NULL",
+        "UPDATE user_profiles SET level = 1 WHERE level IS NULL",
+        "UPDATE user_profiles SET experience = 0 WHERE experience IS NULL",
+        "UPDATE user_profiles SET last_active = COALESCE(created_at, :now) WHERE last_active IS NULL",
+    ):
+        statement = text(sql)
+        if ":now" in sql:
+            statement = statement.bindparams(now)
+        conn.execute(statement)
+    for table in ("groups", "group_users", "plugins", "user_profiles"):
+        create_model_indexes(conn, table)
+
+
+def _migration_0007(conn: Connection):
+    # 日志列表不带过滤条件时按 (时间, id) 游标分页，原有索引都不以时间列开头（或中间夹着其它列）
+    now = bindparam("now", datetime.now(), type_=DateTime())
+    conn.execute(text("UPDATE message_logs SET timestamp = :now WHERE timestamp IS NULL").bindparams(now))
+    for table in ("system_logs", "operation_logs"):
+        conn.execute(text(f"UPDATE {table} SET created_at = :now WHERE created_at IS NULL").bindparams(now))
+    for table in ("message_logs", "system_logs", "operation_logs"):
+        create_model_indexes(conn, table)
+
+
+# 迁移列表：只能在末尾追加，已发布的版本不要修改
+MIGRATIONS: List[Migration] = [
+    (1, "唯一约束：群成员 / 用户统计 / 群插件设置", _migration_0001),
+    (2, "常用查询列的二级索引", _migration_0002),
+    (3, "消息内容全文索引（FTS5）", _migration_0003),
+    (4, "消息内容短词索引（trigram 模式下的二元切分索引）", _migration_0004),
+    (5, "二元切分索引改由应用同步（删除依赖 fts_bigram() 的触发器）", _migration_0005),
+    (6, "游标分页排序列回填空值并建立 (排序列, id) 索引", _migration_0006),
+    (7, "日志表的 (时间, id) 索引", _migration_0007),
+]
+
+
+async def run_migrations(engine):
+    """执行所有未应用的迁移，每个版本单独一个事务"""
+    async with engine.begin() as conn:
+        await conn.run_sync(_ensure_migration_table)
+        applied = await conn.run_sync(_applied_versions)
+
+    pending = [migration for migration in MIGRATIONS if migration[0] not in applied]
+    if not pending:
+        print(f"✅ 数据库结构已是最新 (版本 {max(applied, default=0)})")
+        return
+
+    for version, name, upgrade in sorted(pending, key=lambda migration: migration[0]):
+        async with engine.begin() as conn:
+            await conn.run_sync(upgrade)
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {"version": version, "name": name, "applied_at": datetime.now()}
+            )
+        print(f"✅ 已执行数据库迁移 {version:04d}: {name}")
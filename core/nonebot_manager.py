@@ -1,15 +1,15 @@
-import nonebot
-from nonebot.adapters.onebot.v11 import Adapter as OneBotV11Adapter
 import asyncio
 import json
 import os
-import socket
 import subprocess
 import platform
 from pathlib import Path
 from typing import Dict, Any
 from modules.log.service import LogService
 from modules.system.service import SystemService
+from core.config import reload_app_config
+from core.bot_status import BotStatusStore
+from core.startup import is_port_free, wait_port_free, wait_server_started
 from datetime import datetime
 
 
@@ -22,6 +22,10 @@ class NoneBotManager:
         self.config_file = Path("config/bot_config.json")
         self._run_task = None
         self._stop_event = asyncio.Event()
+        # NoneBot 服务器开始监听时完成（结果为是否启动成功）
+        self._server_ready: asyncio.Future = None
+        # 机器人状态（内存为准，异步写回数据库）
+        self.status = BotStatusStore()
 
     def get_nonebot_port(self) -> int:
         """从配置获取NoneBot端口"""
@@ -62,24 +66,16 @@ class NoneBotManager:
 
     def is_port_in_use(self, port: int) -> bool:
         """检查端口是否被占用"""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.bind(('0.0.0.0', port))
-                return False
-            except OSError:
-                return True
+        return not is_port_free(port)
 
-    def ensure_port_available(self, port: int):
+    async def ensure_port_available(self, port: int):
         """确保端口可用，如果被占用则杀死占用进程"""
         if self.is_port_in_use(port):
             print(f"⚠️ 端口 {port} 被占用，正在清理...")
             self.kill_process_on_port(port)
-            # 等待一下让系统释放端口
-            import time
-            time.sleep(2)
 
-            # 再次检查
-            if self.is_port_in_use(port):
+            # 等待系统释放端口
+            if not await wait_port_free(port):
                 raise Exception(f"无法释放端口 {port}，请手动检查")
 
     async def load_config(self) -> Dict[str, Any]:
@@ -106,6 +102,7 @@ class NoneBotManager:
             self.config_file.parent.mkdir(exist_ok=True)
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.current_config, f, indent=2, ensure_ascii=False)
+            reload_app_config()
 
             await LogService.add_system_log("INFO", "配置文件已保存")
             return True
@@ -132,6 +129,72 @@ class NoneBotManager:
             "nonebot": {
                 "port": 8081
             },
+            "message_writer": {
+                "batch_size": 200,
+                "flush_interval_ms": 500,
+                "max_queue_size": 10000
+            },
+            "activity_tracker": {
+                "flush_interval": 5
+            },
+            "message_counter": {
+                "flush_interval": 5
+            },
+            "plugin_usage": {
+                "flush_interval": 5,
+                "max_pending": 1000,
+                "max_backlog": 10000
+            },
+            "plugin_profiler": {
+                "enabled": True,
+                "flush_interval": 60
+            },
+            "plugin_supervisor": {
+                "default_timeout": 0,
+                "offload_workers": 4,
+                "lag_threshold_ms": 500,
+                "lag_check_interval": 0.1
+            },
+            "rate_limit": {
+                "enabled": True,
+                "user": {"rate": 0, "burst": 0},
+                "action": "drop",
+                "max_defer": 2,
+                "max_deferred": 100,
+                "settings_ttl": 60,
+                "max_groups": 1024,
+                "sweep_interval": 60
+            },
+            "member_count": {
+                "reconcile_interval": 3600
+            },
+            "database": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "mmap_size": 268435456,
+                "cache_size": -65536,
+                "temp_store": "MEMORY",
+                "busy_timeout": 5000,
+                "wal_autocheckpoint": 1000
+            },
+            "count_cache": {
+                "max_entries": 512,
+                "stale_seconds": 0
+            },
+            "plugin_enablement": {
+                "max_groups": 1024
+            },
+            "query_metrics": {
+                "enabled": True,
+                "max_shapes": 500,
+                "slow_query_ms": 0,
+                "explain_interval": 300
+            },
+            "auth": {
+                "session_cache_ttl": 60,
+                "activity_write_interval": 60,
+                "session_expiry_hours": 24
+            },
             "webui": {
                 "host": "0.0.0.0",
                 "port": 8080,
@@ -149,16 +212,15 @@ class NoneBotManager:
             else:
                 await self.load_config()
 
-            # 获取配置的端口并确保可用
-            port = self.get_nonebot_port()
-            print(f"🔧 使用配置端口: {port}")
-            self.ensure_port_available(port)
-
-            # 如果已经在运行，先关闭
+            # 如果已经在运行，先关闭（关闭时会等待端口释放）
             if self.is_running:
                 print("⚠️ NoneBot已在运行，先关闭...")
                 await self.shutdown_nonebot()
-                await asyncio.sleep(2)
+
+            # 获取配置的端口并确保可用
+            port = self.get_nonebot_port()
+            print(f"🔧 使用配置端口: {port}")
+            await self.ensure_port_available(port)
 
             # 设置环境变量
             onebot_config = self.current_config.get("onebot", {})
@@ -183,6 +245,10 @@ class NoneBotManager:
 
             print("🔧 初始化NoneBot配置...")
 
+            # NoneBot 与适配器较重，首次启动机器人时才导入，不拖慢 WebUI 启动
+            import nonebot
+            from nonebot.adapters.onebot.v11 import Adapter as OneBotV11Adapter
+
             # 重置NoneBot状态
             await self._reset_nonebot_state()
 
@@ -202,6 +268,14 @@ class NoneBotManager:
             # 确保数据收集服务被加载
             try:
                 from core.data_collector import data_collector
+                from core.message_writer import message_log_writer
+                from core.activity_tracker import activity_tracker
+                from core.message_counter import message_counter
+                message_log_writer.configure(self.current_config.get("message_writer", {}))
+                activity_tracker.configure(self.current_config.get("activity_tracker", {}))
+                message_counter.configure(self.current_config.get("message_counter", {}))
+                from modules.plugin.usage_recorder import plugin_usage_recorder
+                plugin_usage_recorder.configure(self.current_config.get("plugin_usage", {}))
                 print("✅ 数据收集服务已加载")
             except Exception as e:
                 print(f"❌ 加载数据收集服务失败: {e}")
@@ -213,18 +287,48 @@ class NoneBotManager:
             except Exception as e:
                 print(f"❌ 加载插件拦截器失败: {e}")
 
+            # 消息与插件限流
+            try:
+                from core.rate_limiter import rate_limiter
+                rate_limiter.configure(self.current_config.get("rate_limit", {}))
+                rate_limiter.install()
+            except Exception as e:
+                print(f"❌ 加载消息限流失败: {e}")
+
+            # 插件执行耗时统计
+            try:
+                from modules.plugin.profiler import plugin_profiler
+                plugin_profiler.configure(self.current_config.get("plugin_profiler", {}))
+                await plugin_profiler.load()
+                plugin_profiler.install()
+            except Exception as e:
+                print(f"❌ 加载插件耗时统计失败: {e}")
+
+            # 插件超时、线程池与事件循环卡顿检测
+            try:
+                from core.plugin_supervisor import plugin_supervisor
+                plugin_supervisor.configure(self.current_config.get("plugin_supervisor", {}))
+                plugin_supervisor.supervise_plugins()
+                plugin_supervisor.start()
+            except Exception as e:
+                print(f"❌ 加载插件监督失败: {e}")
+
             self.nb_instance = nonebot
             self.is_running = True
 
+            # 启动NoneBot服务器，等待端口开始监听
+            self._server_ready = asyncio.get_running_loop().create_future()
+            self._run_task = asyncio.create_task(self._run_nonebot_simple())
+            if not await self._server_ready:
+                await self.shutdown_nonebot()
+                raise Exception(f"NoneBot服务器未能在端口 {port} 上启动")
+
             # 更新数据库状态
             start_time = datetime.now()
             await SystemService.update_bot_status(is_running=True, start_time=start_time)
 
             await LogService.add_system_log("INFO", f"NoneBot实例已启动 - {start_time}")
 
-            # 启动NoneBot服务器
-            self._run_task = asyncio.create_task(self._run_nonebot_simple())
-
             print("✅ NoneBot启动完成")
             return True
 
@@ -260,6 +364,7 @@ class NoneBotManager:
                 print(f"📂 加载插件目录: {plugins_dir}")
 
                 # 加载所有插件
+                import nonebot
                 nonebot.load_plugins("plugins")
                 print("✅ 插件加载完成")
 
@@ -335,6 +440,7 @@ class NoneBotManager:
                     plugin_name = item.name
                     try:
                         # 尝试加载单个插件
+                        import nonebot
                         nonebot.load_plugin(f"plugins.{plugin_name}")
                         print(f"✅ 加载插件: {plugin_name}")
 
@@ -365,6 +471,7 @@ class NoneBotManager:
         """运行NoneBot服务器 - 修复版本"""
         try:
             print("🤖 NoneBot服务器正在运行...")
+            import nonebot
 
             # 确保 NoneBot 正确初始化
             if not hasattr(nonebot, '_driver') or nonebot._driver is None:
@@ -395,23 +502,26 @@ class NoneBotManager:
             )
             server = uvicorn.Server(server_config)
 
-            print(f"✅ NoneBot服务器已在 {host}:{port} 启动")
-            print(f"🔗 WebSocket URL: ws://{host}:{port}/onebot/v11/ws")
-            print(f"🔗 HTTP URL: http://{host}:{port}/onebot/v11/")
-
             # 使用事件来控制服务器运行
             server_task = asyncio.create_task(server.serve())
 
-            # 等待停止事件
-            try:
-                await asyncio.wait_for(self._stop_event.wait(), timeout=None)
-            except asyncio.CancelledError:
-                print("⏹️ 服务器任务被取消")
+            # 等待服务器开始监听
+            started = await wait_server_started(server, server_task)
+            self._set_server_ready(started)
+            if started:
+                print(f"✅ NoneBot服务器已在 {host}:{port} 启动")
+                print(f"🔗 WebSocket URL: ws://{host}:{port}/onebot/v11/ws")
+                print(f"🔗 HTTP URL: http://{host}:{port}/onebot/v11/")
 
-            # 停止服务器
+                # 等待停止事件
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=None)
+                except asyncio.CancelledError:
+                    print("⏹️ 服务器任务被取消")
+
+            # 停止服务器：先让 uvicorn 正常退出（关闭监听端口），超时再取消
             if not server_task.done():
                 server.should_exit = True
-                server_task.cancel()
                 try:
                     await asyncio.wait_for(server_task, timeout=5.0)
                 except (asyncio.CancelledError, asyncio.TimeoutError):
@@ -424,11 +534,17 @@ class NoneBotManager:
             traceback.print_exc()
             await LogService.add_system_log("ERROR", error_msg, "nonebot")
         finally:
+            self._set_server_ready(False)
             # 更新状态
             self.is_running = False
             stop_time = datetime.now()
             await SystemService.update_bot_status(is_running=False, last_restart=stop_time)
 
+    def _set_server_ready(self, started: bool):
+        """通知 start_nonebot 服务器是否已启动（只通知一次）"""
+        if self._server_ready is not None and not self._server_ready.done():
+            self._server_ready.set_result(started)
+
     async def shutdown_nonebot(self) -> bool:
         """关闭NoneBot实例"""
         try:
@@ -438,9 +554,8 @@ class NoneBotManager:
                 # 设置停止事件
                 self._stop_event.set()
 
-                # 取消运行任务
+                # 等待运行任务随停止事件退出，超时则取消
                 if self._run_task and not self._run_task.done():
-                    self._run_task.cancel()
                     try:
                         await asyncio.wait_for(self._run_task, timeout=10.0)
                     except (asyncio.CancelledError, asyncio.TimeoutError):
@@ -464,7 +579,9 @@ class NoneBotManager:
 
                 # 等待端口释放
                 print("⏳ 等待端口释放...")
-                await asyncio.sleep(3)
+                port = self.get_nonebot_port()
+                if not await wait_port_free(port):
+                    print(f"⚠️ 端口 {port} 仍被占用")
 
                 # 重置状态
                 self.is_running = False
@@ -495,7 +612,6 @@ class NoneBotManager:
         try:
             print("🔄 正在重启NoneBot实例...")
             await self.shutdown_nonebot()
-            await asyncio.sleep(2)
             success = await self.start_nonebot(new_config)
             if success:
                 print("✅ NoneBot实例重启成功")
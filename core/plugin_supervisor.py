@@ -0,0 +1,316 @@
+"""
+插件监督 - 限制插件处理函数的执行时间、把同步代码放到独立线程池，并找出阻塞事件循环的 matcher
+
+插件在元数据 extra 中配置（未配置时使用 plugin_supervisor.default_timeout）：
+    extra={"timeout": 10, "offload": True}
+- timeout: 每个处理函数的最长执行时间（秒），超时后取消并按执行失败处理
+- offload: 同步处理函数改在插件专用的有界线程池中运行（默认由 NoneBot 放入 anyio 的共享线程池）；
+  异步处理函数中的阻塞调用可以使用 plugin_supervisor.run_blocking(func, *args)
+
+事件循环卡顿检测：事件循环中的心跳任务定期更新时间，监视线程发现心跳超过阈值未更新时，
+读取事件循环线程的调用栈，按插件处理函数的代码对象找出正在执行的 matcher。
+线程中的同步代码无法被取消，超时后只是不再等待其结果。
+"""
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import get_config_section
+
+DEFAULT_SUPERVISOR_CONFIG = {
+    "default_timeout": 0,  # 未配置 extra.timeout 的插件的处理函数超时（秒），0 表示不限制
+    "offload_workers": 4,  # 插件专用线程池的线程数
+    "lag_threshold_ms": 500,  # 事件循环超过该时间未响应视为卡顿
+    "lag_check_interval": 0.1  # 心跳与检查间隔（秒）
+}
+
+# 卡顿记录中保留的调用栈层数
+STACK_LIMIT = 8
+
+
+class StallStats:
+    """同一来源的事件循环卡顿统计"""
+
+    __slots__ = ("plugin_name", "matcher", "location", "stalls", "total_ms", "max_ms", "stack")
+
+    def __init__(self, plugin_name: Optional[str], matcher: Optional[str], location: str):
+        self.plugin_name = plugin_name
+        self.matcher = matcher
+        self.location = location
+        self.stalls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.stack: List[str] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "plugin_name": self.plugin_name,
+            "matcher": self.matcher,
+            "location": self.location,
+            "stalls": self.stalls,
+            "total_ms": round(self.total_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "stack": self.stack
+        }
+
+
+class PluginSupervisor:
+    def __init__(self):
+        self.default_timeout = DEFAULT_SUPERVISOR_CONFIG["default_timeout"]
+        self.offload_workers = DEFAULT_SUPERVISOR_CONFIG["offload_workers"]
+        self.lag_threshold_ms = DEFAULT_SUPERVISOR_CONFIG["lag_threshold_ms"]
+        self.lag_check_interval = DEFAULT_SUPERVISOR_CONFIG["lag_check_interval"]
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 处理函数代码对象 -> (插件名, matcher)，用于在调用栈中识别 matcher
+        self._handler_codes: Dict[Any, Tuple[str, str]] = {}
+        self._supervised = set()
+
+        self._heartbeat = time.monotonic()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.timeouts: Counter = Counter()
+        self.offloaded: Counter = Counter()
+        self.offload_running = 0  # 线程池中正在执行的调用（含已超时、不再等待但线程仍在运行的）
+        self.stalls: Dict[str, StallStats] = {}
+        self.max_lag_ms = 0.0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        if config is None:
+            config = get_config_section("plugin_supervisor", DEFAULT_SUPERVISOR_CONFIG)
+        else:
+            config = {**DEFAULT_SUPERVISOR_CONFIG, **config}
+        self.default_timeout = max(0.0, float(config["default_timeout"]))
+        self.offload_workers = max(1, int(config["offload_workers"]))
+        self.lag_threshold_ms = max(10.0, float(config["lag_threshold_ms"]))
+        self.lag_check_interval = max(0.01, float(config["lag_check_interval"]))
+
+    # ---- 处理函数包装 ----
+
+    def supervise_plugins(self):
+        """包装已加载插件的处理函数（NoneBot 加载插件后调用，已包装的跳过）"""
+        from nonebot.plugin import get_loaded_plugins
+        from core.plugin_interceptor import plugin_interceptor
+        from modules.plugin.profiler import matcher_key
+
+        supervised = 0
+        for plugin in get_loaded_plugins():
+            extra = plugin.metadata.extra if plugin.metadata else {}
+            timeout = float(extra.get("timeout") or self.default_timeout or 0)
+            offload = bool(extra.get("offload", False))
+            plugin_name = plugin_interceptor.resolve_plugin_name(plugin)
+
+            for matcher in plugin.matcher:
+                key = matcher_key(matcher)
+                for index, handler in enumerate(matcher.handlers):
+                    if id(handler) in self._supervised:
+                        continue
+                    code = getattr(handler.call, "__code__", None)
+                    if code is not None:
+                        self._handler_codes[code] = (plugin_name, key)
+                    if not timeout and not offload:
+                        continue
+                    wrapped = replace(handler, call=self._wrap(handler.call, plugin_name, timeout, offload))
+                    matcher.handlers[index] = wrapped
+                    self._supervised.add(id(wrapped))
+                    supervised += 1
+
+        if supervised:
+            print(f"✅ 插件监督已启用: 包装处理函数 {supervised} 个")
+
+    def _wrap(self, call: Callable, plugin_name: str, timeout: float, offload: bool) -> Callable:
+        from nonebot.utils import is_coroutine_callable, run_sync
+
+        if is_coroutine_callable(call):
+            run = call
+        elif offload:
+            run = partial(self._run_offloaded, plugin_name, call)
+        else:
+            run = run_sync(call)
+
+        async def supervised_call(**values):
+            if not timeout:
+                return await run(**values)
+            try:
+                return await asyncio.wait_for(run(**values), timeout)
+            except asyncio.TimeoutError:
+                self.timeouts[plugin_name] += 1
+                raise TimeoutError(f"插件 {plugin_name} 处理超时（{timeout:g}秒）")
+
+        return supervised_call
+
+    # ---- 线程池 ----
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.offload_workers, thread_name_prefix="plugin-offload")
+        return self._executor
+
+    async def _run_offloaded(self, plugin_name: str, func: Callable, *args, **kwargs):
+        # 复制上下文，线程中仍可使用 current_bot / current_event 等
+        context = contextvars.copy_context()
+        future = self._get_executor().submit(context.run, func, *args, **kwargs)
+        with self._lock:
+            self.offloaded[plugin_name] += 1
+            self.offload_running += 1
+        # 超时取消只是不再等待，线程中的调用结束（或排队中被取消）后才减少计数
+        future.add_done_callback(self._offload_done)
+        return await asyncio.wrap_future(future)
+
+    def _offload_done(self, future):
+        with self._lock:
+            self.offload_running -= 1
+
+    async def run_blocking(self, func: Callable, *args, **kwargs):
+        """在插件专用线程池中运行阻塞函数（供异步处理函数调用）"""
+        from core.plugin_interceptor import plugin_interceptor
+        from nonebot.matcher import current_matcher
+
+        try:
+            plugin = current_matcher.get().plugin
+            plugin_name = plugin_interceptor.resolve_plugin_name(plugin) if plugin else "unknown"
+        except LookupError:
+            plugin_name = "unknown"
+        return await self._run_offloaded(plugin_name, func, *args, **kwargs)
+
+    # ---- 事件循环卡顿检测 ----
+
+    def start(self):
+        """启动心跳任务与监视线程（已启动时忽略）"""
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = threading.get_ident()
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._run_heartbeat())
+        if self._watchdog is None or not self._watchdog.is_alive():
+            self._stopping.clear()
+            self._watchdog = threading.Thread(target=self._run_watchdog, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        """停止检测并关闭线程池"""
+        self._stopping.set()
+        if self._heartbeat_task and not self._heartbeat_task.done():
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+        self._heartbeat_task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run_heartbeat(self):
+        try:
+            while True:
+                expected = time.monotonic() + self.lag_check_interval
+                await asyncio.sleep(self.lag_check_interval)
+                now = time.monotonic()
+                self.max_lag_ms = max(self.max_lag_ms, (now - expected) * 1000)
+                self._heartbeat = now
+        except asyncio.CancelledError:
+            pass
+
+    def _run_watchdog(self):
+        stall: Optional[StallStats] = None
+        stall_started = 0.0
+        last_ms = 0.0
+        while not self._stopping.wait(self.lag_check_interval):
+            heartbeat = self._heartbeat
+            if self._heartbeat_task is None or self._heartbeat_task.done():
+                stall = None
+                continue
+
+            lag_ms = (time.monotonic() - heartbeat) * 1000
+            if lag_ms < self.lag_threshold_ms:
+                stall = None
+                continue
+
+            if stall is None or heartbeat != stall_started:
+                # 新的卡顿：读取事件循环线程当前的调用栈
+                stall = self._attribute_stall()
+                stall_started = heartbeat
+                if stall is None:
+                    continue
+                with self._lock:
+                    stall.stalls += 1
+                    stall.total_ms += lag_ms
+                    stall.max_ms = max(stall.max_ms, lag_ms)
+                print(f"⚠️ 事件循环卡顿超过 {self.lag_threshold_ms:.0f}ms: {stall.matcher or stall.location}")
+                last_ms = lag_ms
+            else:
+                with self._lock:
+                    stall.total_ms += lag_ms - last_ms
+                    stall.max_ms = max(stall.max_ms, lag_ms)
+                last_ms = lag_ms
+
+    def _attribute_stall(self) -> Optional[StallStats]:
+        """根据事件循环线程的调用栈找出卡顿来源"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+
+        stack = traceback.extract_stack(frame, limit=None)
+        innermost = stack[-1]
+        plugin_name = matcher = None
+        location = f"{innermost.filename}:{innermost.lineno} ({innermost.name})"
+        while frame is not None:
+            owner = self._handler_codes.get(frame.f_code)
+            if owner is not None:
+                plugin_name, matcher = owner
+                break
+            frame = frame.f_back
+
+        key = matcher or location
+        with self._lock:
+            stats = self.stalls.get(key)
+            if stats is None:
+                stats = self.stalls[key] = StallStats(plugin_name, matcher, location)
+            stats.stack = [f"{item.filename}:{item.lineno} {item.name}" for item in stack[-STACK_LIMIT:]]
+        return stats
+
+    # ---- 查询 ----
+
+    def get_plugin_stats(self, plugin_name: str) -> Dict[str, Any]:
+        """单个插件的超时、线程池与卡顿统计"""
+        with self._lock:
+            stalls = [item.to_dict() for item in self.stalls.values() if item.plugin_name == plugin_name]
+        return {
+            "timeouts": self.timeouts.get(plugin_name, 0),
+            "offloaded": self.offloaded.get(plugin_name, 0),
+            "stalls": stalls
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取监督统计"""
+        with self._lock:
+            stalls = sorted(self.stalls.values(), key=lambda item: item.total_ms, reverse=True)
+            stall_list = [item.to_dict() for item in stalls]
+        return {
+            "default_timeout": self.default_timeout,
+            "supervised_handlers": len(self._supervised),
+            "timeouts": dict(self.timeouts),
+            "offloaded": dict(self.offloaded),
+            "offload_workers": self.offload_workers,
+            "offload_running": self.offload_running,
+            "lag_threshold_ms": self.lag_threshold_ms,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "stalls": stall_list
+        }
+
+
+# 全局实例
+plugin_supervisor = PluginSupervisor()
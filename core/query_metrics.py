@@ -0,0 +1,237 @@
+"""
+SQL 执行统计 - 按语句形态汇总调用次数、耗时分布和影响行数
+
+- 语句形态：去掉多余空白并把 IN (?, ?, ...) 之类的参数列表合并后的 SQL
+- 超过慢查询阈值的语句会在后台执行 EXPLAIN QUERY PLAN，结果写入系统日志
+- sqlite3 不提供 SELECT 的行数，行数只统计写语句（executemany 按参数组数计）
+"""
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+
+from core.config import get_config_section
+
+DEFAULT_QUERY_METRICS_CONFIG = {
+    "enabled": True,
+    "max_shapes": 500,  # 统计的语句形态数量上限，超出时淘汰最久未执行的
+    "slow_query_ms": 0,  # 慢查询阈值（毫秒），0 表示不记录
+    "explain_interval": 300  # 同一语句形态两次记录执行计划的最小间隔（秒）
+}
+
+# 耗时分布的桶上限（毫秒），最后一个桶收纳更慢的语句
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_WHITESPACE = re.compile(r"\s+")
+_PARAM_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_VALUES_LIST = re.compile(r"(\(\?, \.\.\.\))(?:\s*,\s*\(\?, \.\.\.\))+")
+_START_KEY = "query_metrics_start"
+# 可以查看执行计划的语句
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+def statement_shape(statement: str) -> str:
+    """归一化 SQL，使参数个数不同的同一查询归为一类"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PARAM_LIST.sub("?, ...", shape)
+    return _VALUES_LIST.sub(r"\1, ...", shape)
+
+
+class QueryStats:
+    """单个语句形态的统计"""
+
+    __slots__ = ("shape", "calls", "total_time", "max_time", "rows", "buckets", "last_explained")
+
+    def __init__(self, shape: str):
+        self.shape = shape
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.last_explained = 0.0
+
+    def record(self, elapsed: float, rows: int):
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if rows > 0:
+            self.rows += rows
+
+        elapsed_ms = elapsed * 1000
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """按桶估算分位数（毫秒，取桶上限，不超过最大值）"""
+        target = self.calls * fraction
+        seen = 0
+        max_ms = self.max_time * 1000
+        for index, count in enumerate(self.buckets[:-1]):
+            seen += count
+            if count and seen >= target:
+                return min(LATENCY_BUCKETS_MS[index], max_ms)
+        return max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "statement": self.shape,
+            "calls": self.calls,
+            "rows": self.rows,
+            "total_ms": round(self.total_time * 1000, 2),
+            "avg_ms": round(self.total_time * 1000 / self.calls, 3) if self.calls else 0,
+            "max_ms": round(self.max_time * 1000, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "histogram": {
+                **{f"<={bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                f">{LATENCY_BUCKETS_MS[-1]}ms": self.buckets[-1]
+            }
+        }
+
+
+class QueryMetrics:
+    def __init__(self):
+        self.enabled = DEFAULT_QUERY_METRICS_CONFIG["enabled"]
+        self.max_shapes = DEFAULT_QUERY_METRICS_CONFIG["max_shapes"]
+        self.slow_query_ms = DEFAULT_QUERY_METRICS_CONFIG["slow_query_ms"]
+        self.explain_interval = DEFAULT_QUERY_METRICS_CONFIG["explain_interval"]
+
+        self._stats: "OrderedDict[str, QueryStats]" = OrderedDict()
+        self._engine = None
+        self._explain_tasks = set()
+        self.started_at = datetime.now()
+        self.slow_queries = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        if config is None:
+            config = get_config_section("query_metrics", DEFAULT_QUERY_METRICS_CONFIG)
+        else:
+            config = {**DEFAULT_QUERY_METRICS_CONFIG, **config}
+        self.enabled = bool(config["enabled"])
+        self.max_shapes = max(1, int(config["max_shapes"]))
+        self.slow_query_ms = max(0.0, float(config["slow_query_ms"]))
+        self.explain_interval = max(0.0, float(config["explain_interval"]))
+
+    def install(self, engine):
+        """在引擎上注册执行计时监听"""
+        self._engine = engine
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(sync_engine, "handle_error", self._handle_error)
+
+    def reset(self):
+        """清空统计"""
+        self._stats.clear()
+        self.slow_queries = 0
+        self.started_at = datetime.now()
+
+    # ---- 执行监听 ----
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get(_START_KEY)
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+
+        shape = statement_shape(statement)
+        stats = self._stats.get(shape)
+        if stats is None:
+            stats = self._stats[shape] = QueryStats(shape)
+            while len(self._stats) > self.max_shapes:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(shape)
+        stats.record(elapsed, cursor.rowcount)
+
+        if self.slow_query_ms and elapsed * 1000 >= self.slow_query_ms:
+            self.slow_queries += 1
+            now = time.monotonic()
+            if stats.last_explained == 0.0 or now - stats.last_explained >= self.explain_interval:
+                stats.last_explained = now
+                params = parameters[0] if executemany and parameters else parameters
+                self._schedule_explain(statement, params, elapsed)
+
+    def _handle_error(self, context):
+        # 执行失败时没有 after_cursor_execute，丢弃对应的开始时间
+        conn = context.connection
+        if conn is not None and conn.info.get(_START_KEY):
+            conn.info[_START_KEY].pop()
+
+    # ---- 慢查询 ----
+
+    def _schedule_explain(self, statement: str, parameters, elapsed: float):
+        head = statement.lstrip().upper()
+        if self._engine is None or not head.startswith(_EXPLAINABLE):
+            return
+        # 记录慢查询本身会写入 system_logs，不再为它记录执行计划，避免循环
+        if head.startswith("INSERT INTO SYSTEM_LOGS"):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # 监听在查询执行过程中调用，不能在这里等待，执行计划在后台查询
+        task = loop.create_task(self._explain(statement, parameters, elapsed))
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain(self, statement: str, parameters, elapsed: float):
+        from modules.log.service import LogService
+
+        try:
+            async with self._engine.connect() as conn:
+                result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+                plan = "\n".join(str(row[-1]) for row in result.all())
+        except Exception as e:
+            plan = f"无法获取执行计划: {e}"
+
+        try:
+            await LogService.add_system_log(
+                "WARNING",
+                f"慢查询 {elapsed * 1000:.1f}ms: {statement_shape(statement)[:200]}",
+                "database",
+                details=f"{statement}\n\n参数: {parameters!r}\n\n执行计划:\n{plan}"
+            )
+        except Exception as e:
+            print(f"❌ 记录慢查询失败: {e}")
+
+    # ---- 查询 ----
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        """获取统计：总耗时最高、平均耗时最高和执行最频繁的语句"""
+        stats: List[QueryStats] = list(self._stats.values())
+
+        def ranked(key) -> List[Dict[str, Any]]:
+            return [item.to_dict() for item in sorted(stats, key=key, reverse=True)[:top]]
+
+        return {
+            "enabled": self.enabled,
+            "since": self.started_at.isoformat(),
+            "slow_query_ms": self.slow_query_ms,
+            "slow_queries": self.slow_queries,
+            "shapes": len(stats),
+            "total_calls": sum(item.calls for item in stats),
+            "total_ms": round(sum(item.total_time for item in stats) * 1000, 2),
+            "slowest_total": ranked(lambda item: item.total_time),
+            "slowest_avg": ranked(lambda item: item.total_time / item.calls),
+            "most_frequent": ranked(lambda item: item.calls)
+        }
+
+
+# 全局实例
+query_metrics = QueryMetrics()
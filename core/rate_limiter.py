@@ -0,0 +1,286 @@
+"""
+消息限流 - 令牌桶，超出频率的消息直接丢弃（或短暂延后），只累计计数，不写日志
+
+- 用户：全局默认限制（配置 rate_limit.user，默认不限制），覆盖所有群聊和私聊
+- 群组：Group.settings["rate_limit"] 中的 group（整个群）与 user（群内每个用户）
+- 插件：PluginGroupSetting.settings["rate_limit"] 中的 group 与 user，只限制该插件在该群的 matcher
+- 限制格式：{"rate": 每秒补充的令牌数, "burst": 桶容量}，rate 为 0 或未设置表示不限制
+
+用户与群组限制在事件预处理阶段检查，超限的消息不会进入数据收集和任何 matcher；
+插件限制由插件拦截器在 matcher 运行前检查，只跳过该 matcher。超级用户不受限制。
+群组/插件设置通过 GroupService.update_group_settings、PluginService.update_group_plugin_settings
+修改时立即生效，直接修改数据库时在 settings_ttl 后生效。
+"""
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from core.config import get_config_section
+from core.database import get_db_session
+
+DEFAULT_RATE_LIMIT_CONFIG = {
+    "enabled": True,
+    "user": {"rate": 0, "burst": 0},  # 每个用户的默认限制，rate 为 0 表示不限制
+    "action": "drop",  # 超限时：drop 丢弃，defer 在 max_defer 秒内可恢复时延后处理
+    "max_defer": 2,  # 最长延后时间（秒）
+    "max_deferred": 100,  # 同时延后的事件数上限，超出时丢弃
+    "settings_ttl": 60,  # 群组/插件限流设置的缓存时间（秒）
+    "max_groups": 1024,  # 缓存限流设置的群组数量上限
+    "sweep_interval": 60  # 清理已回满的空闲令牌桶的间隔（秒）
+}
+
+Limit = Tuple[float, float]  # (每秒补充令牌数, 桶容量)
+# 群组ID -> (群组限制 {group/user: Limit}, {插件名: 插件限制}, 缓存到期时间)
+GroupLimits = Tuple[Dict[str, Limit], Dict[str, Dict[str, Limit]], float]
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "rate", "burst")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+        self.rate = rate
+        self.burst = burst
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_full(self, now: float) -> bool:
+        """空闲到已回满的桶与新建的桶等价，可以删除"""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+def parse_limits(settings: Optional[Dict[str, Any]]) -> Dict[str, Limit]:
+    """从 settings["rate_limit"] 读取 group / user 限制，忽略无效的配置"""
+    limits = {}
+    config = (settings or {}).get("rate_limit")
+    if not isinstance(config, dict):
+        return limits
+    for scope in ("group", "user"):
+        limit = parse_limit(config.get(scope))
+        if limit:
+            limits[scope] = limit
+    return limits
+
+
+def parse_limit(config: Any) -> Optional[Limit]:
+    if not isinstance(config, dict):
+        return None
+    try:
+        rate = float(config.get("rate") or 0)
+        burst = float(config.get("burst") or rate)
+    except (TypeError, ValueError):
+        return None
+    if rate <= 0:
+        return None
+    return rate, max(1.0, burst)
+
+
+class RateLimiter:
+    def __init__(self):
+        self.enabled = DEFAULT_RATE_LIMIT_CONFIG["enabled"]
+        self.user_limit = parse_limit(DEFAULT_RATE_LIMIT_CONFIG["user"])
+        self.action = DEFAULT_RATE_LIMIT_CONFIG["action"]
+        self.max_defer = DEFAULT_RATE_LIMIT_CONFIG["max_defer"]
+        self.max_deferred = DEFAULT_RATE_LIMIT_CONFIG["max_deferred"]
+        self.settings_ttl = DEFAULT_RATE_LIMIT_CONFIG["settings_ttl"]
+        self.max_groups = DEFAULT_RATE_LIMIT_CONFIG["max_groups"]
+        self.sweep_interval = DEFAULT_RATE_LIMIT_CONFIG["sweep_interval"]
+
+        # (范围, ...ID) -> 令牌桶
+        self._buckets: Dict[Tuple[str, ...], TokenBucket] = {}
+        self._groups: "OrderedDict[str, GroupLimits]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self._installed = False
+        self.deferring = 0
+
+        # 按范围计数：通过/丢弃/延后
+        self.allowed = 0
+        self.dropped: Counter = Counter()
+        self.deferred: Counter = Counter()
+        self.evicted = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        if config is None:
+            config = get_config_section("rate_limit", DEFAULT_RATE_LIMIT_CONFIG)
+        else:
+            config = {**DEFAULT_RATE_LIMIT_CONFIG, **config}
+        self.enabled = bool(config["enabled"])
+        self.user_limit = parse_limit(config["user"])
+        self.action = "defer" if config["action"] == "defer" else "drop"
+        self.max_defer = max(0.0, float(config["max_defer"]))
+        self.max_deferred = max(0, int(config["max_deferred"]))
+        self.settings_ttl = max(0.0, float(config["settings_ttl"]))
+        self.max_groups = max(1, int(config["max_groups"]))
+        self.sweep_interval = max(1.0, float(config["sweep_interval"]))
+        self._groups.clear()
+
+    # ---- 限流设置 ----
+
+    async def _group_limits(self, group_id: str) -> GroupLimits:
+        """群组及其插件的限流设置（未缓存或已过期时读取数据库）"""
+        entry = self._groups.get(group_id)
+        if entry is not None and time.monotonic() < entry[2]:
+            self._groups.move_to_end(group_id)
+            return entry
+
+        from modules.group.models import Group
+        from modules.plugin.models import PluginGroupSetting
+
+        async with get_db_session() as session:
+            group_settings = (await session.execute(
+                select(Group.settings).where(Group.group_id == group_id)
+            )).scalar_one_or_none()
+            plugin_rows = (await session.execute(
+                select(PluginGroupSetting.plugin_name, PluginGroupSetting.settings)
+                .where(PluginGroupSetting.group_id == group_id)
+            )).all()
+
+        plugin_limits = {}
+        for plugin_name, settings in plugin_rows:
+            limits = parse_limits(settings)
+            if limits:
+                plugin_limits[plugin_name] = limits
+
+        entry = (parse_limits(group_settings), plugin_limits, time.monotonic() + self.settings_ttl)
+        self._groups[group_id] = entry
+        self._groups.move_to_end(group_id)
+        while len(self._groups) > self.max_groups:
+            self._groups.popitem(last=False)
+        return entry
+
+    def invalidate_group(self, group_id: str = None):
+        """群组限流设置修改后调用，下次使用时重新读取（不传群组时全部清空）"""
+        if group_id is None:
+            self._groups.clear()
+        else:
+            self._groups.pop(group_id, None)
+
+    # ---- 令牌桶 ----
+
+    def _acquire(self, checks: List[Tuple[Tuple[str, ...], Limit]]) -> Optional[float]:
+        """所有桶都有令牌时才扣除；返回需要延后的秒数（0 为立即通过），超限时返回 None"""
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+
+        buckets = []
+        wait = 0.0
+        for key, (rate, burst) in checks:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+            else:
+                bucket.rate, bucket.burst = rate, burst
+                bucket.refill(now)
+            if bucket.tokens < 1:
+                wait = max(wait, (1 - bucket.tokens) / rate)
+            buckets.append(bucket)
+
+        if wait > 0 and (self.action != "defer" or wait > self.max_defer or self.deferring >= self.max_deferred):
+            return None
+        # 延后的事件预先扣除令牌（可为负数），之后的事件需要等待更久
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return wait
+
+    def _sweep(self, now: float):
+        """删除已回满的令牌桶"""
+        idle = [key for key, bucket in self._buckets.items() if bucket.is_full(now)]
+        for key in idle:
+            del self._buckets[key]
+        self.evicted += len(idle)
+        self._last_sweep = now
+
+    async def _apply(self, checks: List[Tuple[Tuple[str, ...], Limit]], scope: str) -> bool:
+        """执行限流，返回是否放行"""
+        wait = self._acquire(checks)
+        if wait is None:
+            self.dropped[scope] += 1
+            return False
+        if wait > 0:
+            self.deferred[scope] += 1
+            self.deferring += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.deferring -= 1
+        self.allowed += 1
+        return True
+
+    # ---- 检查 ----
+
+    async def check_event(self, user_id: str, group_id: Optional[str] = None) -> bool:
+        """检查用户与群组限制"""
+        checks = []
+        if self.user_limit:
+            checks.append((("user", user_id), self.user_limit))
+        if group_id is not None:
+            group_limits = (await self._group_limits(group_id))[0]
+            if "group" in group_limits:
+                checks.append((("group", group_id), group_limits["group"]))
+            if "user" in group_limits:
+                checks.append((("group_user", group_id, user_id), group_limits["user"]))
+        if not checks:
+            return True
+        return await self._apply(checks, "event")
+
+    async def check_plugin(self, plugin_name: str, user_id: str, group_id: str) -> bool:
+        """检查插件在群组中的限制"""
+        limits = (await self._group_limits(group_id))[1].get(plugin_name)
+        if not limits:
+            return True
+        checks = []
+        if "group" in limits:
+            checks.append((("plugin", plugin_name, group_id), limits["group"]))
+        if "user" in limits:
+            checks.append((("plugin_user", plugin_name, group_id, user_id), limits["user"]))
+        return await self._apply(checks, "plugin")
+
+    def install(self):
+        """注册事件预处理器（NoneBot 初始化后调用，重复调用忽略）"""
+        if self._installed:
+            return
+
+        from nonebot.adapters import Bot
+        from nonebot.adapters.onebot.v11 import MessageEvent
+        from nonebot.exception import IgnoredException
+        from nonebot.message import event_preprocessor
+
+        @event_preprocessor
+        async def limit_events(bot: Bot, event: MessageEvent):
+            if not self.enabled:
+                return
+            user_id = str(event.user_id)
+            if user_id in bot.config.superusers:
+                return
+            group_id = getattr(event, "group_id", None)
+            if not await self.check_event(user_id, str(group_id) if group_id is not None else None):
+                raise IgnoredException("消息频率超限")
+
+        self._installed = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流统计"""
+        return {
+            "enabled": self.enabled,
+            "action": self.action,
+            "user_limit": {"rate": self.user_limit[0], "burst": self.user_limit[1]} if self.user_limit else None,
+            "allowed": self.allowed,
+            "dropped": dict(self.dropped),
+            "deferred": dict(self.deferred),
+            "deferring": self.deferring,
+            "buckets": len(self._buckets),
+            "evicted_buckets": self.evicted,
+            "cached_groups": len(self._groups)
+        }
+
+
+# 全局实例
+rate_limiter = RateLimiter()
@@ -35,7 +35,10 @@ def login_required(func):
         if not token:
             raise HTTPException(status_code=401, detail="未登录")
 
-        session_info = await AuthService.validate_session(token)
+        # 认证中间件已验证过的会话直接复用
+        session_info = getattr(request.state, "user", None)
+        if not session_info or session_info.get("session_id") != token:
+            session_info = await AuthService.validate_session(token)
         if not session_info:
             raise HTTPException(status_code=401, detail="会话已过期")
 
@@ -0,0 +1,144 @@
+"""
+启动就绪信号 - 用端口与服务器状态判断就绪，代替固定等待，并记录各阶段耗时
+
+本模块只依赖标准库，可在其它模块之前导入，以便统计导入耗时（--profile-startup）。
+"""
+import asyncio
+import builtins
+import importlib.util
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    import uvicorn
+
+# 就绪检查的轮询间隔（秒）
+POLL_INTERVAL = 0.05
+
+
+def is_port_free(port: int, host: str = "0.0.0.0") -> bool:
+    """端口当前能否被绑定"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind((host, port))
+            return True
+        except OSError:
+            return False
+
+
+async def wait_port_free(port: int, timeout: float = 5.0) -> bool:
+    """等待端口释放，超时返回 False"""
+    deadline = time.monotonic() + timeout
+    while not is_port_free(port):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(POLL_INTERVAL)
+    return True
+
+
+async def wait_server_started(server: "uvicorn.Server", task: asyncio.Task, timeout: float = 10.0) -> bool:
+    """等待 uvicorn 完成启动（端口已监听）；服务器任务提前结束或超时返回 False"""
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if task.done() or time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(POLL_INTERVAL)
+    return True
+
+
+class StartupTimer:
+    """记录启动各阶段耗时"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def elapsed(self) -> float:
+        """启动以来的秒数"""
+        return time.perf_counter() - self.started_at
+
+    def report(self, title: str = "启动耗时"):
+        """打印各阶段耗时与总耗时"""
+        print(f"⏱️ {title}: {self.elapsed():.2f}s")
+        for name, elapsed in self.phases:
+            print(f"   - {name}: {elapsed * 1000:.0f}ms")
+
+
+class ImportProfiler:
+    """统计每个模块首次导入的耗时（累计耗时含其导入的子模块，自身耗时不含）"""
+
+    def __init__(self):
+        self.active = False
+        # 模块名 -> (累计耗时, 自身耗时)
+        self.records: Dict[str, Tuple[float, float]] = {}
+        self._stack: List[float] = []
+        self._original_import = None
+
+    def start(self):
+        if self.active:
+            return
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        self.active = True
+
+    def stop(self):
+        if not self.active:
+            return
+        builtins.__import__ = self._original_import
+        self.active = False
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        try:
+            full_name = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__")) if level else name
+        except (ImportError, ValueError):
+            full_name = name
+
+        # 已导入的模块不计时
+        if full_name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.records.setdefault(full_name, (elapsed, elapsed - children))
+
+    def report(self, top: int = 20):
+        """打印累计耗时最高的模块，以及按顶层包汇总的自身耗时"""
+        if not self.records:
+            print("ℹ️ 未记录到模块导入")
+            return
+
+        print(f"📦 导入耗时（累计，前 {top} 个）:")
+        for name, (cumulative, own) in sorted(self.records.items(), key=lambda item: item[1][0], reverse=True)[:top]:
+            print(f"   {cumulative * 1000:8.1f}ms  (自身 {own * 1000:7.1f}ms)  {name}")
+
+        packages: Dict[str, float] = {}
+        for name, (_, own) in self.records.items():
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0.0) + own
+        print("📦 导入耗时（按顶层包汇总）:")
+        for package, own in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+            print(f"   {own * 1000:8.1f}ms  {package}")
+
+
+# 全局实例
+startup_timer = StartupTimer()
+import_profiler = ImportProfiler()
@@ -5,6 +5,15 @@ from core.database import init_database, close_database
 from modules import register_modules
 from web.routes import register_web_routes
 from core.nonebot_manager import nonebot_manager
+from core.message_writer import message_log_writer
+from core.entity_registry import entity_registry
+from modules.plugin.enablement import plugin_enablement
+from core.flusher import stop_all_flushers
+from core.plugin_supervisor import plugin_supervisor
+from core.member_count_reconciler import member_count_reconciler
+from core.config import get_config_section
+from modules.auth.session_cache import session_cache
+from core.startup import startup_timer, import_profiler, wait_server_started
 import signal
 import sys
 
@@ -12,16 +21,35 @@ import sys
 async def setup_application():
     """设置应用程序"""
     # 创建FastAPI应用
-    app = create_application()
+    with startup_timer.phase("创建应用"):
+        app = create_application()
 
-    # 初始化数据库
+    # 初始化数据库（返回时表结构和迁移均已完成）
     await init_database()
 
-    # 注册模块
-    await register_modules(app)
+    # 读取上次保存的机器人状态
+    with startup_timer.phase("读取机器人状态"):
+        await nonebot_manager.status.load()
 
-    # 注册Web路由
-    register_web_routes(app)
+    # 预加载已知群组、用户和成员关系
+    with startup_timer.phase("预加载群组、用户与插件开关"):
+        await entity_registry.load()
+        plugin_enablement.configure()
+        await plugin_enablement.load()
+
+    # 校正群组成员数量，并定期校正偏差
+    with startup_timer.phase("校正成员数量"):
+        member_count_reconciler.configure(get_config_section("member_count"))
+        await member_count_reconciler.flush_now()
+        member_count_reconciler.ensure_started()
+
+    # 会话缓存与活动时间写回
+    session_cache.configure()
+
+    # 注册模块和Web路由
+    with startup_timer.phase("注册模块与路由"):
+        await register_modules(app)
+        register_web_routes(app)
 
     return app
 
@@ -29,10 +57,7 @@ async def setup_application():
 async def initialize_nonebot():
     """初始化NoneBot实例"""
     try:
-        # 确保数据库已经完全初始化
-        await asyncio.sleep(1)
-
-        # 加载默认配置初始化NoneBot
+        # 加载默认配置初始化NoneBot（数据库已由 setup_application 初始化完成）
         await nonebot_manager.load_config()
         success = await nonebot_manager.start_nonebot()
         if success:
@@ -51,12 +76,6 @@ async def main():
         # 设置Web应用和数据库
         app = await setup_application()
 
-        # 等待数据库完全就绪后再启动NoneBot
-        await asyncio.sleep(2)
-
-        # 初始化NoneBot
-        await initialize_nonebot()
-
         # 配置信号处理
         shutdown_event = asyncio.Event()
 
@@ -77,15 +96,31 @@ async def main():
         )
         server = uvicorn.Server(config)
 
-        print("=" * 50)
-        print("WebUI管理系统启动成功!")
-        print("访问地址: http://127.0.0.1:8080")
-        print("默认管理员账户: admin / admin123")
-        print("按 Ctrl+C 退出")
-        print("=" * 50)
-
-        # 创建服务器任务
+        # 先启动WebUI（不依赖NoneBot），创建服务器任务并等待端口开始监听
         server_task = asyncio.create_task(server.serve())
+        with startup_timer.phase("启动WebUI"):
+            started = await wait_server_started(server, server_task)
+
+        if started:
+            print("=" * 50)
+            print("WebUI管理系统启动成功!")
+            print("访问地址: http://127.0.0.1:8080")
+            print("默认管理员账户: admin / admin123")
+            print("按 Ctrl+C 退出")
+            print("=" * 50)
+            print(f"⏱️ WebUI 已可访问，距启动 {startup_timer.elapsed():.2f}s")
+
+            # WebUI 已在服务请求，再初始化NoneBot（返回时NoneBot服务器已开始监听）
+            with startup_timer.phase("启动NoneBot"):
+                await initialize_nonebot()
+        else:
+            print("❌ WebUI服务器启动失败")
+            shutdown_event.set()
+
+        startup_timer.report()
+        if import_profiler.active:
+            import_profiler.stop()
+            import_profiler.report()
 
         try:
             # 等待关闭事件或服务器完成
@@ -119,6 +154,11 @@ async def main():
     finally:
         # 清理资源
         print("🧹 清理资源...")
+        # 写回内存中合并的数据和尚未落库的消息日志
+        await stop_all_flushers()
+        await nonebot_manager.status.stop()
+        await plugin_supervisor.stop()
+        await message_log_writer.stop()
         await close_database()
         print("✅ 程序已退出")
 
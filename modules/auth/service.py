@@ -3,6 +3,7 @@ import secrets
 from datetime import datetime
 from typing import Optional, Dict, Any
 from .models import AdminUser, AdminSession
+from .session_cache import session_cache
 from core.database import get_db_session
 from sqlalchemy import select
 
@@ -58,10 +59,16 @@ class AuthService:
 
     @staticmethod
     async def validate_session(session_id: str) -> Optional[Dict[str, Any]]:
-        """验证会话 - 使用ORM"""
+        """验证会话 - 优先使用缓存，最后活动时间合并后定期写回"""
         if not session_id:
             return None
 
+        session_info = session_cache.get(session_id)
+        if session_info:
+            session_cache.touch(session_id)
+            return session_info
+
+        generation = session_cache.generation
         async with get_db_session() as session:
             try:
                 # 使用ORM查询
@@ -73,14 +80,10 @@ class AuthService:
                 )
                 admin_session = result.scalar_one_or_none()
 
-                if not admin_session or admin_session.is_expired():
+                if not admin_session or admin_session.is_expired(session_cache.expiry_hours):
                     return None
 
-                # 更新最后活动时间
-                admin_session.last_activity = datetime.now()
-                await session.commit()
-
-                return {
+                session_info = {
                     "username": admin_session.username,
                     "login_time": admin_session.login_time,
                     "session_id": admin_session.session_id
@@ -89,6 +92,11 @@ class AuthService:
                 print(f"验证会话失败: {e}")
                 return None
 
+        session_cache.put(session_id, session_info, generation)
+        # 更新最后活动时间
+        session_cache.touch(session_id)
+        return session_info
+
     @staticmethod
     async def logout_session(session_id: str) -> bool:
         """注销会话 - 使用ORM"""
@@ -109,6 +117,9 @@ class AuthService:
                 print(f"注销会话失败: {e}")
                 await session.rollback()
                 return False
+            finally:
+                # 无论数据库是否更新成功，都不再使用缓存中的会话
+                session_cache.invalidate(session_id)
 
     @staticmethod
     async def create_default_admin():
@@ -0,0 +1,118 @@
+"""
+会话缓存 - 缓存已验证的会话，合并 last_activity 更新后定期写回
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import update, bindparam
+
+from core.config import get_config_section
+from core.database import get_db_session
+from core.flusher import PeriodicFlusher
+from .models import AdminSession
+
+DEFAULT_SESSION_CONFIG = {
+    "session_cache_ttl": 60,  # 已验证会话的缓存时间（秒）
+    "activity_write_interval": 60,  # last_activity 写回间隔（秒），每个会话每个间隔最多写一次
+    "session_expiry_hours": 24  # 会话有效期（小时），与 AdminSession.is_expired 默认值一致
+}
+
+_sessions = AdminSession.__table__
+
+_ACTIVITY_UPDATE = (
+    update(_sessions)
+    .where(_sessions.c.session_id == bindparam("b_session_id"), _sessions.c.is_active == True)
+    .values(last_activity=bindparam("b_time"))
+)
+
+
+class SessionCache(PeriodicFlusher):
+    def __init__(self):
+        super().__init__("会话活动写回", DEFAULT_SESSION_CONFIG["activity_write_interval"])
+        self.ttl = DEFAULT_SESSION_CONFIG["session_cache_ttl"]
+        self.expiry_hours = DEFAULT_SESSION_CONFIG["session_expiry_hours"]
+        # session_id -> (会话信息, 缓存到期时间)
+        self._entries: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        # 待写回的最后活动时间
+        self._activity: Dict[str, datetime] = {}
+        # 每次失效递增，防止并发验证把刚注销的会话重新放回缓存
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.flushed_rows = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        if config is None:
+            config = get_config_section("auth", DEFAULT_SESSION_CONFIG)
+        else:
+            config = {**DEFAULT_SESSION_CONFIG, **config}
+        self.ttl = max(0.0, float(config["session_cache_ttl"]))
+        self.interval = max(1.0, float(config["activity_write_interval"]))
+        self.expiry_hours = max(1, int(config["session_expiry_hours"]))
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """取出仍在缓存期内且未过期的会话"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        info, cached_until = entry
+        if time.monotonic() >= cached_until or datetime.now() > info["login_time"] + timedelta(hours=self.expiry_hours):
+            self._entries.pop(session_id, None)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return info
+
+    def put(self, session_id: str, info: Dict[str, Any], generation: int):
+        """缓存验证结果；generation 为开始验证前读取的版本号"""
+        if self.ttl > 0 and generation == self.generation:
+            self._entries[session_id] = (info, time.monotonic() + self.ttl)
+
+    def invalidate(self, session_id: str):
+        """会话注销时立即失效"""
+        self.generation += 1
+        self._entries.pop(session_id, None)
+        self._activity.pop(session_id, None)
+
+    def touch(self, session_id: str):
+        """记录会话活动，下次刷新时写回"""
+        self._activity[session_id] = datetime.now()
+        self.ensure_started()
+
+    async def flush(self):
+        """一次事务内写回所有会话的最后活动时间"""
+        if not self._activity:
+            return
+
+        activity, self._activity = self._activity, {}
+        async with get_db_session() as session:
+            try:
+                await session.execute(_ACTIVITY_UPDATE, [
+                    {"b_session_id": session_id, "b_time": when} for session_id, when in activity.items()
+                ])
+                await session.commit()
+                self.flushed_rows += len(activity)
+            except Exception:
+                await session.rollback()
+                for session_id, when in activity.items():
+                    self._activity.setdefault(session_id, when)
+                raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._entries),
+            "pending_activity": len(self._activity),
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushed": self.flushed_rows
+        }
+
+
+# 全局实例
+session_cache = SessionCache()
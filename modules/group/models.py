@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, UniqueConstraint, Index
 from datetime import datetime
 from core.database import Base
 
 
 class Group(Base):
     __tablename__ = "groups"
+    __table_args__ = (
+        Index("ix_groups_updated_id", "updated_at", "id"),  # 群组列表游标分页
+    )
 
     id = Column(Integer, primary_key=True)
     group_id = Column(String(20), unique=True, nullable=False)
@@ -17,11 +20,15 @@ class Group(Base):
     last_active = Column(DateTime, default=datetime.now)  # 最后活动时间
     settings = Column(JSON, default=dict)  # 群设置
     created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
 
 class GroupUser(Base):
     __tablename__ = "group_users"
+    __table_args__ = (
+        UniqueConstraint("group_id", "user_id", name="uq_group_users_group_user"),
+        Index("ix_group_users_group_messages", "group_id", "message_count", "id"),  # 群成员列表游标分页
+    )
 
     id = Column(Integer, primary_key=True)
     group_id = Column(String(20), nullable=False)
@@ -30,7 +37,7 @@ class GroupUser(Base):
     user_card = Column(String(100))  # 群名片
     join_time = Column(DateTime)  # 加群时间
     last_speak = Column(DateTime)  # 最后发言时间
-    message_count = Column(Integer, default=0)  # 消息数量 - 重要：统计谁话多
+    message_count = Column(Integer, nullable=False, default=0)  # 消息数量 - 重要：统计谁话多
     role = Column(String(20), default="member")  # 角色: owner/admin/member
     is_banned = Column(Boolean, default=False)  # 是否被封禁
     ban_reason = Column(String(200))
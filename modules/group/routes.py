@@ -1,25 +1,36 @@
 from fastapi import APIRouter, HTTPException, Request, Query
-from typing import Optional
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
 from .service import GroupService
+from utils.pagination import InvalidCursor
 from core.security import verify_token
 
 router = APIRouter(prefix="/api/groups", tags=["groups"])
 
 
+class SettingsUpdate(BaseModel):
+    settings: Dict[str, Any]
+
+
 @router.get("/")
 async def get_groups(
         request: Request,
         page: int = Query(1, ge=1),
         page_size: int = Query(20, ge=1, le=100),
         search: str = Query(None),
-        enabled: Optional[bool] = Query(None)
+        enabled: Optional[bool] = Query(None),
+        cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 page"),
+        include_total: bool = Query(True, description="是否统计总数，翻页时可传 false 跳过 COUNT")
 ):
     """获取群组列表"""
     token = request.cookies.get("access_token")
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await GroupService.get_groups(page, page_size, search, enabled)
+    try:
+        return await GroupService.get_groups(page, page_size, search, enabled, cursor, include_total)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{group_id}")
@@ -64,6 +75,20 @@ async def disable_group(request: Request, group_id: str):
         raise HTTPException(status_code=404, detail="群组不存在")
 
 
+@router.put("/{group_id}/settings")
+async def update_group_settings(request: Request, group_id: str, body: SettingsUpdate):
+    """更新群组设置（如 {"rate_limit": {"group": {"rate": 2, "burst": 20}}}）"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    success = await GroupService.update_group_settings(group_id, body.settings)
+    if success:
+        return {"success": True, "message": "群组设置已更新"}
+    else:
+        raise HTTPException(status_code=404, detail="群组不存在")
+
+
 @router.get("/{group_id}/users")
 async def get_group_users(
         request: Request,
@@ -71,14 +96,19 @@ async def get_group_users(
         page: int = Query(1, ge=1),
         page_size: int = Query(20, ge=1, le=100),
         search: str = Query(None),
-        banned: Optional[bool] = Query(None)
+        banned: Optional[bool] = Query(None),
+        cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 page"),
+        include_total: bool = Query(True, description="是否统计总数，翻页时可传 false 跳过 COUNT")
 ):
     """获取群成员列表"""
     token = request.cookies.get("access_token")
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await GroupService.get_group_users(group_id, page, page_size, search, banned)
+    try:
+        return await GroupService.get_group_users(group_id, page, page_size, search, banned, cursor=cursor, include_total=include_total)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/{group_id}/users/{user_id}/ban")
@@ -1,9 +1,66 @@
 from typing import List, Dict, Any, Optional
-from sqlalchemy import select, func, and_
+from collections import Counter
+from sqlalchemy import select, func, and_, update, delete, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from .models import Group, GroupUser
-from core.database import get_db_session
+from core.database import get_db_session, use_session
+from core.count_cache import count_cache
+from core.rate_limiter import rate_limiter
+from utils.pagination import SortKey, apply_cursor, split_page
 from datetime import datetime, timedelta
 
+_groups = Group.__table__
+_members = GroupUser.__table__
+
+# 群组 UPSERT：新群组直接插入，已有群组只覆盖传入的字段
+_group_insert = sqlite_insert(_groups).values(
+    group_id=bindparam("b_group_id"),
+    group_name=func.coalesce(bindparam("b_group_name"), bindparam("b_default_name")),
+    last_active=bindparam("b_last_active"),
+    current_users=0,
+    created_time=bindparam("b_now")
+)
+_GROUP_UPSERT = _group_insert.on_conflict_do_update(
+    index_elements=[_groups.c.group_id],
+    set_={
+        "group_name": func.coalesce(bindparam("b_group_name"), _groups.c.group_name),
+        "last_active": _group_insert.excluded.last_active,
+        "updated_at": bindparam("b_now")
+    }
+)
+
+# 群成员 UPSERT：依赖 (group_id, user_id) 唯一约束，并发事件不会产生重复成员
+_member_insert = sqlite_insert(_members).values(
+    group_id=bindparam("b_group_id"),
+    user_id=bindparam("b_user_id"),
+    user_name=func.coalesce(bindparam("b_user_name"), bindparam("b_default_name")),
+    user_card=bindparam("b_user_card"),
+    join_time=func.coalesce(bindparam("b_join_time"), bindparam("b_now")),
+    last_speak=func.coalesce(bindparam("b_last_speak"), bindparam("b_now")),
+    message_count=func.coalesce(bindparam("b_message_count"), 0)
+)
+# 第一步：只插入新成员，RETURNING 返回真正新增的行，用于维护群组成员数量
+_MEMBER_INSERT_NEW = _member_insert.on_conflict_do_nothing(
+    index_elements=[_members.c.group_id, _members.c.user_id]
+).returning(_members.c.group_id, _members.c.user_id)
+# 第二步：已存在的成员只覆盖传入的字段
+_MEMBER_UPSERT = _member_insert.on_conflict_do_update(
+    index_elements=[_members.c.group_id, _members.c.user_id],
+    set_={
+        "user_name": func.coalesce(bindparam("b_user_name"), _members.c.user_name),
+        "user_card": func.coalesce(bindparam("b_user_card"), _members.c.user_card),
+        "last_speak": func.coalesce(bindparam("b_last_speak"), _members.c.last_speak),
+        "message_count": func.coalesce(bindparam("b_message_count"), _members.c.message_count),
+        "updated_at": bindparam("b_now")
+    }
+)
+_GROUP_MEMBER_INCREMENT = (
+    update(_groups)
+    .where(_groups.c.group_id == bindparam("b_group_id"))
+    .values(current_users=func.coalesce(_groups.c.current_users, 0) + bindparam("b_delta"))
+)
+
 
 class GroupService:
     @staticmethod
@@ -11,7 +68,9 @@ class GroupService:
             page: int = 1,
             page_size: int = 20,
             search: str = None,
-            enabled: bool = None
+            enabled: bool = None,
+            cursor: str = None,
+            include_total: bool = True
     ) -> Dict[str, Any]:
         """获取群组列表 - 使用ORM"""
         async with get_db_session() as session:
@@ -28,17 +87,18 @@ class GroupService:
             if enabled is not None:
                 query = query.where(Group.is_enabled == enabled)
 
-            # 总数
-            total_query = select(func.count()).select_from(query.subquery())
-            total_result = await session.execute(total_query)
-            total = total_result.scalar_one()
+            # 总数（结果缓存，写入后失效；include_total=False 时跳过）
+            total = await count_cache.count(session, query, include_total)
 
             # 分页数据
-            query = query.order_by(Group.updated_at.desc())
-            query = query.offset((page - 1) * page_size).limit(page_size)
+            # 传入游标时按 (排序键, id) 定位，否则沿用 OFFSET 分页
+            keys = [SortKey(Group.updated_at), SortKey(Group.id)]
+            query = apply_cursor(query, keys, cursor)
+            if not cursor:
+                query = query.offset((page - 1) * page_size)
 
-            result = await session.execute(query)
-            groups = result.scalars().all()
+            result = await session.execute(query.limit(page_size + 1))
+            groups, next_cursor = split_page(result.scalars().all(), keys, page_size)
 
             return {
                 "groups": [{
@@ -58,14 +118,15 @@ class GroupService:
                 "total": total,
                 "page": page,
                 "page_size": page_size,
-                "total_pages": (total + page_size - 1) // page_size
+                "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+                "next_cursor": next_cursor
             }
 
     @staticmethod
-    async def get_group(group_id: str) -> Optional[Group]:
+    async def get_group(group_id: str, session: AsyncSession = None) -> Optional[Group]:
         """获取单个群组 - 使用ORM"""
-        async with get_db_session() as session:
-            result = await session.execute(
+        async with use_session(session) as db:
+            result = await db.execute(
                 select(Group).where(Group.group_id == group_id)
             )
             return result.scalar_one_or_none()
@@ -88,8 +149,15 @@ class GroupService:
 
             group.updated_at = datetime.now()
             await session.commit()
+            if "settings" in kwargs:
+                rate_limiter.invalidate_group(group_id)
             return True
 
+    @staticmethod
+    async def update_group_settings(group_id: str, settings: Dict[str, Any]) -> bool:
+        """更新群组设置（限流等）"""
+        return await GroupService.update_group(group_id, settings=settings)
+
     @staticmethod
     async def enable_group(group_id: str) -> bool:
         """启用群组 - 使用ORM"""
@@ -106,10 +174,13 @@ class GroupService:
             page: int = 1,
             page_size: int = 20,
             search: str = None,
-            banned: bool = None
+            banned: bool = None,
+            session: AsyncSession = None,
+            cursor: str = None,
+            include_total: bool = True
     ) -> Dict[str, Any]:
         """获取群成员列表 - 使用ORM"""
-        async with get_db_session() as session:
+        async with use_session(session) as db:
             query = select(GroupUser).where(GroupUser.group_id == group_id)
 
             if search:
@@ -122,17 +193,18 @@ class GroupService:
             if banned is not None:
                 query = query.where(GroupUser.is_banned == banned)
 
-            # 总数
-            total_query = select(func.count()).select_from(query.subquery())
-            total_result = await session.execute(total_query)
-            total = total_result.scalar_one()
+            # 总数（结果缓存，写入后失效；include_total=False 时跳过）
+            total = await count_cache.count(db, query, include_total)
 
             # 分页数据
-            query = query.order_by(GroupUser.message_count.desc())
-            query = query.offset((page - 1) * page_size).limit(page_size)
+            # 传入游标时按 (排序键, id) 定位，否则沿用 OFFSET 分页
+            keys = [SortKey(GroupUser.message_count), SortKey(GroupUser.id)]
+            query = apply_cursor(query, keys, cursor)
+            if not cursor:
+                query = query.offset((page - 1) * page_size)
 
-            result = await session.execute(query)
-            users = result.scalars().all()
+            result = await db.execute(query.limit(page_size + 1))
+            users, next_cursor = split_page(result.scalars().all(), keys, page_size)
 
             return {
                 "users": [{
@@ -154,7 +226,9 @@ class GroupService:
                 } for user in users],
                 "total": total,
                 "page": page,
-                "page_size": page_size
+                "page_size": page_size,
+                "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+                "next_cursor": next_cursor
             }
 
     @staticmethod
@@ -234,44 +308,42 @@ class GroupService:
     async def update_group_info(
             group_id: str,
             group_name: str = None,
-            last_active: datetime = None
+            last_active: datetime = None,
+            session: AsyncSession = None
     ):
-        """更新群组信息"""
-        async with get_db_session() as session:
-            try:
-                # 查找现有群组
-                result = await session.execute(
-                    select(Group).where(Group.group_id == group_id)
-                )
-                group = result.scalar_one_or_none()
-
-                if group:
-                    # 更新现有群组
-                    if group_name:
-                        group.group_name = group_name
-                    if last_active:
-                        group.last_active = last_active
-                    else:
-                        group.last_active = datetime.now()
-
-                    # 更新成员数量
-                    group.current_users = await GroupService.get_group_user_count(group_id)
-                else:
-                    # 创建新群组
-                    group = Group(
-                        group_id=group_id,
-                        group_name=group_name or f"群{group_id}",
-                        last_active=last_active or datetime.now(),
-                        current_users=1,
-                        created_time=datetime.now()
-                    )
-                    session.add(group)
+        """更新群组信息（传入session时加入调用方的工作单元）"""
+        try:
+            await GroupService.upsert_groups([{
+                "group_id": group_id,
+                "group_name": group_name,
+                "last_active": last_active
+            }], session=session)
+            print(f"✅ 群组信息更新: {group_id}")
+        except Exception as e:
+            print(f"❌ 更新群组信息失败: {e}")
+            if session is not None:
+                raise
 
-                await session.commit()
-                print(f"✅ 群组信息更新: {group_id}")
-            except Exception as e:
-                print(f"❌ 更新群组信息失败: {e}")
-                await session.rollback()
+    @staticmethod
+    async def upsert_groups(groups: List[Dict[str, Any]], session: AsyncSession = None):
+        """批量插入或更新群组（INSERT ... ON CONFLICT DO UPDATE）
+
+        每项需包含 group_id，可选 group_name、last_active；未传入的字段保持原值。
+        """
+        if not groups:
+            return
+
+        now = datetime.now()
+        params = [{
+            "b_group_id": group["group_id"],
+            "b_group_name": group.get("group_name") or None,
+            "b_default_name": f"群{group['group_id']}",
+            "b_last_active": group.get("last_active") or now,
+            "b_now": now
+        } for group in groups]
+
+        async with use_session(session) as db:
+            await db.execute(_GROUP_UPSERT, params)
 
     @staticmethod
     async def update_group_user(
@@ -281,54 +353,122 @@ class GroupService:
             user_card: str = None,
             last_speak: datetime = None,
             join_time: datetime = None,
-            message_count: int = None
+            message_count: int = None,
+            session: AsyncSession = None
     ):
-        """更新群组成员信息"""
-        async with get_db_session() as session:
-            try:
-                # 查找现有成员
-                result = await session.execute(
-                    select(GroupUser).where(
-                        GroupUser.group_id == group_id,
-                        GroupUser.user_id == user_id
-                    )
+        """更新群组成员信息（传入session时加入调用方的工作单元）"""
+        try:
+            await GroupService.upsert_group_users([{
+                "group_id": group_id,
+                "user_id": user_id,
+                "user_name": user_name,
+                "user_card": user_card,
+                "last_speak": last_speak,
+                "join_time": join_time,
+                "message_count": message_count
+            }], session=session)
+            print(f"✅ 群组成员更新: {group_id} - {user_id}")
+        except Exception as e:
+            print(f"❌ 更新群组成员失败: {e}")
+            if session is not None:
+                raise
+
+    @staticmethod
+    async def upsert_group_users(members: List[Dict[str, Any]], session: AsyncSession = None) -> int:
+        """批量插入或更新群组成员，返回新增的成员数
+
+        每项需包含 group_id、user_id，可选 user_name、user_card、last_speak、join_time、message_count；
+        消息计数由 core.message_counter 原子自增，这里只写入显式指定的值。
+        新增成员会在同一事务内累加所在群组的 current_users。
+        """
+        if not members:
+            return 0
+
+        now = datetime.now()
+        params = [{
+            "b_group_id": member["group_id"],
+            "b_user_id": member["user_id"],
+            "b_user_name": member.get("user_name") or None,
+            "b_default_name": f"用户{member['user_id']}",
+            "b_user_card": member.get("user_card") or None,
+            "b_join_time": member.get("join_time"),
+            "b_last_speak": member.get("last_speak"),
+            "b_message_count": member.get("message_count"),
+            "b_now": now
+        } for member in members]
+
+        async with use_session(session) as db:
+            result = await db.execute(_MEMBER_INSERT_NEW, params)
+            inserted = {(row.group_id, row.user_id) for row in result}
+
+            existing = [p for p in params if (p["b_group_id"], p["b_user_id"]) not in inserted]
+            if existing:
+                await db.execute(_MEMBER_UPSERT, existing)
+
+            # 新成员加入，群组成员数量随之增加
+            if inserted:
+                deltas = Counter(group_id for group_id, _ in inserted)
+                await db.execute(_GROUP_MEMBER_INCREMENT, [
+                    {"b_group_id": group_id, "b_delta": delta} for group_id, delta in deltas.items()
+                ])
+
+        return len(inserted)
+
+    @staticmethod
+    async def remove_group_user(group_id: str, user_id: str, session: AsyncSession = None) -> bool:
+        """移除群组成员（成员离开群组时调用）"""
+        async with use_session(session) as db:
+            result = await db.execute(
+                delete(GroupUser).where(
+                    GroupUser.group_id == group_id,
+                    GroupUser.user_id == user_id
                 )
-                group_user = result.scalar_one_or_none()
-
-                if group_user:
-                    # 更新现有成员
-                    if user_name: group_user.user_name = user_name
-                    if user_card: group_user.user_card = user_card
-                    if last_speak: group_user.last_speak = last_speak
-                    if message_count is not None:
-                        group_user.message_count = message_count
-                    else:
-                        # 如果没有指定message_count，自动增加1
-                        group_user.message_count += 1
-                else:
-                    # 创建新成员
-                    group_user = GroupUser(
-                        group_id=group_id,
-                        user_id=user_id,
-                        user_name=user_name or f"用户{user_id}",
-                        user_card=user_card,
-                        join_time=join_time or datetime.now(),
-                        last_speak=last_speak or datetime.now(),
-                        message_count=message_count or 1
-                    )
-                    session.add(group_user)
+            )
+            if not result.rowcount:
+                return False
 
-                await session.commit()
-                print(f"✅ 群组成员更新: {group_id} - {user_id}")
-            except Exception as e:
-                print(f"❌ 更新群组成员失败: {e}")
-                await session.rollback()
+            # 成员离开，群组成员数量减一
+            await db.execute(
+                update(_groups)
+                .where(_groups.c.group_id == group_id)
+                .values(current_users=func.max(func.coalesce(_groups.c.current_users, 0) - result.rowcount, 0))
+            )
+            return True
+
+    @staticmethod
+    async def reconcile_member_counts(session: AsyncSession = None) -> int:
+        """按 group_users 实际数据批量校正所有群组的成员数量，返回被修正的群组数"""
+        actual_count = (
+            select(func.count(GroupUser.id))
+            .where(GroupUser.group_id == Group.group_id)
+            .scalar_subquery()
+        )
+        async with use_session(session) as db:
+            result = await db.execute(
+                update(Group)
+                .where(func.coalesce(Group.current_users, -1) != actual_count)
+                .values(current_users=actual_count)
+                .execution_options(synchronize_session=False)
+            )
+            return result.rowcount
 
     @staticmethod
-    async def get_group_user_count(group_id: str) -> int:
+    async def get_group_user(group_id: str, user_id: str, session: AsyncSession = None) -> Optional[GroupUser]:
+        """获取单个群组成员"""
+        async with use_session(session) as db:
+            result = await db.execute(
+                select(GroupUser).where(
+                    GroupUser.group_id == group_id,
+                    GroupUser.user_id == user_id
+                )
+            )
+            return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_group_user_count(group_id: str, session: AsyncSession = None) -> int:
         """获取群组成员数量"""
-        async with get_db_session() as session:
-            result = await session.execute(
+        async with use_session(session) as db:
+            result = await db.execute(
                 select(func.count(GroupUser.id)).where(GroupUser.group_id == group_id)
             )
             return result.scalar_one()
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index
 from datetime import datetime
 from core.database import Base
 
 
 class MessageLog(Base):
     __tablename__ = "message_logs"
+    __table_args__ = (
+        Index("ix_message_logs_group_time", "group_id", "timestamp"),
+        Index("ix_message_logs_user_time", "user_id", "timestamp"),
+        Index("ix_message_logs_time_id", "timestamp", "id"),  # 不带过滤条件的游标分页
+    )
 
     id = Column(Integer, primary_key=True)
     group_id = Column(String(20), nullable=False)
@@ -13,12 +18,16 @@ class MessageLog(Base):
     message_type = Column(String(20))  # group/private
     message_content = Column(Text)
     raw_message = Column(Text)
-    timestamp = Column(DateTime, default=datetime.now)
+    timestamp = Column(DateTime, nullable=False, default=datetime.now)
     is_recalled = Column(Boolean, default=False)  # 是否被撤回
 
 
 class SystemLog(Base):
     __tablename__ = "system_logs"
+    __table_args__ = (
+        Index("ix_system_logs_created_level", "created_at", "level"),
+        Index("ix_system_logs_created_id", "created_at", "id"),  # 游标分页
+    )
 
     id = Column(Integer, primary_key=True)
     level = Column(String(20))  # DEBUG/INFO/WARNING/ERROR/CRITICAL
@@ -27,11 +36,14 @@ class SystemLog(Base):
     details = Column(Text)  # 详细错误信息
     user_id = Column(String(20))  # 操作用户
     ip_address = Column(String(45))
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
 
 
 class OperationLog(Base):
     __tablename__ = "operation_logs"
+    __table_args__ = (
+        Index("ix_operation_logs_created_id", "created_at", "id"),  # 游标分页
+    )
 
     id = Column(Integer, primary_key=True)
     operator = Column(String(50))  # 操作者
@@ -41,4 +53,4 @@ class OperationLog(Base):
     description = Column(Text)
     ip_address = Column(String(45))
     user_agent = Column(Text)
-    created_at = Column(DateTime, default=datetime.now)
\ No newline at end of file
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
\ No newline at end of file
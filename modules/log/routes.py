@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Request, Query
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from .service import LogService
+from utils.pagination import InvalidCursor
 from core.security import verify_token
 
 router = APIRouter(prefix="/api/logs", tags=["logs"])
@@ -15,14 +16,36 @@ async def get_message_logs(
         page: int = Query(1, ge=1),
         page_size: int = Query(20, ge=1, le=100),
         start_time: Optional[datetime] = Query(None),
-        end_time: Optional[datetime] = Query(None)
+        end_time: Optional[datetime] = Query(None),
+        q: Optional[str] = Query(None, max_length=200, description="按消息内容搜索"),
+        cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 page"),
+        include_total: bool = Query(True, description="是否统计总数，翻页时可传 false 跳过 COUNT")
 ):
     """获取消息日志"""
     token = request.cookies.get("access_token")
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await LogService.get_message_logs(group_id, user_id, page, page_size, start_time, end_time)
+    try:
+        return await LogService.get_message_logs(
+            group_id, user_id, page, page_size, start_time, end_time, cursor, include_total, q
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/messages")
+async def delete_message_logs(
+        request: Request,
+        days: int = Query(..., ge=1, description="删除该天数之前的消息日志")
+):
+    """清理消息日志（同步全文索引）"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    deleted = await LogService.delete_message_logs(datetime.now() - timedelta(days=days))
+    return {"success": True, "deleted": deleted}
 
 
 @router.get("/system")
@@ -32,14 +55,19 @@ async def get_system_logs(
         module: Optional[str] = Query(None),
         page: int = Query(1, ge=1),
         page_size: int = Query(20, ge=1, le=100),
-        days: int = Query(7, ge=1, le=365)
+        days: int = Query(7, ge=1, le=365),
+        cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 page"),
+        include_total: bool = Query(True, description="是否统计总数，翻页时可传 false 跳过 COUNT")
 ):
     """获取系统日志"""
     token = request.cookies.get("access_token")
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await LogService.get_system_logs(level, module, page, page_size, days)
+    try:
+        return await LogService.get_system_logs(level, module, page, page_size, days, cursor, include_total)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/operations")
@@ -49,14 +77,19 @@ async def get_operation_logs(
         operation_type: Optional[str] = Query(None),
         page: int = Query(1, ge=1),
         page_size: int = Query(20, ge=1, le=100),
-        days: int = Query(30, ge=1, le=365)
+        days: int = Query(30, ge=1, le=365),
+        cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 page"),
+        include_total: bool = Query(True, description="是否统计总数，翻页时可传 false 跳过 COUNT")
 ):
     """获取操作日志"""
     token = request.cookies.get("access_token")
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await LogService.get_operation_logs(operator, operation_type, page, page_size, days)
+    try:
+        return await LogService.get_operation_logs(operator, operation_type, page, page_size, days, cursor, include_total)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/stats")
@@ -66,4 +99,15 @@ async def get_log_stats(request: Request):
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await LogService.get_log_stats()
\ No newline at end of file
+    return await LogService.get_log_stats()
+
+
+@router.get("/writer/stats")
+async def get_writer_stats(request: Request):
+    """获取消息日志写入器统计"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    from core.message_writer import message_log_writer
+    return message_log_writer.get_stats()
\ No newline at end of file
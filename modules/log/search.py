@@ -0,0 +1,276 @@
+"""
+消息全文检索 - message_logs 的 FTS5 索引
+
+优先使用 trigram 分词（SQLite >= 3.34，中英文都按三字切分）；
+不支持时退回 unicode61 分词，并由 fts_bigram() 把连续的中日韩文字切成二元组后再入索引。
+trigram 无法匹配少于三个字的词，而中文词大多只有两个字，因此 trigram 模式下另建一个
+二元切分索引（message_logs_fts_bigram）专门用于两个字的中日韩搜索词。
+
+trigram 索引由 message_logs 上的触发器同步维护（只用 SQLite 内置功能）；
+二元切分索引需要 Python 切分，不使用触发器（否则其它连接写入 message_logs 会因缺少
+fts_bigram() 而失败），由 LogService 批量写入/删除消息时调用 index_messages / unindex_messages
+同步。绕过 LogService 直接写入或删除的消息不会同步到二元切分索引，可调用 rebuild_bigram_indexes 重建。
+"""
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+FTS_TABLE = "message_logs_fts"
+FTS_BIGRAM_TABLE = "message_logs_fts_bigram"  # trigram 模式下的短词索引
+MIN_TRIGRAM_LENGTH = 3
+
+# 摘要中命中词的标记，由前端转义后替换为 <mark>
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+SNIPPET_TOKENS = 16
+SNIPPET_CHARS = 40
+
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+")
+
+# 当前索引模式：trigram / bigram，None 表示尚未检测，"" 表示索引不存在
+_mode: Optional[str] = None
+# trigram 模式下是否已有短词索引
+_has_bigram_table = False
+
+
+def bigram(value: Optional[str]) -> str:
+    """把连续的中日韩文字切成重叠的二元组，其余文本保持不变"""
+    if not value:
+        return ""
+
+    def split(match):
+        run = match.group(0)
+        if len(run) == 1:
+            return f" {run} "
+        return " " + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + " "
+
+    return _CJK_RUN.sub(split, value)
+
+
+def register_functions(dbapi_connection, connection_record=None):
+    """连接建立时注册 fts_bigram()，建立和重建二元切分索引时使用"""
+    dbapi_connection.create_function("fts_bigram", 1, bigram, deterministic=True)
+
+
+def _create_trigram_index(conn: Connection):
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"message_content, content='message_logs', content_rowid='id', tokenize='trigram')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON message_logs BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, message_content) VALUES (new.id, new.message_content); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON message_logs BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message_content) VALUES ('delete', old.id, old.message_content); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF message_content ON message_logs BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message_content) VALUES ('delete', old.id, old.message_content); "
+        f"INSERT INTO {FTS_TABLE}(rowid, message_content) VALUES (new.id, new.message_content); END"
+    ))
+    # 为已有消息建立索引
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _create_bigram_index(conn: Connection, name: str = FTS_TABLE):
+    # 索引内容是二元切分后的文本，与原文不同，因此使用无内容表（content=''）；不建触发器，见模块说明
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {name} USING fts5("
+        f"message_content, content='', tokenize='unicode61')"
+    ))
+    _fill_bigram_index(conn, name)
+
+
+def _fill_bigram_index(conn: Connection, name: str):
+    conn.execute(text(
+        f"INSERT INTO {name}(rowid, message_content) "
+        f"SELECT id, fts_bigram(message_content) FROM message_logs"
+    ))
+
+
+def _bigram_table_names(conn: Connection) -> List[str]:
+    """数据库中的二元切分索引表"""
+    names = []
+    sql = _table_sql(conn, FTS_TABLE)
+    if sql is not None and "trigram" not in sql:
+        names.append(FTS_TABLE)
+    if _table_sql(conn, FTS_BIGRAM_TABLE) is not None:
+        names.append(FTS_BIGRAM_TABLE)
+    return names
+
+
+def _table_sql(conn: Connection, name: str) -> Optional[str]:
+    return conn.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": name}).scalar()
+
+
+def create_message_index(conn: Connection):
+    """创建全文索引、同步触发器并回填已有消息（迁移中调用）"""
+    global _mode
+
+    if _table_sql(conn, FTS_TABLE) is not None:
+        return
+
+    try:
+        # 建表失败（不支持 trigram）不会留下任何对象，可以直接改用 bigram
+        _create_trigram_index(conn)
+        _mode = "trigram"
+    except OperationalError as e:
+        print(f"⚠️ 当前 SQLite 不支持 trigram 分词（{e.orig}），使用 unicode61 + 二元切分")
+        _create_bigram_index(conn)
+        _mode = "bigram"
+
+
+def create_short_term_index(conn: Connection):
+    """trigram 模式下补建二元切分的短词索引（迁移中调用；bigram 模式的主索引已能匹配两个字的词）"""
+    global _mode
+
+    sql = _table_sql(conn, FTS_TABLE)
+    if sql is None or "trigram" not in sql or _table_sql(conn, FTS_BIGRAM_TABLE) is not None:
+        return
+    _create_bigram_index(conn, FTS_BIGRAM_TABLE)
+    _mode = None  # 重新检测
+
+
+def drop_bigram_triggers(conn: Connection):
+    """删除旧版本为二元切分索引建立的触发器（迁移中调用），之后改由 LogService 同步"""
+    for name in _bigram_table_names(conn):
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}_{suffix}"))
+
+
+def rebuild_bigram_indexes(conn: Connection):
+    """按 message_logs 当前内容重建二元切分索引（绕过 LogService 写入或删除消息后调用，需在本应用的连接上执行）"""
+    for name in _bigram_table_names(conn):
+        conn.execute(text(f"INSERT INTO {name}({name}) VALUES ('delete-all')"))
+        _fill_bigram_index(conn, name)
+
+
+async def get_mode(session: AsyncSession) -> str:
+    """检测当前全文索引模式"""
+    global _mode, _has_bigram_table
+
+    if _mode is None:
+        result = await session.execute(
+            text("SELECT name, sql FROM sqlite_master WHERE name IN (:main, :short)"),
+            {"main": FTS_TABLE, "short": FTS_BIGRAM_TABLE}
+        )
+        tables = dict(result.all())
+        sql = tables.get(FTS_TABLE)
+        if sql is None:
+            _mode = ""
+        else:
+            _mode = "trigram" if "trigram" in sql else "bigram"
+        _has_bigram_table = _mode == "trigram" and FTS_BIGRAM_TABLE in tables
+    return _mode
+
+
+def _bigram_tables() -> List[str]:
+    """需要由应用同步的二元切分索引表（调用前先 get_mode）"""
+    if _mode == "bigram":
+        return [FTS_TABLE]
+    if _mode == "trigram" and _has_bigram_table:
+        return [FTS_BIGRAM_TABLE]
+    return []
+
+
+async def needs_indexing(session: AsyncSession) -> bool:
+    """写入消息时是否需要调用 index_messages"""
+    await get_mode(session)
+    return bool(_bigram_tables())
+
+
+async def index_messages(session: AsyncSession, rows: Iterable[Tuple[int, Optional[str]]]):
+    """把新写入的消息 [(id, 内容)] 加入二元切分索引（与写入在同一事务中）"""
+    await get_mode(session)
+    tables = _bigram_tables()
+    params = [{"b_id": message_id, "b_content": bigram(content)} for message_id, content in rows]
+    if not tables or not params:
+        return
+    for name in tables:
+        await session.execute(
+            text(f"INSERT INTO {name}(rowid, message_content) VALUES (:b_id, :b_content)"), params
+        )
+
+
+async def unindex_messages(session: AsyncSession, rows: Iterable[Tuple[int, Optional[str]]]):
+    """从二元切分索引中删除消息 [(id, 原内容)]（无内容表删除时需要提供入索引时的文本）"""
+    await get_mode(session)
+    tables = _bigram_tables()
+    params = [{"b_id": message_id, "b_content": bigram(content)} for message_id, content in rows]
+    if not tables or not params:
+        return
+    for name in tables:
+        await session.execute(
+            text(f"INSERT INTO {name}({name}, rowid, message_content) VALUES ('delete', :b_id, :b_content)"), params
+        )
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _bigram_phrase(term: str) -> str:
+    """二元切分后作为短语匹配"""
+    return _quote(" ".join(bigram(term).split()))
+
+
+def _is_cjk(term: str) -> bool:
+    return _CJK_RUN.fullmatch(term) is not None
+
+
+def match_clauses(mode: str, q: str, has_bigram_table: bool = False) -> Optional[List[Tuple[str, str]]]:
+    """把搜索词转换为 [(FTS 表, MATCH 表达式)]，各表条件同时满足（多个词为 AND）；返回 None 时应退回 LIKE 查询"""
+    terms = q.split()
+    if not terms or not mode:
+        return None
+
+    if mode == "trigram":
+        long_terms = [term for term in terms if len(term) >= MIN_TRIGRAM_LENGTH]
+        short_terms = [term for term in terms if len(term) < MIN_TRIGRAM_LENGTH]
+        # trigram 至少需要三个字符才能命中；两个字的中日韩词改由短词索引匹配，
+        # 其它短词（单字、英文短词）在 unicode61 下只能整词匹配，与 LIKE 的子串语义不同，仍退回 LIKE
+        if short_terms and not (has_bigram_table and all(len(term) == 2 and _is_cjk(term) for term in short_terms)):
+            return None
+        clauses = []
+        if long_terms:
+            clauses.append((FTS_TABLE, " ".join(_quote(term) for term in long_terms)))
+        if short_terms:
+            clauses.append((FTS_BIGRAM_TABLE, " ".join(_bigram_phrase(term) for term in short_terms)))
+        return clauses
+
+    # bigram：每个词切分后作为短语匹配；单字无法命中二元组
+    if any(len(term) < 2 for term in terms):
+        return None
+    return [(FTS_TABLE, " ".join(_bigram_phrase(term) for term in terms))]
+
+
+async def build_match_query(session: AsyncSession, q: str) -> Optional[List[Tuple[str, str]]]:
+    """按当前索引模式生成全文检索条件，见 match_clauses"""
+    mode = await get_mode(session)
+    return match_clauses(mode, q, _has_bigram_table)
+
+
+def make_snippet(content: Optional[str], q: str) -> str:
+    """在原文中截取首个命中词附近的片段并标记命中词（FTS 无法生成摘要时使用）"""
+    if not content:
+        return ""
+
+    terms: List[str] = sorted({term for term in q.split() if term}, key=len, reverse=True)
+    lowered = content.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(0, min(positions) - SNIPPET_CHARS // 2) if positions else 0
+    end = start + SNIPPET_CHARS * 2
+    fragment = content[start:end]
+
+    if terms:
+        pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+        fragment = pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}", fragment)
+
+    return ("…" if start > 0 else "") + fragment + ("…" if end < len(content) else "")
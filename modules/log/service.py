@@ -1,15 +1,59 @@
 from typing import List, Dict, Any, Optional
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, table, column, literal_column, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from .models import MessageLog, SystemLog, OperationLog
-from core.database import get_db_session
+from core.database import get_db_session, use_session
+from core.count_cache import count_cache
+from utils.pagination import InvalidCursor, SortKey, apply_cursor, split_page
+from .search import (
+    HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS, build_match_query, make_snippet,
+    index_messages, needs_indexing, unindex_messages
+)
 from datetime import datetime, timedelta
 
+# 只追加的日志表使用 Core insert + executemany 批量写入，跳过 ORM 对象构造和工作单元；
+# 语句对象在模块级复用，编译结果由 SQLAlchemy 的语句缓存复用
+_messages = MessageLog.__table__
+_MESSAGE_LOG_INSERT = insert(_messages)
+_SYSTEM_LOG_INSERT = insert(SystemLog.__table__)
+_OPERATION_LOG_INSERT = insert(OperationLog.__table__)
+# 需要同步二元切分索引时取回新行的 id（按参数顺序返回）
+_MESSAGE_LOG_INSERT_RETURNING = _MESSAGE_LOG_INSERT.returning(_messages.c.id, sort_by_parameter_order=True)
+
+# 批量写入时每行的完整字段及缺省值（executemany 要求每行参数结构一致）
+_MESSAGE_LOG_DEFAULTS = {
+    "group_id": None, "user_id": None, "user_name": None, "message_type": None,
+    "message_content": None, "raw_message": "", "timestamp": None, "is_recalled": False
+}
+_SYSTEM_LOG_DEFAULTS = {
+    "level": "INFO", "module": "system", "message": "", "details": "",
+    "user_id": "", "ip_address": None, "created_at": None
+}
+_OPERATION_LOG_DEFAULTS = {
+    "operator": None, "operation_type": None, "target_type": None, "target_id": None,
+    "description": None, "ip_address": "", "user_agent": "", "created_at": None
+}
+
+
+def fill_log_rows(rows: List[Dict[str, Any]], defaults: Dict[str, Any], time_field: str) -> List[Dict[str, Any]]:
+    """补齐缺省字段并填充时间，忽略表中不存在的字段"""
+    now = datetime.now()
+    filled = []
+    for row in rows:
+        item = dict(defaults)
+        item.update((key, value) for key, value in row.items() if key in defaults)
+        if item[time_field] is None:
+            item[time_field] = now
+        filled.append(item)
+    return filled
+
 
 class LogService:
     @staticmethod
-    async def add_system_log(level: str, message: str, module: str = "system", details: str = "", user_id: str = ""):
-        """添加系统日志 - 只记录到数据库"""
-        async with get_db_session() as session:
+    async def add_system_log(level: str, message: str, module: str = "system", details: str = "", user_id: str = "",
+                             session: AsyncSession = None):
+        """添加系统日志 - 只记录到数据库（传入session时随调用方一起提交）"""
+        async with use_session(session) as db:
             log = SystemLog(
                 level=level,
                 module=module,
@@ -17,8 +61,7 @@ class LogService:
                 details=details,
                 user_id=user_id
             )
-            session.add(log)
-            await session.commit()
+            db.add(log)
 
     @staticmethod
     async def add_operation_log(operator: str, operation_type: str, target_type: str,
@@ -44,9 +87,12 @@ class LogService:
             page: int = 1,
             page_size: int = 20,
             start_time: datetime = None,
-            end_time: datetime = None
+            end_time: datetime = None,
+            cursor: str = None,
+            include_total: bool = True,
+            q: str = None
     ) -> Dict[str, Any]:
-        """获取消息日志"""
+        """获取消息日志；传入 q 时按消息内容搜索（全文索引按相关度排序，过短的词退回 LIKE）"""
         async with get_db_session() as session:
             # 构建查询
             query = select(MessageLog)
@@ -62,20 +108,53 @@ class LogService:
             if end_time:
                 conditions.append(MessageLog.timestamp <= end_time)
 
+            q = q.strip() if q else None
+            match = await build_match_query(session, q) if q else None
+            if q and match is None:
+                # 退回 LIKE：每个词都需出现
+                for term in q.split():
+                    conditions.append(MessageLog.message_content.contains(term, autoescape=True))
+
             if conditions:
                 query = query.where(and_(*conditions))
 
-            # 总数查询
-            total_query = select(func.count()).select_from(query.subquery())
-            total_result = await session.execute(total_query)
-            total = total_result.scalar_one()
+            if match is not None:
+                # 全文检索：按 bm25 相关度排序，附带命中片段
+                if cursor:
+                    raise InvalidCursor("全文搜索结果按相关度排序，不支持游标分页")
+                fts_refs = []
+                for fts_table, expression in match:
+                    fts = table(fts_table, column("rowid"))
+                    fts_ref = literal_column(fts_table)
+                    query = query.join(fts, fts.c.rowid == MessageLog.id).where(fts_ref.op("MATCH")(expression))
+                    fts_refs.append(fts_ref)
 
-            # 分页数据查询
-            query = query.order_by(MessageLog.timestamp.desc())
-            query = query.offset((page - 1) * page_size).limit(page_size)
+                total = await count_cache.count(session, query, include_total)
+
+                # 同时使用主索引与短词索引时，相关度为两者 bm25 之和
+                snippet = func.snippet(fts_refs[0], 0, HIGHLIGHT_START, HIGHLIGHT_END, "…", SNIPPET_TOKENS)
+                rank = sum((func.bm25(fts_ref) for fts_ref in fts_refs[1:]), func.bm25(fts_refs[0]))
+                query = query.add_columns(snippet).order_by(rank, MessageLog.id.desc())
+                query = query.offset((page - 1) * page_size).limit(page_size)
+
+                result = await session.execute(query)
+                # 无内容索引（bigram 模式、短词索引）无法生成摘要，改为在原文中截取
+                rows = [(log, snip or make_snippet(log.message_content, q)) for log, snip in result.all()]
+                next_cursor = None
+            else:
+                # 总数（结果缓存，写入后失效；include_total=False 时跳过）
+                total = await count_cache.count(session, query, include_total)
+
+                # 分页数据查询
+                # 传入游标时按 (排序键, id) 定位，否则沿用 OFFSET 分页
+                keys = [SortKey(MessageLog.timestamp), SortKey(MessageLog.id)]
+                query = apply_cursor(query, keys, cursor)
+                if not cursor:
+                    query = query.offset((page - 1) * page_size)
 
-            result = await session.execute(query)
-            logs = result.scalars().all()
+                result = await session.execute(query.limit(page_size + 1))
+                logs, next_cursor = split_page(result.scalars().all(), keys, page_size)
+                rows = [(log, make_snippet(log.message_content, q) if q else None) for log in logs]
 
             return {
                 "logs": [{
@@ -87,11 +166,14 @@ class LogService:
                     "message_content": log.message_content,
                     "raw_message": log.raw_message,
                     "timestamp": log.timestamp,
-                    "is_recalled": log.is_recalled
-                } for log in logs],
+                    "is_recalled": log.is_recalled,
+                    "snippet": snippet_text
+                } for log, snippet_text in rows],
                 "total": total,
                 "page": page,
-                "page_size": page_size
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "search_mode": ("fulltext" if match is not None else "like") if q else None
             }
 
     @staticmethod
@@ -100,11 +182,14 @@ class LogService:
             module: str = None,
             page: int = 1,
             page_size: int = 20,
-            days: int = 7
+            days: int = 7,
+            cursor: str = None,
+            include_total: bool = True
     ) -> Dict[str, Any]:
         """获取系统日志"""
         async with get_db_session() as session:
-            start_time = datetime.now() - timedelta(days=days)
+            # 起始时间取整到分钟，使总数缓存在一分钟内可复用
+            start_time = (datetime.now() - timedelta(days=days)).replace(second=0, microsecond=0)
             query = select(SystemLog).where(SystemLog.created_at >= start_time)
 
             # 添加过滤条件
@@ -113,17 +198,18 @@ class LogService:
             if module:
                 query = query.where(SystemLog.module.contains(module))
 
-            # 总数查询
-            total_query = select(func.count()).select_from(query.subquery())
-            total_result = await session.execute(total_query)
-            total = total_result.scalar_one()
+            # 总数（结果缓存，写入后失效；include_total=False 时跳过）
+            total = await count_cache.count(session, query, include_total)
 
             # 分页数据查询
-            query = query.order_by(SystemLog.created_at.desc())
-            query = query.offset((page - 1) * page_size).limit(page_size)
+            # 传入游标时按 (排序键, id) 定位，否则沿用 OFFSET 分页
+            keys = [SortKey(SystemLog.created_at), SortKey(SystemLog.id)]
+            query = apply_cursor(query, keys, cursor)
+            if not cursor:
+                query = query.offset((page - 1) * page_size)
 
-            result = await session.execute(query)
-            logs = result.scalars().all()
+            result = await session.execute(query.limit(page_size + 1))
+            logs, next_cursor = split_page(result.scalars().all(), keys, page_size)
 
             return {
                 "logs": [{
@@ -138,7 +224,8 @@ class LogService:
                 } for log in logs],
                 "total": total,
                 "page": page,
-                "page_size": page_size
+                "page_size": page_size,
+                "next_cursor": next_cursor
             }
 
     @staticmethod
@@ -147,11 +234,14 @@ class LogService:
             operation_type: str = None,
             page: int = 1,
             page_size: int = 20,
-            days: int = 30
+            days: int = 30,
+            cursor: str = None,
+            include_total: bool = True
     ) -> Dict[str, Any]:
         """获取操作日志"""
         async with get_db_session() as session:
-            start_time = datetime.now() - timedelta(days=days)
+            # 起始时间取整到分钟，使总数缓存在一分钟内可复用
+            start_time = (datetime.now() - timedelta(days=days)).replace(second=0, microsecond=0)
             query = select(OperationLog).where(OperationLog.created_at >= start_time)
 
             # 添加过滤条件
@@ -160,17 +250,18 @@ class LogService:
             if operation_type:
                 query = query.where(OperationLog.operation_type == operation_type)
 
-            # 总数查询
-            total_query = select(func.count()).select_from(query.subquery())
-            total_result = await session.execute(total_query)
-            total = total_result.scalar_one()
+            # 总数（结果缓存，写入后失效；include_total=False 时跳过）
+            total = await count_cache.count(session, query, include_total)
 
             # 分页数据查询
-            query = query.order_by(OperationLog.created_at.desc())
-            query = query.offset((page - 1) * page_size).limit(page_size)
+            # 传入游标时按 (排序键, id) 定位，否则沿用 OFFSET 分页
+            keys = [SortKey(OperationLog.created_at), SortKey(OperationLog.id)]
+            query = apply_cursor(query, keys, cursor)
+            if not cursor:
+                query = query.offset((page - 1) * page_size)
 
-            result = await session.execute(query)
-            logs = result.scalars().all()
+            result = await session.execute(query.limit(page_size + 1))
+            logs, next_cursor = split_page(result.scalars().all(), keys, page_size)
 
             return {
                 "logs": [{
@@ -186,7 +277,8 @@ class LogService:
                 } for log in logs],
                 "total": total,
                 "page": page,
-                "page_size": page_size
+                "page_size": page_size,
+                "next_cursor": next_cursor
             }
 
     @staticmethod
@@ -194,8 +286,7 @@ class LogService:
         """获取日志统计"""
         async with get_db_session() as session:
             # 消息日志统计
-            message_count = await session.execute(select(func.count(MessageLog.id)))
-            message_total = message_count.scalar_one()
+            message_total = await count_cache.table_rows(session, MessageLog.__table__)
 
             # 今日消息
             today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -218,6 +309,54 @@ class LogService:
                 "system_level_stats": system_level_stats
             }
 
+    @staticmethod
+    async def add_message_logs_bulk(rows: List[Dict[str, Any]], session: AsyncSession = None) -> int:
+        """批量写入消息日志，返回写入行数（传入session时随调用方一起提交）"""
+        if not rows:
+            return 0
+        params = fill_log_rows(rows, _MESSAGE_LOG_DEFAULTS, "timestamp")
+        async with use_session(session) as db:
+            if await needs_indexing(db):
+                ids = (await db.execute(_MESSAGE_LOG_INSERT_RETURNING, params)).scalars().all()
+                await index_messages(db, zip(ids, (row["message_content"] for row in params)))
+            else:
+                await db.execute(_MESSAGE_LOG_INSERT, params)
+        return len(rows)
+
+    @staticmethod
+    async def delete_message_logs(before: datetime, session: AsyncSession = None) -> int:
+        """删除指定时间之前的消息日志并同步全文索引，返回删除行数（传入session时随调用方一起提交）"""
+        async with use_session(session) as db:
+            result = await db.execute(
+                select(MessageLog.id, MessageLog.message_content).where(MessageLog.timestamp < before)
+            )
+            rows = result.all()
+            if not rows:
+                return 0
+            await unindex_messages(db, rows)
+            ids = [row[0] for row in rows]
+            for start in range(0, len(ids), 500):
+                await db.execute(_messages.delete().where(_messages.c.id.in_(ids[start:start + 500])))
+        return len(rows)
+
+    @staticmethod
+    async def add_system_logs_bulk(rows: List[Dict[str, Any]], session: AsyncSession = None) -> int:
+        """批量写入系统日志，返回写入行数（传入session时随调用方一起提交）"""
+        if not rows:
+            return 0
+        async with use_session(session) as db:
+            await db.execute(_SYSTEM_LOG_INSERT, fill_log_rows(rows, _SYSTEM_LOG_DEFAULTS, "created_at"))
+        return len(rows)
+
+    @staticmethod
+    async def add_operation_logs_bulk(rows: List[Dict[str, Any]], session: AsyncSession = None) -> int:
+        """批量写入操作日志，返回写入行数（传入session时随调用方一起提交）"""
+        if not rows:
+            return 0
+        async with use_session(session) as db:
+            await db.execute(_OPERATION_LOG_INSERT, fill_log_rows(rows, _OPERATION_LOG_DEFAULTS, "created_at"))
+        return len(rows)
+
     @staticmethod
     async def add_message_log(
             group_id: str,
@@ -225,11 +364,12 @@ class LogService:
             user_name: str,
             message_type: str,
             message_content: str,
-            raw_message: str = ""
+            raw_message: str = "",
+            session: AsyncSession = None
     ):
-        """添加消息日志"""
-        async with get_db_session() as session:
-            try:
+        """添加消息日志（传入session时随调用方一起提交）"""
+        try:
+            async with use_session(session) as db:
                 log = MessageLog(
                     group_id=group_id,
                     user_id=user_id,
@@ -239,10 +379,12 @@ class LogService:
                     raw_message=raw_message,
                     timestamp=datetime.now()  # 自动使用当前时间
                 )
-                session.add(log)
-                await session.commit()
-                return True
-            except Exception as e:
-                print(f"❌ 保存消息日志失败: {e}")
-                await session.rollback()
-                return False
\ No newline at end of file
+                db.add(log)
+                await db.flush()
+                await index_messages(db, [(log.id, log.message_content)])
+            return True
+        except Exception as e:
+            print(f"❌ 保存消息日志失败: {e}")
+            if session is not None:
+                raise
+            return False
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+插件启用索引 - 在内存中保存插件开关，拦截时通常无需查询数据库
+
+规则与 PluginService.get_disabled_plugins 一致：群组禁用的插件 = 全局禁用 ∪ 该群组单独禁用。
+
+- 启动时加载全部全局开关与群组开关，拦截时只查内存
+- 群组开关保存在 LRU 中，群组数量超过 max_groups 时淘汰最久未使用的群组；
+  只有被淘汰的群组再次使用时才读取数据库，没有任何设置的群组不占缓存也不查询
+- 插件注册及全局/群组开关修改提交后同步更新（绕过接口直接修改数据库后需重新 load()）
+"""
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from core.config import get_config_section
+from core.database import get_db_session
+from .models import Plugin, PluginGroupSetting
+
+DEFAULT_ENABLEMENT_CONFIG = {
+    "max_groups": 1024  # 缓存开关设置的群组数量上限
+}
+
+
+class PluginEnablementIndex:
+    def __init__(self):
+        self.max_groups = DEFAULT_ENABLEMENT_CONFIG["max_groups"]
+        # 插件名 -> 是否全局启用
+        self.plugins: Dict[str, bool] = {}
+        self.global_disabled: FrozenSet[str] = frozenset()
+        # 群组ID -> ({插件名: 是否启用}, 该群组禁用的插件)
+        self._groups: "OrderedDict[str, Tuple[Dict[str, bool], FrozenSet[str]]]" = OrderedDict()
+        # 有群组开关设置的群组（含已被淘汰的），不在其中的群组没有任何设置
+        self._configured_groups: Set[str] = set()
+        self.loaded = False
+        # 每次修改递增，加载期间有修改时结果不缓存
+        self._version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        if config is None:
+            config = get_config_section("plugin_enablement", DEFAULT_ENABLEMENT_CONFIG)
+        else:
+            config = {**DEFAULT_ENABLEMENT_CONFIG, **config}
+        self.max_groups = max(1, int(config["max_groups"]))
+        while len(self._groups) > self.max_groups:
+            self._groups.popitem(last=False)
+            self.evictions += 1
+
+    async def load(self):
+        """从数据库加载全局开关与全部群组开关"""
+        while True:
+            version = self._version
+            async with get_db_session() as session:
+                result = await session.execute(select(Plugin.plugin_name, Plugin.is_global_enabled))
+                plugin_states = {name: enabled is not False for name, enabled in result.all()}
+                result = await session.execute(
+                    select(PluginGroupSetting.group_id, PluginGroupSetting.plugin_name, PluginGroupSetting.is_enabled)
+                )
+                group_states: Dict[str, Dict[str, bool]] = {}
+                for group_id, name, enabled in result.all():
+                    group_states.setdefault(group_id, {})[name] = enabled is not False
+            # 加载期间有开关修改时重新加载
+            if version == self._version:
+                break
+
+        self.plugins = plugin_states
+        self.global_disabled = frozenset(name for name, enabled in self.plugins.items() if not enabled)
+        self._groups.clear()
+        self._configured_groups = set(group_states)
+        for group_id, settings in group_states.items():
+            self._cache_group(group_id, settings)
+        self.loaded = True
+        print(f"✅ 插件启用索引已加载: 插件 {len(self.plugins)} 个, 全局禁用 {len(self.global_disabled)} 个, "
+              f"有开关设置的群组 {len(group_states)} 个")
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await self.load()
+
+    def _disabled_for(self, settings: Dict[str, bool]) -> FrozenSet[str]:
+        return self.global_disabled | frozenset(name for name, enabled in settings.items() if not enabled)
+
+    def _cache_group(self, group_id: str, settings: Dict[str, bool]):
+        self._groups[group_id] = (settings, self._disabled_for(settings))
+        self._groups.move_to_end(group_id)
+        while len(self._groups) > self.max_groups:
+            self._groups.popitem(last=False)
+            self.evictions += 1
+
+    async def _group_settings(self, group_id: str) -> Tuple[Dict[str, bool], FrozenSet[str]]:
+        """群组的插件开关与禁用集合（只有已被 LRU 淘汰的群组需要读取数据库）"""
+        entry = self._groups.get(group_id)
+        if entry is not None:
+            self._groups.move_to_end(group_id)
+            self.hits += 1
+            return entry
+        if group_id not in self._configured_groups:
+            # 没有任何群组设置：只受全局开关影响
+            self.hits += 1
+            return {}, self.global_disabled
+
+        self.misses += 1
+        version = self._version
+        async with get_db_session() as session:
+            result = await session.execute(
+                select(PluginGroupSetting.plugin_name, PluginGroupSetting.is_enabled)
+                .where(PluginGroupSetting.group_id == group_id)
+            )
+            settings = {name: enabled is not False for name, enabled in result.all()}
+
+        # 读取期间有开关修改时不缓存，避免保存修改前的状态
+        if version == self._version:
+            self._cache_group(group_id, settings)
+        else:
+            self._groups.pop(group_id, None)
+        return settings, self._disabled_for(settings)
+
+    # ---- 查询 ----
+
+    async def disabled_plugins(self, group_id: Optional[str] = None) -> FrozenSet[str]:
+        """群组（私聊时为 None）中被禁用的插件"""
+        await self.ensure_loaded()
+        if group_id is None:
+            return self.global_disabled
+        return (await self._group_settings(group_id))[1]
+
+    async def is_enabled(self, plugin_name: str, group_id: Optional[str] = None) -> bool:
+        """与 PluginService.is_plugin_enabled 一致：未注册的插件视为禁用"""
+        await self.ensure_loaded()
+        if not self.plugins.get(plugin_name, False):
+            return False
+        if group_id is None:
+            return True
+        settings, _ = await self._group_settings(group_id)
+        return settings.get(plugin_name, True)
+
+    # ---- 修改（数据库提交后调用）----
+
+    def set_plugin(self, plugin_name: str, enabled: Optional[bool] = None):
+        """插件注册或全局开关修改；enabled 为 None 时保留已有状态（新插件默认启用）"""
+        self._version += 1
+        if enabled is None:
+            enabled = self.plugins.get(plugin_name, True)
+        if self.plugins.get(plugin_name) == enabled:
+            return
+        self.plugins[plugin_name] = enabled
+        self.global_disabled = frozenset(name for name, enabled in self.plugins.items() if not enabled)
+        # 全局禁用集合变化，重新计算已缓存群组的禁用集合
+        for group_id, (settings, _) in self._groups.items():
+            self._groups[group_id] = (settings, self._disabled_for(settings))
+
+    def set_group_plugin(self, plugin_name: str, group_id: str, enabled: bool):
+        """群组插件开关修改"""
+        self._version += 1
+        entry = self._groups.get(group_id)
+        if entry is not None:
+            settings = {**entry[0], plugin_name: enabled}
+            self._groups[group_id] = (settings, self._disabled_for(settings))
+        elif group_id not in self._configured_groups:
+            # 此前没有任何设置，这就是该群组的全部设置
+            self._cache_group(group_id, {plugin_name: enabled})
+        # 其余情况是已被淘汰的群组，下次使用时从数据库读取
+        self._configured_groups.add(group_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        total = self.hits + self.misses
+        return {
+            "plugins": len(self.plugins),
+            "global_disabled": len(self.global_disabled),
+            "configured_groups": len(self._configured_groups),
+            "cached_groups": len(self._groups),
+            "max_groups": self.max_groups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions
+        }
+
+
+# 全局实例
+plugin_enablement = PluginEnablementIndex()
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, Float, UniqueConstraint, Index
 from datetime import datetime
 from core.database import Base
 
 
 class Plugin(Base):
     __tablename__ = "plugins"
+    __table_args__ = (
+        Index("ix_plugins_priority_name_id", "priority", "plugin_name", "id"),  # 插件列表游标分页
+    )
 
     id = Column(Integer, primary_key=True)
     plugin_name = Column(String(100), unique=True, nullable=False)
@@ -15,7 +18,7 @@ class Plugin(Base):
     author = Column(String(100))  # 作者
     is_global_enabled = Column(Boolean, default=True)  # 全局启用
     is_safe = Column(Boolean, default=True)  # 是否安全
-    priority = Column(Integer, default=10)  # 优先级
+    priority = Column(Integer, nullable=False, default=10)  # 优先级
     settings_schema = Column(JSON)  # 设置schema
     usage_count = Column(Integer, default=0)  # 使用次数统计
     last_used = Column(DateTime)  # 最后使用时间
@@ -25,6 +28,10 @@ class Plugin(Base):
 
 class PluginGroupSetting(Base):
     __tablename__ = "plugin_group_settings"
+    __table_args__ = (
+        UniqueConstraint("plugin_name", "group_id", name="uq_plugin_group_settings_plugin_group"),
+        Index("ix_plugin_group_settings_group_plugin", "group_id", "plugin_name"),
+    )
 
     id = Column(Integer, primary_key=True)
     plugin_name = Column(String(100), nullable=False)
@@ -38,6 +45,9 @@ class PluginGroupSetting(Base):
 
 class PluginUsageLog(Base):
     __tablename__ = "plugin_usage_logs"
+    __table_args__ = (
+        Index("ix_plugin_usage_logs_execution_time", "execution_time"),
+    )
 
     id = Column(Integer, primary_key=True)
     plugin_name = Column(String(100), nullable=False)
@@ -46,4 +56,21 @@ class PluginUsageLog(Base):
     command = Column(String(200))  # 使用的命令
     result = Column(Text)  # 执行结果
     execution_time = Column(DateTime, default=datetime.now)
-    success = Column(Boolean, default=True)  # 是否执行成功
\ No newline at end of file
+    success = Column(Boolean, default=True)  # 是否执行成功
+
+class PluginPerformance(Base):
+    """插件 matcher 执行耗时统计（由 plugin_profiler 定期写入累计值）"""
+    __tablename__ = "plugin_performance"
+    __table_args__ = (
+        UniqueConstraint("plugin_name", "matcher", name="uq_plugin_performance_plugin_matcher"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    plugin_name = Column(String(100), nullable=False)
+    matcher = Column(String(200), nullable=False)  # matcher 定义位置：模块名:行号
+    calls = Column(Integer, default=0)  # 执行次数
+    errors = Column(Integer, default=0)  # 抛出异常的次数
+    total_ms = Column(Float, default=0)  # 累计耗时（毫秒）
+    max_ms = Column(Float, default=0)  # 最大耗时（毫秒）
+    buckets = Column(JSON)  # 耗时分布，与 LATENCY_BUCKETS_MS 对应
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -0,0 +1,261 @@
+"""
+插件执行耗时统计 - 插件拦截器放行时记录开始时间，run_postprocessor 中结束计时
+
+- 按 matcher（定义位置：模块名:行号）统计执行次数、异常次数和耗时分布，插件统计由其 matcher 汇总
+- 统计保存在内存中，定期把有变化的累计值写入 plugin_performance 表，启动时读回继续累计
+- 计时从插件拦截器放行开始到运行后处理器结束，被拦截（禁用、限流）的 matcher 不计入
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from core.database import get_db_session
+from core.flusher import PeriodicFlusher
+from .models import PluginPerformance
+
+DEFAULT_PROFILER_CONFIG = {
+    "enabled": True,
+    "flush_interval": 60  # 写回间隔（秒）
+}
+
+# 耗时分布的桶上限（毫秒），最后一个桶收纳更慢的执行
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# 开始时间保存在本次运行的 matcher.state 中（NoneBot 内部键同样以下划线开头）
+_START_KEY = "_plugin_profiler_start"
+
+_performance = PluginPerformance.__table__
+_performance_insert = sqlite_insert(_performance).values(
+    plugin_name=bindparam("b_plugin_name"),
+    matcher=bindparam("b_matcher"),
+    calls=bindparam("b_calls"),
+    errors=bindparam("b_errors"),
+    total_ms=bindparam("b_total_ms"),
+    max_ms=bindparam("b_max_ms"),
+    buckets=bindparam("b_buckets", type_=_performance.c.buckets.type),
+    updated_at=bindparam("b_now")
+)
+# 内存中保存的是累计值，直接覆盖
+_PERFORMANCE_UPSERT = _performance_insert.on_conflict_do_update(
+    index_elements=[_performance.c.plugin_name, _performance.c.matcher],
+    set_={
+        "calls": _performance_insert.excluded.calls,
+        "errors": _performance_insert.excluded.errors,
+        "total_ms": _performance_insert.excluded.total_ms,
+        "max_ms": _performance_insert.excluded.max_ms,
+        "buckets": _performance_insert.excluded.buckets,
+        "updated_at": _performance_insert.excluded.updated_at
+    }
+)
+
+
+class ExecutionStats:
+    """单个 matcher 的执行统计"""
+
+    __slots__ = ("calls", "errors", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms: float, failed: bool):
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def merge(self, other: "ExecutionStats"):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, fraction: float) -> float:
+        """按桶估算分位数（毫秒，取桶上限，不超过最大值）"""
+        target = self.calls * fraction
+        seen = 0
+        for index, count in enumerate(self.buckets[:-1]):
+            seen += count
+            if count and seen >= target:
+                return min(LATENCY_BUCKETS_MS[index], self.max_ms)
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else 0,
+            "total_ms": round(self.total_ms, 2),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "histogram": {
+                **{f"<={bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                f">{LATENCY_BUCKETS_MS[-1]}ms": self.buckets[-1]
+            }
+        }
+
+
+def matcher_key(matcher) -> str:
+    """matcher 的定义位置，同一个 matcher 的每次运行归为一类"""
+    source = matcher._source
+    if source is not None and source.lineno is not None:
+        return f"{matcher.module_name}:{source.lineno}"
+    return matcher.module_name or repr(type(matcher))
+
+
+class PluginProfiler(PeriodicFlusher):
+    def __init__(self):
+        super().__init__("插件耗时统计", DEFAULT_PROFILER_CONFIG["flush_interval"])
+        self.enabled = DEFAULT_PROFILER_CONFIG["enabled"]
+        # (插件名, matcher) -> 统计
+        self._stats: Dict[Tuple[str, str], ExecutionStats] = {}
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._installed = False
+        self.loaded = False
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        config = {**DEFAULT_PROFILER_CONFIG, **(config or {})}
+        self.enabled = bool(config["enabled"])
+        self.interval = max(0.1, float(config["flush_interval"]))
+
+    async def load(self):
+        """读回已保存的统计（只在首次启动时读取，重启 NoneBot 时保留内存中的值）"""
+        if self.loaded:
+            return
+        try:
+            async with get_db_session() as session:
+                result = await session.execute(select(PluginPerformance))
+                for row in result.scalars().all():
+                    stats = ExecutionStats()
+                    stats.calls = row.calls or 0
+                    stats.errors = row.errors or 0
+                    stats.total_ms = row.total_ms or 0.0
+                    stats.max_ms = row.max_ms or 0.0
+                    if row.buckets and len(row.buckets) == len(stats.buckets):
+                        stats.buckets = list(row.buckets)
+                    self._stats[(row.plugin_name, row.matcher)] = stats
+            self.loaded = True
+            print(f"✅ 插件耗时统计已加载: matcher {len(self._stats)} 个")
+        except Exception as e:
+            print(f"❌ 加载插件耗时统计失败: {e}")
+
+    def install(self):
+        """注册运行后处理器（NoneBot 初始化后调用，重复调用忽略）"""
+        if self._installed:
+            return
+
+        from nonebot.matcher import Matcher
+        from nonebot.message import run_postprocessor
+        from core.plugin_interceptor import plugin_interceptor
+
+        @run_postprocessor
+        async def profile_matcher_end(matcher: Matcher, exception: Optional[Exception]):
+            start = matcher.state.pop(_START_KEY, None)
+            if start is None:
+                return
+            plugin_name = plugin_interceptor.resolve_plugin_name(matcher.plugin)
+            self.record(plugin_name, matcher_key(matcher), time.perf_counter() - start, exception is not None)
+
+        self._installed = True
+
+    def mark_start(self, matcher):
+        """记录 matcher 开始运行的时间（由插件拦截器在放行时调用）"""
+        if self.enabled and self._installed:
+            matcher.state[_START_KEY] = time.perf_counter()
+
+    def record(self, plugin_name: str, matcher: str, elapsed: float, failed: bool = False):
+        """记录一次 matcher 运行"""
+        key = (plugin_name, matcher)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ExecutionStats()
+        stats.record(elapsed * 1000, failed)
+        self._dirty.add(key)
+        self.ensure_started()
+
+    async def flush(self):
+        """写入有变化的 matcher 的累计统计"""
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        now = datetime.now()
+        params = []
+        for plugin_name, matcher in dirty:
+            stats = self._stats[(plugin_name, matcher)]
+            params.append({
+                "b_plugin_name": plugin_name,
+                "b_matcher": matcher,
+                "b_calls": stats.calls,
+                "b_errors": stats.errors,
+                "b_total_ms": stats.total_ms,
+                "b_max_ms": stats.max_ms,
+                "b_buckets": list(stats.buckets),
+                "b_now": now
+            })
+
+        async with get_db_session() as session:
+            try:
+                await session.execute(_PERFORMANCE_UPSERT, params)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                # 写回失败时下次刷新重试
+                self._dirty |= dirty
+                raise
+
+    # ---- 查询 ----
+
+    def _plugin_matchers(self, plugin_name: str) -> List[Tuple[str, ExecutionStats]]:
+        return sorted(
+            ((matcher, stats) for (name, matcher), stats in self._stats.items() if name == plugin_name),
+            key=lambda item: item[1].total_ms,
+            reverse=True
+        )
+
+    def get_summary(self, plugin_name: str) -> Optional[Dict[str, Any]]:
+        """插件汇总统计（不含分布），没有运行记录时返回 None"""
+        matchers = self._plugin_matchers(plugin_name)
+        if not matchers:
+            return None
+        total = ExecutionStats()
+        for _, stats in matchers:
+            total.merge(stats)
+        summary = total.to_dict()
+        summary.pop("histogram")
+        return summary
+
+    def get_performance(self, plugin_name: str) -> Dict[str, Any]:
+        """插件及其各 matcher 的统计"""
+        matchers = self._plugin_matchers(plugin_name)
+        total = ExecutionStats()
+        for _, stats in matchers:
+            total.merge(stats)
+        return {
+            "plugin_name": plugin_name,
+            "enabled": self.enabled,
+            **total.to_dict(),
+            "matchers": [{"matcher": matcher, **stats.to_dict()} for matcher, stats in matchers]
+        }
+
+
+# 全局实例
+plugin_profiler = PluginProfiler()
@@ -1,25 +1,45 @@
 from fastapi import APIRouter, HTTPException, Request, Query
-from typing import Optional
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
 from .service import PluginService
+from .enablement import plugin_enablement
+from .usage_recorder import plugin_usage_recorder
+from .profiler import plugin_profiler
+from utils.pagination import InvalidCursor
 from core.security import verify_token
+from core.plugin_supervisor import plugin_supervisor
 
 router = APIRouter(prefix="/api/plugins", tags=["plugins"])
 
 
+class SettingsUpdate(BaseModel):
+    settings: Dict[str, Any]
+
+
 @router.get("/")
 async def get_plugins(
         request: Request,
         page: int = Query(1, ge=1),
         page_size: int = Query(20, ge=1, le=100),
         search: str = Query(None),
-        enabled: Optional[bool] = Query(None)
+        enabled: Optional[bool] = Query(None),
+        cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 page"),
+        include_total: bool = Query(True, description="是否统计总数，翻页时可传 false 跳过 COUNT")
 ):
     """获取插件列表"""
     token = request.cookies.get("access_token")
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await PluginService.get_plugins(page, page_size, search, enabled)
+    try:
+        result = await PluginService.get_plugins(page, page_size, search, enabled, cursor, include_total)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 附加内存中的执行耗时汇总
+    for plugin in result["plugins"]:
+        plugin["performance"] = plugin_profiler.get_summary(plugin["plugin_name"])
+    return result
 
 
 @router.get("/stats")
@@ -29,7 +49,32 @@ async def get_plugin_stats(request: Request):
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await PluginService.get_plugin_stats()
+    stats = await PluginService.get_plugin_stats()
+    stats["enablement_cache"] = plugin_enablement.get_stats()
+    stats["usage_recorder"] = plugin_usage_recorder.get_stats()
+    return stats
+
+
+@router.get("/supervisor")
+async def get_supervisor_stats(request: Request):
+    """获取插件超时、线程池与事件循环卡顿统计"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    return plugin_supervisor.get_stats()
+
+
+@router.get("/{plugin_name}/performance")
+async def get_plugin_performance(request: Request, plugin_name: str):
+    """获取插件执行耗时统计（按 matcher 分列）"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    performance = plugin_profiler.get_performance(plugin_name)
+    performance["supervisor"] = plugin_supervisor.get_plugin_stats(plugin_name)
+    return performance
 
 
 @router.post("/{plugin_name}/enable")
@@ -88,6 +133,20 @@ async def disable_group_plugin(request: Request, plugin_name: str, group_id: str
         raise HTTPException(status_code=500, detail="操作失败")
 
 
+@router.put("/{plugin_name}/groups/{group_id}/settings")
+async def update_group_plugin_settings(request: Request, plugin_name: str, group_id: str, body: SettingsUpdate):
+    """更新插件在群组中的设置（如 {"rate_limit": {"user": {"rate": 0.2, "burst": 3}}}）"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    success = await PluginService.update_group_plugin_settings(plugin_name, group_id, body.settings)
+    if success:
+        return {"success": True, "message": "群组插件设置已更新"}
+    else:
+        raise HTTPException(status_code=500, detail="操作失败")
+
+
 # 新增：获取群组插件设置
 @router.get("/groups/{group_id}/settings")
 async def get_group_plugin_settings(
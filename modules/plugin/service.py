@@ -1,40 +1,76 @@
 from typing import List, Dict, Any, Optional
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from .models import Plugin, PluginGroupSetting, PluginUsageLog
-from core.database import get_db_session
+from .enablement import plugin_enablement
+from core.database import get_db_session, use_session
+from core.count_cache import count_cache
+from core.rate_limiter import rate_limiter
+from modules.log.service import fill_log_rows
+from utils.pagination import SortKey, apply_cursor, split_page
 from datetime import datetime
 
+_USAGE_LOG_INSERT = insert(PluginUsageLog.__table__)
+_USAGE_LOG_DEFAULTS = {
+    "plugin_name": None, "user_id": None, "group_id": None, "command": None,
+    "result": None, "execution_time": None, "success": True
+}
+
 
 class PluginService:
     @staticmethod
     async def register_plugin(plugin_info: Dict[str, Any]) -> bool:
         """注册或更新插件信息"""
+        return await PluginService.register_plugins([plugin_info])
+
+    @staticmethod
+    async def register_plugins(plugins: List[Dict[str, Any]]) -> bool:
+        """批量注册或更新插件信息（INSERT ... ON CONFLICT DO UPDATE）"""
+        if not plugins:
+            return True
+
+        columns = set(Plugin.__table__.columns.keys())
+        names = ", ".join(info["plugin_name"] for info in plugins)
         async with get_db_session() as session:
             try:
-                result = await session.execute(
-                    select(Plugin).where(Plugin.plugin_name == plugin_info["plugin_name"])
-                )
-                plugin = result.scalar_one_or_none()
-
-                if plugin:
-                    # 更新现有插件
-                    for key, value in plugin_info.items():
-                        if hasattr(plugin, key):
-                            setattr(plugin, key, value)
-                    plugin.updated_at = datetime.now()
-                else:
-                    # 创建新插件
-                    plugin = Plugin(**plugin_info)
-                    session.add(plugin)
+                # 按字段组合分组，保证每条语句的参数结构一致
+                batches: Dict[tuple, List[Dict[str, Any]]] = {}
+                for info in plugins:
+                    row = {key: value for key, value in info.items() if key in columns}
+                    batches.setdefault(tuple(sorted(row)), []).append(row)
+
+                for keys, rows in batches.items():
+                    stmt = sqlite_insert(Plugin.__table__)
+                    update_keys = [key for key in keys if key not in ("id", "plugin_name")]
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[Plugin.__table__.c.plugin_name],
+                        set_={
+                            **{key: stmt.excluded[key] for key in update_keys},
+                            "updated_at": datetime.now()
+                        }
+                    )
+                    await session.execute(stmt, rows)
 
                 await session.commit()
-                print(f"✅ 插件注册成功: {plugin_info['plugin_name']}")
+                for info in plugins:
+                    plugin_enablement.set_plugin(info["plugin_name"], info.get("is_global_enabled"))
+                print(f"✅ 插件注册成功: {names}")
                 return True
             except Exception as e:
-                print(f"❌ 插件注册失败 {plugin_info['plugin_name']}: {e}")
+                print(f"❌ 插件注册失败 {names}: {e}")
                 await session.rollback()
                 return False
 
+    @staticmethod
+    async def add_usage_logs_bulk(rows: List[Dict[str, Any]], session: AsyncSession = None) -> int:
+        """批量写入插件使用日志（Core insert + executemany），返回写入行数"""
+        if not rows:
+            return 0
+        async with use_session(session) as db:
+            await db.execute(_USAGE_LOG_INSERT, fill_log_rows(rows, _USAGE_LOG_DEFAULTS, "execution_time"))
+        return len(rows)
+
     @staticmethod
     async def record_plugin_usage(
             plugin_name: str,
@@ -44,50 +80,9 @@ class PluginService:
             result: str = None,
             success: bool = True
     ):
-        """记录插件使用情况"""
-        async with get_db_session() as session:
-            try:
-                # 记录使用日志
-                usage_log = PluginUsageLog(
-                    plugin_name=plugin_name,
-                    user_id=user_id,
-                    group_id=group_id,
-                    command=command,
-                    result=result,
-                    success=success
-                )
-                session.add(usage_log)
-
-                # 更新插件使用统计
-                plugin_result = await session.execute(
-                    select(Plugin).where(Plugin.plugin_name == plugin_name)
-                )
-                plugin = plugin_result.scalar_one_or_none()
-
-                if plugin:
-                    plugin.usage_count += 1
-                    plugin.last_used = datetime.now()
-
-                # 更新群组插件使用统计
-                if group_id:
-                    group_setting_result = await session.execute(
-                        select(PluginGroupSetting).where(
-                            and_(
-                                PluginGroupSetting.plugin_name == plugin_name,
-                                PluginGroupSetting.group_id == group_id
-                            )
-                        )
-                    )
-                    group_setting = group_setting_result.scalar_one_or_none()
-
-                    if group_setting:
-                        group_setting.usage_count += 1
-
-                await session.commit()
-                print(f"📊 记录插件使用: {plugin_name} by {user_id}")
-            except Exception as e:
-                print(f"❌ 记录插件使用失败: {e}")
-                await session.rollback()
+        """记录插件使用情况（放入内存缓冲，由 plugin_usage_recorder 定期批量写入）"""
+        from .usage_recorder import plugin_usage_recorder
+        plugin_usage_recorder.record(plugin_name, user_id, group_id, command, result, success)
 
     @staticmethod
     async def get_plugin_stats() -> Dict[str, Any]:
@@ -150,7 +145,9 @@ class PluginService:
             page: int = 1,
             page_size: int = 20,
             search: str = None,
-            enabled: bool = None
+            enabled: bool = None,
+            cursor: str = None,
+            include_total: bool = True
     ) -> Dict[str, Any]:
         """获取插件列表 - 使用ORM"""
         async with get_db_session() as session:
@@ -168,17 +165,22 @@ class PluginService:
             if enabled is not None:
                 query = query.where(Plugin.is_global_enabled == enabled)
 
-            # 总数
-            total_query = select(func.count()).select_from(query.subquery())
-            total_result = await session.execute(total_query)
-            total = total_result.scalar_one()
+            # 总数（结果缓存，写入后失效；include_total=False 时跳过）
+            total = await count_cache.count(session, query, include_total)
 
             # 分页数据
-            query = query.order_by(Plugin.priority.asc(), Plugin.plugin_name.asc())
-            query = query.offset((page - 1) * page_size).limit(page_size)
+            # 传入游标时按 (排序键, id) 定位，否则沿用 OFFSET 分页
+            keys = [
+                SortKey(Plugin.priority, descending=False),
+                SortKey(Plugin.plugin_name, descending=False),
+                SortKey(Plugin.id, descending=False)
+            ]
+            query = apply_cursor(query, keys, cursor)
+            if not cursor:
+                query = query.offset((page - 1) * page_size)
 
-            result = await session.execute(query)
-            plugins = result.scalars().all()
+            result = await session.execute(query.limit(page_size + 1))
+            plugins, next_cursor = split_page(result.scalars().all(), keys, page_size)
 
             return {
                 "plugins": [{
@@ -200,7 +202,8 @@ class PluginService:
                 "total": total,
                 "page": page,
                 "page_size": page_size,
-                "total_pages": (total + page_size - 1) // page_size
+                "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+                "next_cursor": next_cursor
             }
 
     @staticmethod
@@ -219,6 +222,7 @@ class PluginService:
                 plugin.is_global_enabled = enabled
                 plugin.updated_at = datetime.now()
                 await session.commit()
+                plugin_enablement.set_plugin(plugin_name, enabled)
                 return True
             except Exception as e:
                 print(f"切换插件状态失败: {e}")
@@ -230,34 +234,47 @@ class PluginService:
         """切换群组插件启用状态"""
         async with get_db_session() as session:
             try:
-                result = await session.execute(
-                    select(PluginGroupSetting).where(
-                        and_(
-                            PluginGroupSetting.plugin_name == plugin_name,
-                            PluginGroupSetting.group_id == group_id
-                        )
-                    )
+                stmt = sqlite_insert(PluginGroupSetting.__table__).values(
+                    plugin_name=plugin_name,
+                    group_id=group_id,
+                    is_enabled=enabled
                 )
-                group_setting = result.scalar_one_or_none()
-
-                if group_setting:
-                    group_setting.is_enabled = enabled
-                    group_setting.updated_at = datetime.now()
-                else:
-                    group_setting = PluginGroupSetting(
-                        plugin_name=plugin_name,
-                        group_id=group_id,
-                        is_enabled=enabled
-                    )
-                    session.add(group_setting)
-
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[PluginGroupSetting.__table__.c.plugin_name, PluginGroupSetting.__table__.c.group_id],
+                    set_={"is_enabled": enabled, "updated_at": datetime.now()}
+                )
+                await session.execute(stmt)
                 await session.commit()
+                plugin_enablement.set_group_plugin(plugin_name, group_id, enabled)
                 return True
             except Exception as e:
                 print(f"切换群组插件状态失败: {e}")
                 await session.rollback()
                 return False
 
+    @staticmethod
+    async def update_group_plugin_settings(plugin_name: str, group_id: str, settings: Dict[str, Any]) -> bool:
+        """更新插件在群组中的设置（限流等）"""
+        async with get_db_session() as session:
+            try:
+                stmt = sqlite_insert(PluginGroupSetting.__table__).values(
+                    plugin_name=plugin_name,
+                    group_id=group_id,
+                    settings=settings
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[PluginGroupSetting.__table__.c.plugin_name, PluginGroupSetting.__table__.c.group_id],
+                    set_={"settings": settings, "updated_at": datetime.now()}
+                )
+                await session.execute(stmt)
+                await session.commit()
+                rate_limiter.invalidate_group(group_id)
+                return True
+            except Exception as e:
+                print(f"更新群组插件设置失败: {e}")
+                await session.rollback()
+                return False
+
     @staticmethod
     async def get_group_plugin_settings(group_id: str) -> List[Dict[str, Any]]:
         """获取群组插件设置"""
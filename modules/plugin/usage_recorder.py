@@ -0,0 +1,157 @@
+"""
+插件使用记录 - 使用事件先放入内存，定期批量写入使用日志并以原子自增更新使用次数
+
+写回失败时保留在内存中等待重试；待写入的使用日志超过 max_backlog 时丢弃最早的日志
+（使用次数按插件/群组累计，不受影响）。数据库不可写期间不再提前写回，只按周期重试。
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import update, bindparam, func
+
+from core.database import get_db_session
+from core.flusher import PeriodicFlusher
+from .models import Plugin, PluginGroupSetting
+from .service import PluginService
+
+DEFAULT_USAGE_CONFIG = {
+    "flush_interval": 5,  # 写回间隔（秒）
+    "max_pending": 1000,  # 待写入的使用记录达到该数量时立即写回
+    "max_backlog": 10000  # 待写入（含写回失败待重试）的使用日志上限，超出时丢弃最早的日志
+}
+
+_plugins = Plugin.__table__
+_group_settings = PluginGroupSetting.__table__
+
+# usage_count = usage_count + :delta，多个插件实例同时写入时计数依然正确
+_PLUGIN_INCREMENT = (
+    update(_plugins)
+    .where(_plugins.c.plugin_name == bindparam("b_plugin_name"))
+    .values(
+        usage_count=func.coalesce(_plugins.c.usage_count, 0) + bindparam("b_delta"),
+        last_used=bindparam("b_last_used")
+    )
+)
+# 只更新已有的群组设置，与原先逐条记录时的行为一致
+_GROUP_INCREMENT = (
+    update(_group_settings)
+    .where(
+        _group_settings.c.plugin_name == bindparam("b_plugin_name"),
+        _group_settings.c.group_id == bindparam("b_group_id")
+    )
+    .values(usage_count=func.coalesce(_group_settings.c.usage_count, 0) + bindparam("b_delta"))
+)
+
+
+class PluginUsageRecorder(PeriodicFlusher):
+    def __init__(self):
+        super().__init__("插件使用记录", DEFAULT_USAGE_CONFIG["flush_interval"])
+        self.max_pending = DEFAULT_USAGE_CONFIG["max_pending"]
+        self.max_backlog = DEFAULT_USAGE_CONFIG["max_backlog"]
+        self._rows: List[Dict[str, Any]] = []
+        self._plugin_deltas: Dict[str, int] = defaultdict(int)
+        self._last_used: Dict[str, datetime] = {}
+        self._group_deltas: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_failed = False
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+
+    def configure(self, config: Dict[str, Any] = None):
+        """应用配置"""
+        config = {**DEFAULT_USAGE_CONFIG, **(config or {})}
+        self.interval = max(0.1, float(config["flush_interval"]))
+        self.max_pending = max(1, int(config["max_pending"]))
+        self.max_backlog = max(self.max_pending, int(config["max_backlog"]))
+
+    def record(
+            self,
+            plugin_name: str,
+            user_id: str,
+            group_id: str = None,
+            command: str = None,
+            result: str = None,
+            success: bool = True
+    ):
+        """记录一次插件使用（不等待写入）"""
+        now = datetime.now()
+        self._rows.append({
+            "plugin_name": plugin_name,
+            "user_id": user_id,
+            "group_id": group_id,
+            "command": command,
+            "result": result,
+            "execution_time": now,
+            "success": success
+        })
+        self._plugin_deltas[plugin_name] += 1
+        self._last_used[plugin_name] = now
+        if group_id:
+            self._group_deltas[(plugin_name, group_id)] += 1
+        self._trim()
+
+        self.ensure_started()
+        # 积压过多时不等下一个刷新周期，立即在后台写回（上次写回失败时等周期重试）
+        if len(self._rows) >= self.max_pending and not self._write_failed and \
+                (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush_now())
+
+    def _trim(self):
+        """待写入的日志超过上限时丢弃最早的"""
+        overflow = len(self._rows) - self.max_backlog
+        if overflow > 0:
+            del self._rows[:overflow]
+            self.dropped_rows += overflow
+
+    async def flush(self):
+        """一次事务内写入使用日志并更新使用次数"""
+        if not self._rows:
+            return
+
+        rows, self._rows = self._rows, []
+        plugin_deltas, self._plugin_deltas = self._plugin_deltas, defaultdict(int)
+        last_used, self._last_used = self._last_used, {}
+        group_deltas, self._group_deltas = self._group_deltas, defaultdict(int)
+
+        async with get_db_session() as session:
+            try:
+                await PluginService.add_usage_logs_bulk(rows, session=session)
+                await session.execute(_PLUGIN_INCREMENT, [
+                    {"b_plugin_name": name, "b_delta": delta, "b_last_used": last_used[name]}
+                    for name, delta in plugin_deltas.items()
+                ])
+                if group_deltas:
+                    await session.execute(_GROUP_INCREMENT, [
+                        {"b_plugin_name": name, "b_group_id": group_id, "b_delta": delta}
+                        for (name, group_id), delta in group_deltas.items()
+                    ])
+                await session.commit()
+                self.flushed_rows += len(rows)
+                self._write_failed = False
+            except Exception:
+                await session.rollback()
+                # 写回失败时放回内存，下次刷新重试
+                self._write_failed = True
+                self._rows[:0] = rows
+                self._trim()
+                for name, delta in plugin_deltas.items():
+                    self._plugin_deltas[name] += delta
+                for name, when in last_used.items():
+                    self._last_used.setdefault(name, when)
+                for key, delta in group_deltas.items():
+                    self._group_deltas[key] += delta
+                raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._rows),
+            "flushed": self.flushed_rows,
+            "dropped": self.dropped_rows,
+            "retrying": self._write_failed
+        }
+
+
+# 全局实例
+plugin_usage_recorder = PluginUsageRecorder()
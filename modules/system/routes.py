@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from .service import SystemService
 from core.nonebot_manager import nonebot_manager
+from core.query_metrics import query_metrics
+from core.rate_limiter import rate_limiter
 from core.security import verify_token
 import asyncio
 from datetime import datetime
@@ -15,20 +17,14 @@ async def get_system_status(request: Request):
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    bot_status = await SystemService.get_bot_status()
     nb_status = nonebot_manager.get_status()
 
-    # 强制同步状态 - 以管理器状态为准
-    if bot_status["is_running"] != nb_status["is_running"]:
-        print(f"状态不同步: 数据库={bot_status['is_running']}, 管理器={nb_status['is_running']}")
-        print("正在同步状态到数据库...")
+    # 以管理器状态为准（状态在内存中，不访问数据库）
+    if nonebot_manager.status.is_running != nb_status["is_running"]:
         await SystemService.force_sync_status(nb_status["is_running"])
-        # 重新获取状态
-        bot_status = await SystemService.get_bot_status()
-        print(f"状态同步完成: 数据库={bot_status['is_running']}")
+    bot_status = await SystemService.get_bot_status()
 
-    # 确保时间格式正确
-    response_data = {
+    return {
         "bot": bot_status,
         "nonebot": nb_status,
         "system": {
@@ -38,9 +34,6 @@ async def get_system_status(request: Request):
         }
     }
 
-    print(f"返回状态数据: {response_data}")
-    return response_data
-
 
 @router.post("/start")
 async def start_bot(request: Request):
@@ -116,6 +109,36 @@ async def update_bot_config(request: Request, config: dict):
         raise HTTPException(status_code=500, detail="配置更新失败")
 
 
+@router.get("/metrics/db")
+async def get_db_metrics(request: Request, top: int = Query(10, ge=1, le=100, description="每个排行返回的语句数")):
+    """获取SQL执行统计"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    return query_metrics.get_stats(top)
+
+
+@router.delete("/metrics/db")
+async def reset_db_metrics(request: Request):
+    """清空SQL执行统计"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    query_metrics.reset()
+    return {"message": "统计已清空"}
+
+
+@router.get("/metrics/rate-limit")
+async def get_rate_limit_metrics(request: Request):
+    """获取消息限流统计"""
+    token = request.cookies.get("access_token")
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="未授权")
+
+    return rate_limiter.get_stats()
+
 
 @router.get("/dashboard/stats")
 async def get_dashboard_stats(request: Request):
@@ -1,23 +1,29 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, UniqueConstraint, Index
 from datetime import datetime
 from core.database import Base
 
 
 class UserProfile(Base):
     __tablename__ = "user_profiles"
+    __table_args__ = (
+        # 用户列表各排序方式的游标分页
+        Index("ix_user_profiles_last_active_id", "last_active", "id"),
+        Index("ix_user_profiles_level_id", "level", "id"),
+        Index("ix_user_profiles_experience_id", "experience", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(String(20), unique=True, nullable=False)
     username = Column(String(100))
     nickname = Column(String(100))
     avatar = Column(String(500))  # 头像URL
-    level = Column(Integer, default=1)  # 用户等级
-    experience = Column(Integer, default=0)  # 经验值
+    level = Column(Integer, nullable=False, default=1)  # 用户等级
+    experience = Column(Integer, nullable=False, default=0)  # 经验值
     coins = Column(Integer, default=0)  # 金币/积分
     is_global_banned = Column(Boolean, default=False)  # 全局封禁
     global_ban_reason = Column(String(200))
     global_ban_time = Column(DateTime)
-    last_active = Column(DateTime, default=datetime.now)
+    last_active = Column(DateTime, nullable=False, default=datetime.now)
     settings = Column(JSON, default=dict)  # 用户设置
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -37,6 +43,9 @@ class UserPermission(Base):
 
 class UserStatistics(Base):
     __tablename__ = "user_statistics"
+    __table_args__ = (
+        UniqueConstraint("user_id", name="uq_user_statistics_user"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(String(20), nullable=False)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Request, Query
 from typing import Optional
 from datetime import datetime
 from .service import UserService
+from utils.pagination import InvalidCursor
 from core.security import verify_token
 
 router = APIRouter(prefix="/api/users", tags=["users"])
@@ -15,14 +16,19 @@ async def get_users(
         search: str = Query(None),
         banned: Optional[bool] = Query(None),
         sort_by: str = Query("last_active"),
-        sort_order: str = Query("desc")
+        sort_order: str = Query("desc"),
+        cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入时忽略 page"),
+        include_total: bool = Query(True, description="是否统计总数，翻页时可传 false 跳过 COUNT")
 ):
     """获取用户列表"""
     token = request.cookies.get("access_token")
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="未授权")
 
-    return await UserService.get_users(page, page_size, search, banned, sort_by, sort_order)
+    try:
+        return await UserService.get_users(page, page_size, search, banned, sort_by, sort_order, cursor, include_total)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/stats")
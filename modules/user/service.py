@@ -1,9 +1,40 @@
 from typing import List, Dict, Any, Optional
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from .models import UserProfile, UserPermission, UserStatistics
-from core.database import get_db_session
+from core.database import get_db_session, use_session
+from core.count_cache import count_cache
+from utils.pagination import SortKey, apply_cursor, split_page
 from datetime import datetime, timedelta
 
+_profiles = UserProfile.__table__
+_stats = UserStatistics.__table__
+
+# 用户资料 UPSERT：新用户直接插入，已有用户只覆盖传入的字段
+_profile_insert = sqlite_insert(_profiles).values(
+    user_id=bindparam("b_user_id"),
+    username=func.coalesce(bindparam("b_username"), bindparam("b_default_name")),
+    nickname=bindparam("b_nickname"),
+    last_active=bindparam("b_last_active")
+)
+_PROFILE_UPSERT = _profile_insert.on_conflict_do_update(
+    index_elements=[_profiles.c.user_id],
+    set_={
+        "username": func.coalesce(bindparam("b_username"), _profiles.c.username),
+        "nickname": func.coalesce(bindparam("b_nickname"), _profiles.c.nickname),
+        "last_active": _profile_insert.excluded.last_active,
+        "updated_at": bindparam("b_now")
+    }
+)
+# 用户统计记录只在首次出现时创建
+_STATS_INSERT = sqlite_insert(_stats).values(
+    user_id=bindparam("b_user_id"),
+    total_messages=0,
+    total_commands=0,
+    active_days=1
+).on_conflict_do_nothing(index_elements=[_stats.c.user_id])
+
 
 class UserService:
     @staticmethod
@@ -13,7 +44,9 @@ class UserService:
             search: str = None,
             banned: bool = None,
             sort_by: str = "last_active",
-            sort_order: str = "desc"
+            sort_order: str = "desc",
+            cursor: str = None,
+            include_total: bool = True
     ) -> Dict[str, Any]:
         """获取用户列表 - 使用ORM"""
         async with get_db_session() as session:
@@ -32,31 +65,30 @@ class UserService:
             if banned is not None:
                 query = query.where(UserProfile.is_global_banned == banned)
 
-            # 总数
-            total_query = select(func.count()).select_from(query.subquery())
-            total_result = await session.execute(total_query)
-            total = total_result.scalar_one()
+            # 总数（结果缓存，写入后失效；include_total=False 时跳过）
+            total = await count_cache.count(session, query, include_total)
 
-            # 排序
-            if sort_by == "last_active":
-                order_field = UserProfile.last_active
-            elif sort_by == "level":
-                order_field = UserProfile.level
+            # 排序（各排序列都有 (列, id) 索引）
+            if sort_by == "level":
+                order_column = UserProfile.level
             elif sort_by == "experience":
-                order_field = UserProfile.experience
+                order_column = UserProfile.experience
             else:
-                order_field = UserProfile.last_active
+                order_column = UserProfile.last_active
 
-            if sort_order == "desc":
-                query = query.order_by(order_field.desc())
-            else:
-                query = query.order_by(order_field.asc())
+            descending = sort_order == "desc"
+            keys = [
+                SortKey(order_column, descending),
+                SortKey(UserProfile.id, descending)
+            ]
 
-            # 分页
-            query = query.offset((page - 1) * page_size).limit(page_size)
+            # 传入游标时按 (排序键, id) 定位，否则沿用 OFFSET 分页
+            query = apply_cursor(query, keys, cursor)
+            if not cursor:
+                query = query.offset((page - 1) * page_size)
 
-            result = await session.execute(query)
-            users = result.scalars().all()
+            result = await session.execute(query.limit(page_size + 1))
+            users, next_cursor = split_page(result.scalars().all(), keys, page_size)
 
             # 获取用户统计信息
             user_stats = {}
@@ -95,9 +127,19 @@ class UserService:
                 "total": total,
                 "page": page,
                 "page_size": page_size,
-                "total_pages": (total + page_size - 1) // page_size
+                "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+                "next_cursor": next_cursor
             }
 
+    @staticmethod
+    async def get_user(user_id: str, session: AsyncSession = None) -> Optional[UserProfile]:
+        """获取用户基本资料 - 使用ORM"""
+        async with use_session(session) as db:
+            result = await db.execute(
+                select(UserProfile).where(UserProfile.user_id == user_id)
+            )
+            return result.scalar_one_or_none()
+
     @staticmethod
     async def get_user_detail(user_id: str) -> Optional[Dict[str, Any]]:
         """获取用户详情 - 使用ORM"""
@@ -298,48 +340,42 @@ class UserService:
             user_id: str,
             username: str = None,
             nickname: str = None,
-            last_active: datetime = None
+            last_active: datetime = None,
+            session: AsyncSession = None
     ):
-        """更新用户资料"""
-        async with get_db_session() as session:
-            try:
-                # 查找现有用户
-                result = await session.execute(
-                    select(UserProfile).where(UserProfile.user_id == user_id)
-                )
-                user = result.scalar_one_or_none()
-
-                if user:
-                    # 更新现有用户
-                    if username:
-                        user.username = username
-                    if nickname:
-                        user.nickname = nickname
-                    if last_active:
-                        user.last_active = last_active
-                    else:
-                        user.last_active = datetime.now()
-                else:
-                    # 创建新用户
-                    user = UserProfile(
-                        user_id=user_id,
-                        username=username or f"用户{user_id}",
-                        nickname=nickname,
-                        last_active=last_active or datetime.now()
-                    )
-                    session.add(user)
-
-                    # 同时创建用户统计记录
-                    user_stats = UserStatistics(
-                        user_id=user_id,
-                        total_messages=0,
-                        total_commands=0,
-                        active_days=1
-                    )
-                    session.add(user_stats)
+        """更新用户资料（传入session时加入调用方的工作单元）"""
+        try:
+            await UserService.upsert_user_profiles([{
+                "user_id": user_id,
+                "username": username,
+                "nickname": nickname,
+                "last_active": last_active
+            }], session=session)
+            print(f"✅ 用户资料更新: {user_id}")
+        except Exception as e:
+            print(f"❌ 更新用户资料失败: {e}")
+            if session is not None:
+                raise
 
-                await session.commit()
-                print(f"✅ 用户资料更新: {user_id}")
-            except Exception as e:
-                print(f"❌ 更新用户资料失败: {e}")
-                await session.rollback()
\ No newline at end of file
+    @staticmethod
+    async def upsert_user_profiles(users: List[Dict[str, Any]], session: AsyncSession = None):
+        """批量插入或更新用户资料（INSERT ... ON CONFLICT DO UPDATE），新用户同时创建统计记录
+
+        每项需包含 user_id，可选 username、nickname、last_active；未传入的字段保持原值。
+        """
+        if not users:
+            return
+
+        now = datetime.now()
+        params = [{
+            "b_user_id": user["user_id"],
+            "b_username": user.get("username") or None,
+            "b_default_name": f"用户{user['user_id']}",
+            "b_nickname": user.get("nickname") or None,
+            "b_last_active": user.get("last_active") or now,
+            "b_now": now
+        } for user in users]
+
+        async with use_session(session) as db:
+            await db.execute(_PROFILE_UPSERT, params)
+            await db.execute(_STATS_INSERT, [{"b_user_id": p["b_user_id"]} for p in params])
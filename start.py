@@ -3,18 +3,26 @@
 NoneBot WebUI管理系统启动脚本
 """
 
+import argparse
 import asyncio
+import importlib.util
 import sys
 import os
 
 # 添加当前目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# 仅依赖标准库，最先导入以便统计后续的导入耗时
+from core.startup import startup_timer, import_profiler
+
+REQUIRED_PACKAGES = ["nonebot", "fastapi", "sqlalchemy"]
+
 
 async def main():
     """主启动函数"""
     try:
-        from main import main as app_main
+        with startup_timer.phase("导入模块"):
+            from main import main as app_main
         await app_main()
     except ImportError as e:
         print(f"导入错误: {e}")
@@ -32,17 +40,20 @@ if __name__ == "__main__":
     print("NoneBot WebUI管理系统")
     print("=" * 50)
 
-    # 检查依赖
-    try:
-        import nonebot
-        import fastapi
-        import sqlalchemy
+    parser = argparse.ArgumentParser(description="NoneBot WebUI管理系统")
+    parser.add_argument("--profile-startup", action="store_true", help="统计各模块导入耗时并在启动完成后输出")
+    args = parser.parse_args()
 
-        print("✓ 依赖检查通过")
-    except ImportError as e:
-        print(f"✗ 依赖缺失: {e}")
+    # 检查依赖（只查找不导入，避免启动前就加载这些包）
+    missing = [name for name in REQUIRED_PACKAGES if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"✗ 依赖缺失: {', '.join(missing)}")
         print("请运行: pip install -r requirements.txt")
         sys.exit(1)
+    print("✓ 依赖检查通过")
+
+    if args.profile_startup:
+        import_profiler.start()
 
     # 启动应用
     try:
@@ -0,0 +1,25 @@
+"""
+测试公共设置 - 项目根目录加入导入路径，数据库放在临时目录
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def run(coro):
+    """在新的事件循环中运行协程（数据库引擎与事件循环绑定，一个测试内的操作放在同一个协程中）"""
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """切换到临时目录，init_database 会在其中创建 data/data.db"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
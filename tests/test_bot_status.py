@@ -0,0 +1,33 @@
+"""
+机器人状态：修改后写回，关闭时写回剩余修改
+"""
+from sqlalchemy import select
+
+from conftest import run
+from core.bot_status import BotStatusStore
+from core.flusher import _flushers
+from core.database import init_database, close_database, get_db_session
+from modules.system.models import BotStatus
+
+
+def test_updates_are_written_back(workdir):
+    async def scenario():
+        await init_database()
+        try:
+            store = BotStatusStore()
+            await store.load()
+            store.update(is_running=True)
+            store.update(total_messages=42)
+            await store.stop()
+
+            async with get_db_session() as session:
+                rows = (await session.execute(select(BotStatus))).scalars().all()
+            return [(row.is_running, row.total_messages) for row in rows], store
+        finally:
+            await close_database()
+
+    rows, store = run(scenario())
+    assert rows == [(True, 42)]
+    # 不再注册为周期刷新任务
+    assert store not in _flushers
+    assert not store._dirty
@@ -0,0 +1,128 @@
+"""
+分页总数缓存：写入提交后失效，回滚不影响缓存与计数器
+"""
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from conftest import run
+import core.count_cache as count_cache_module
+from core.count_cache import CountCache
+
+metadata = MetaData()
+items = Table(
+    "items", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("kind", String(10))
+)
+
+
+def with_cache(tmp_path, scenario):
+    """在临时数据库上运行 scenario(cache, session)"""
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'count.db'}")
+        cache = CountCache()
+        cache.install(engine)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(metadata.create_all)
+            async with AsyncSession(engine) as session:
+                await session.execute(insert(items), [{"kind": "a"}, {"kind": "a"}, {"kind": "b"}])
+                await session.commit()
+                return await scenario(cache, session)
+        finally:
+            await engine.dispose()
+
+    return run(main())
+
+
+def test_filtered_count_invalidated_on_commit(tmp_path):
+    query = select(items).where(items.c.kind == "a")
+
+    async def scenario(cache, session):
+        counts = [await cache.count(session, query), await cache.count(session, query)]
+        hits = cache.hits
+        await session.execute(insert(items).values(kind="a"))
+        await session.commit()
+        counts.append(await cache.count(session, query))
+        return counts, hits
+
+    counts, hits = with_cache(tmp_path, scenario)
+    assert counts == [2, 2, 3]
+    assert hits == 1
+
+
+def test_row_counter_follows_inserts_and_deletes(tmp_path):
+    query = select(items)
+
+    async def scenario(cache, session):
+        counts = [await cache.count(session, query)]
+        await session.execute(insert(items), [{"kind": "c"}, {"kind": "c"}])
+        await session.commit()
+        counts.append(await cache.count(session, query))
+        await session.execute(delete(items).where(items.c.kind == "a"))
+        await session.commit()
+        counts.append(await cache.count(session, query))
+        return counts, cache.misses
+
+    counts, misses = with_cache(tmp_path, scenario)
+    assert counts == [3, 5, 3]
+    # 只有首次统计访问数据库，之后由计数器维护
+    assert misses == 1
+
+
+def test_rollback_keeps_cached_totals(tmp_path):
+    filtered = select(items).where(items.c.kind == "a")
+    unfiltered = select(items)
+
+    async def scenario(cache, session):
+        await cache.count(session, filtered)
+        await cache.count(session, unfiltered)
+        await session.execute(insert(items).values(kind="a"))
+        await session.execute(update(items).values(kind="a"))
+        await session.rollback()
+        misses = cache.misses
+        counts = [await cache.count(session, filtered), await cache.count(session, unfiltered)]
+        # 回滚丢弃的变化不会在之后的提交中生效
+        await session.execute(insert(items).values(kind="b"))
+        await session.commit()
+        counts.append(await cache.count(session, unfiltered))
+        return counts, cache.misses - misses
+
+    counts, new_misses = with_cache(tmp_path, scenario)
+    assert counts == [2, 3, 4]
+    assert new_misses == 0
+
+
+def test_include_total_false_skips_count(tmp_path):
+    async def scenario(cache, session):
+        return await cache.count(session, select(items), include_total=False), cache.misses
+
+    assert with_cache(tmp_path, scenario) == (None, 0)
+
+
+def _stale_counts(tmp_path, monkeypatch, stale_seconds, age):
+    """统计后经过 age 秒并写入一行，返回 [首次总数, 再次查询的总数]"""
+    now = [100.0]
+    monkeypatch.setattr(count_cache_module.time, "monotonic", lambda: now[0])
+    query = select(items).where(items.c.kind == "a")
+
+    async def scenario(cache, session):
+        cache.configure({"stale_seconds": stale_seconds})
+        counts = [await cache.count(session, query)]
+        now[0] += age
+        await session.execute(insert(items).values(kind="a"))
+        await session.commit()
+        counts.append(await cache.count(session, query))
+        return counts
+
+    return with_cache(tmp_path, scenario)
+
+
+def test_stale_seconds_serves_young_entry_after_write(tmp_path, monkeypatch):
+    # 距统计时间不超过 stale_seconds：写入后仍返回旧值
+    assert _stale_counts(tmp_path, monkeypatch, stale_seconds=30, age=10) == [2, 2]
+
+
+def test_stale_seconds_recounts_old_entry_after_write(tmp_path, monkeypatch):
+    # stale_seconds 从统计时算起，而不是从写入时算起：旧条目在写入后立即重新统计
+    assert _stale_counts(tmp_path, monkeypatch, stale_seconds=30, age=60) == [2, 3]
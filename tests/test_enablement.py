@@ -0,0 +1,94 @@
+"""
+插件启用索引：启动时加载全部开关，只有被淘汰的群组才读取数据库
+"""
+from conftest import run
+from core.database import init_database, close_database, get_db_session
+from modules.plugin.enablement import PluginEnablementIndex
+from modules.plugin.models import Plugin, PluginGroupSetting
+
+
+async def seed():
+    async with get_db_session() as session:
+        session.add_all([
+            Plugin(plugin_name="echo", is_global_enabled=True),
+            Plugin(plugin_name="weather", is_global_enabled=True),
+            Plugin(plugin_name="admin", is_global_enabled=False),
+            PluginGroupSetting(plugin_name="echo", group_id="1", is_enabled=False),
+            PluginGroupSetting(plugin_name="weather", group_id="2", is_enabled=False),
+            PluginGroupSetting(plugin_name="weather", group_id="3", is_enabled=True),
+        ])
+        await session.commit()
+
+
+def test_load_serves_all_groups_from_memory(workdir):
+    async def scenario():
+        await init_database()
+        try:
+            await seed()
+            index = PluginEnablementIndex()
+            await index.load()
+            return (
+                await index.disabled_plugins("1"),
+                await index.disabled_plugins("2"),
+                await index.disabled_plugins("999"),
+                await index.disabled_plugins(None),
+                await index.is_enabled("weather", "3"),
+                index.misses
+            )
+        finally:
+            await close_database()
+
+    group1, group2, unknown, private, weather_in_3, misses = run(scenario())
+    assert group1 == {"admin", "echo"}
+    assert group2 == {"admin", "weather"}
+    # 没有任何设置的群组只受全局开关影响
+    assert unknown == {"admin"}
+    assert private == {"admin"}
+    assert weather_in_3
+    assert misses == 0
+
+
+def test_evicted_group_is_read_back(workdir):
+    async def scenario():
+        await init_database()
+        try:
+            await seed()
+            index = PluginEnablementIndex()
+            index.configure({"max_groups": 1})
+            await index.load()
+            # 只缓存了最后加载的群组，其余群组被淘汰后从数据库读取
+            disabled = [await index.disabled_plugins(group_id) for group_id in ("1", "2", "3")]
+            return disabled, index.misses, len(index._groups)
+        finally:
+            await close_database()
+
+    disabled, misses, cached = run(scenario())
+    assert disabled == [{"admin", "echo"}, {"admin", "weather"}, {"admin"}]
+    assert misses >= 2
+    assert cached == 1
+
+
+def test_toggles_update_index_without_reload(workdir):
+    async def scenario():
+        await init_database()
+        try:
+            await seed()
+            index = PluginEnablementIndex()
+            await index.load()
+            index.set_group_plugin("echo", "1", True)
+            index.set_group_plugin("echo", "42", False)
+            index.set_plugin("weather", False)
+            return (
+                await index.disabled_plugins("1"),
+                await index.disabled_plugins("42"),
+                await index.disabled_plugins("999"),
+                index.misses
+            )
+        finally:
+            await close_database()
+
+    group1, new_group, unknown, misses = run(scenario())
+    assert group1 == {"admin", "weather"}
+    assert new_group == {"admin", "echo", "weather"}
+    assert unknown == {"admin", "weather"}
+    assert misses == 0
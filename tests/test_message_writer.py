@@ -0,0 +1,94 @@
+"""
+消息日志写入器：写入失败的批次重试、队列上限重新配置
+"""
+import asyncio
+
+from conftest import run
+from core.message_writer import MessageLogWriter
+from modules.log.service import LogService
+
+
+def _enqueue(writer, count, start=0):
+    for i in range(start, start + count):
+        assert writer.enqueue("1", str(i), "u", "group", f"m{i}")
+
+
+def test_failed_batch_is_retried(monkeypatch):
+    written = []
+    failures = {"left": 2}
+
+    async def fake_bulk(rows):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("database is locked")
+        written.extend(rows)
+        return len(rows)
+
+    monkeypatch.setattr(LogService, "add_message_logs_bulk", staticmethod(fake_bulk))
+
+    async def scenario():
+        writer = MessageLogWriter()
+        writer.configure({"batch_size": 10, "flush_interval_ms": 10})
+        _enqueue(writer, 25)
+        for _ in range(100):
+            if len(written) == 25:
+                break
+            await asyncio.sleep(0.01)
+        await writer.stop()
+        return writer
+
+    writer = run(scenario())
+    # 两次失败后全部写入，顺序不变，没有放弃的消息
+    assert [row["user_id"] for row in written] == [str(i) for i in range(25)]
+    assert writer.failed_rows == 0
+    assert writer.retried_rows > 0
+    assert writer.get_stats()["retrying"] == 0
+
+
+def test_flush_keeps_failed_rows_in_order(monkeypatch):
+    async def failing_bulk(rows):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(LogService, "add_message_logs_bulk", staticmethod(failing_bulk))
+
+    async def scenario():
+        writer = MessageLogWriter()
+        writer.configure({"batch_size": 4, "max_queue_size": 100})
+        _enqueue(writer, 10)
+        await writer.stop()
+        return writer
+
+    writer = run(scenario())
+    assert [row["user_id"] for row in writer._retry_rows] == [str(i) for i in range(10)]
+
+
+def test_retry_backlog_is_bounded():
+    writer = MessageLogWriter()
+    writer.configure({"max_queue_size": 5})
+    writer._requeue([{"user_id": str(i)} for i in range(3, 8)])
+    writer._requeue([{"user_id": str(i)} for i in range(3)])
+    # 超出上限时放弃最早的消息
+    assert [row["user_id"] for row in writer._retry_rows] == ["3", "4", "5", "6", "7"]
+    assert writer.failed_rows == 3
+
+
+def test_configure_resizes_running_queue(monkeypatch):
+    async def fake_bulk(rows):
+        return len(rows)
+
+    monkeypatch.setattr(LogService, "add_message_logs_bulk", staticmethod(fake_bulk))
+
+    async def scenario():
+        writer = MessageLogWriter()
+        writer.configure({"max_queue_size": 2, "flush_interval_ms": 1000, "batch_size": 100})
+        writer.start()
+        writer.configure({"max_queue_size": 50, "flush_interval_ms": 10, "batch_size": 100})
+        _enqueue(writer, 20)
+        maxsize = writer._queue.maxsize
+        await writer.stop()
+        return writer, maxsize
+
+    writer, maxsize = run(scenario())
+    assert maxsize == 50
+    assert writer.dropped_rows == 0
+    assert writer.flushed_rows == 20
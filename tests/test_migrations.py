@@ -0,0 +1,55 @@
+"""
+数据库迁移：补建唯一约束时合并重复行
+"""
+from sqlalchemy import create_engine, text
+
+from core.migrations import add_unique_constraint
+
+
+def test_duplicates_are_merged_into_kept_row():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE group_users (id INTEGER PRIMARY KEY, group_id VARCHAR, user_id VARCHAR, "
+            "user_name VARCHAR, message_count INTEGER, join_time DATETIME, last_speak DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO group_users (group_id, user_id, user_name, message_count, join_time, last_speak) VALUES "
+            "('1', 'a', 'first', 5, '2024-01-02 00:00:00', '2024-02-01 00:00:00'), "
+            "('1', 'a', 'second', 7, '2024-01-01 00:00:00', '2024-03-01 00:00:00'), "
+            "('1', 'a', 'third', NULL, NULL, NULL), "
+            "('1', 'b', 'other', 3, '2024-01-05 00:00:00', '2024-01-06 00:00:00')"
+        ))
+
+        add_unique_constraint(conn, "group_users", "uq_group_users_group_user", ("group_id", "user_id"), merge={
+            "message_count": "SUM", "join_time": "MIN", "last_speak": "MAX"
+        })
+
+        rows = conn.execute(text(
+            "SELECT id, user_id, user_name, message_count, join_time, last_speak FROM group_users ORDER BY id"
+        )).all()
+        unique = conn.execute(text("PRAGMA index_list(group_users)")).mappings().all()
+
+    assert rows == [
+        (1, "a", "first", 12, "2024-01-01 00:00:00", "2024-03-01 00:00:00"),
+        (4, "b", "other", 3, "2024-01-05 00:00:00", "2024-01-06 00:00:00")
+    ]
+    assert any(index["name"] == "uq_group_users_group_user" and index["unique"] for index in unique)
+
+
+def test_keep_max_keeps_latest_row():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE plugin_group_settings (id INTEGER PRIMARY KEY, plugin_name VARCHAR, group_id VARCHAR, "
+            "is_enabled BOOLEAN, usage_count INTEGER)"
+        ))
+        conn.execute(text(
+            "INSERT INTO plugin_group_settings (plugin_name, group_id, is_enabled, usage_count) VALUES "
+            "('echo', '1', 1, 4), ('echo', '1', 0, 6)"
+        ))
+        add_unique_constraint(conn, "plugin_group_settings", "uq_plugin_group_settings_plugin_group",
+                              ("plugin_name", "group_id"), keep="MAX", merge={"usage_count": "SUM"})
+        rows = conn.execute(text("SELECT id, is_enabled, usage_count FROM plugin_group_settings")).all()
+
+    assert rows == [(2, 0, 10)]
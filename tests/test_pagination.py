@@ -0,0 +1,96 @@
+"""
+游标分页：逐页读取与整体排序一致，游标与排序方式不匹配时拒绝
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Index, Integer, create_engine, select, text
+from sqlalchemy.orm import Session, declarative_base
+
+from utils.pagination import InvalidCursor, SortKey, apply_cursor, split_page
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    __table_args__ = (
+        Index("ix_items_score_id", "score", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    score = Column(Integer, nullable=False)
+    seen_at = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with Session(engine) as session:
+        # 包含重复值
+        session.add_all([
+            Item(id=i, score=i % 4, seen_at=start + timedelta(hours=i % 6))
+            for i in range(1, 41)
+        ])
+        session.commit()
+        yield session
+
+
+def _read_all_pages(session, keys, page_size):
+    ids, cursor = [], None
+    while True:
+        query = apply_cursor(select(Item), keys, cursor)
+        rows, cursor = split_page(session.execute(query.limit(page_size + 1)).scalars().all(), keys, page_size)
+        ids.extend(row.id for row in rows)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("keys", [
+    [SortKey(Item.score), SortKey(Item.id)],
+    [SortKey(Item.seen_at), SortKey(Item.id)],
+    [SortKey(Item.score, descending=False), SortKey(Item.id, descending=False)],
+    # 方向混合
+    [SortKey(Item.score, descending=False), SortKey(Item.id)],
+])
+def test_pages_follow_full_ordering(session, keys):
+    expected = [row.id for row in session.execute(apply_cursor(select(Item), keys)).scalars()]
+    assert _read_all_pages(session, keys, page_size=6) == expected
+    assert len(expected) == 40
+
+
+def test_split_page_without_more_rows_has_no_cursor(session):
+    keys = [SortKey(Item.id)]
+    rows, cursor = split_page(session.execute(apply_cursor(select(Item), keys)).scalars().all(), keys, 50)
+    assert len(rows) == 40
+    assert cursor is None
+
+
+def test_cursor_for_other_sort_is_rejected(session):
+    score_keys = [SortKey(Item.score), SortKey(Item.id)]
+    rows = session.execute(apply_cursor(select(Item), score_keys).limit(3)).scalars().all()
+    _, cursor = split_page(rows, score_keys, 2)
+
+    with pytest.raises(InvalidCursor):
+        apply_cursor(select(Item), [SortKey(Item.seen_at), SortKey(Item.id)], cursor)
+    with pytest.raises(InvalidCursor):
+        apply_cursor(select(Item), [SortKey(Item.score, descending=False), SortKey(Item.id)], cursor)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", "!!!"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        apply_cursor(select(Item), [SortKey(Item.id)], cursor)
+
+
+def test_cursor_page_uses_index_without_sorting(session):
+    keys = [SortKey(Item.score), SortKey(Item.id)]
+    rows = session.execute(apply_cursor(select(Item), keys).limit(3)).scalars().all()
+    _, cursor = split_page(rows, keys, 2)
+    query = apply_cursor(select(Item), keys, cursor).limit(3)
+    compiled = query.compile(session.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = " ".join(row[-1] for row in session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    assert "ix_items_score_id" in plan
+    assert "TEMP B-TREE" not in plan
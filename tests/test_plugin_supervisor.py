@@ -0,0 +1,89 @@
+"""
+插件监督：处理函数超时、同步处理函数放入插件线程池
+"""
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from conftest import run
+from core.plugin_supervisor import PluginSupervisor
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_async_handler_timeout_is_counted():
+    supervisor = PluginSupervisor()
+
+    async def slow(**values):
+        await asyncio.sleep(1)
+
+    call = supervisor._wrap(slow, "slow_plugin", 0.05, False)
+    with pytest.raises(TimeoutError):
+        run(call())
+    assert supervisor.timeouts["slow_plugin"] == 1
+
+
+def test_handler_within_timeout_returns_result():
+    supervisor = PluginSupervisor()
+
+    async def fast(value):
+        return value * 2
+
+    call = supervisor._wrap(fast, "fast_plugin", 1, False)
+    assert run(call(value=21)) == 42
+    assert not supervisor.timeouts
+
+
+def test_offloaded_sync_handler_runs_in_plugin_pool():
+    supervisor = PluginSupervisor()
+
+    def blocking():
+        return threading.current_thread().name, request_id.get()
+
+    call = supervisor._wrap(blocking, "sync_plugin", 0, True)
+
+    async def scenario():
+        request_id.set("event-1")
+        try:
+            return await call()
+        finally:
+            await supervisor.stop()
+
+    thread_name, seen = run(scenario())
+    assert thread_name.startswith("plugin-offload")
+    # 线程中仍可读取事件处理时的上下文变量
+    assert seen == "event-1"
+    assert supervisor.offloaded["sync_plugin"] == 1
+    assert supervisor.offload_running == 0
+
+
+def test_timed_out_offload_counts_as_running_until_thread_finishes():
+    supervisor = PluginSupervisor()
+    release = threading.Event()
+    finished = threading.Event()
+
+    def stuck():
+        release.wait(5)
+        finished.set()
+
+    call = supervisor._wrap(stuck, "stuck_plugin", 0.05, True)
+
+    async def scenario():
+        try:
+            with pytest.raises(TimeoutError):
+                await call()
+            # 已不再等待，但线程仍在运行
+            running = supervisor.offload_running
+            release.set()
+            for _ in range(100):
+                if finished.is_set() and not supervisor.offload_running:
+                    break
+                await asyncio.sleep(0.01)
+            return running, supervisor.offload_running
+        finally:
+            await supervisor.stop()
+
+    assert run(scenario()) == (1, 0)
+    assert supervisor.timeouts["stuck_plugin"] == 1
@@ -0,0 +1,137 @@
+"""
+消息限流：令牌桶扣除、丢弃与延后、空闲桶清理、设置修改后立即生效
+"""
+import pytest
+
+from conftest import run
+import core.rate_limiter as rate_limiter_module
+from core.rate_limiter import RateLimiter, TokenBucket, parse_limit, parse_limits
+from core.database import init_database, close_database, get_db_session
+from modules.group.models import Group
+from modules.group.service import GroupService
+from modules.plugin.service import PluginService
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可控的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_limiter(**config) -> RateLimiter:
+    limiter = RateLimiter()
+    limiter.configure(config)
+    return limiter
+
+
+def test_token_bucket_refill_is_capped():
+    bucket = TokenBucket(rate=2, burst=5, now=0)
+    bucket.tokens = 0
+    bucket.refill(1)
+    assert bucket.tokens == 2
+    bucket.refill(100)
+    assert bucket.tokens == 5
+    assert bucket.is_full(100)
+
+
+def test_parse_limits_ignores_invalid_entries():
+    assert parse_limit({"rate": 0, "burst": 0}) is None
+    assert parse_limit({"rate": "x"}) is None
+    assert parse_limit({"rate": 0.5}) == (0.5, 1.0)
+    assert parse_limits({"rate_limit": {"group": {"rate": 2, "burst": 4}, "user": None}}) == {"group": (2.0, 4.0)}
+    assert parse_limits(None) == {}
+
+
+def test_default_config_has_no_user_limit():
+    assert make_limiter().user_limit is None
+
+
+def test_acquire_drops_after_burst(clock):
+    limiter = make_limiter()
+    checks = [(("user", "1"), (1.0, 3.0))]
+    assert [limiter._acquire(checks) for _ in range(4)] == [0.0, 0.0, 0.0, None]
+    clock[0] += 1
+    assert limiter._acquire(checks) == 0.0
+    assert limiter._acquire(checks) is None
+
+
+def test_acquire_is_all_or_nothing(clock):
+    limiter = make_limiter()
+    user = (("user", "1"), (1.0, 5.0))
+    group = (("group", "g"), (1.0, 1.0))
+    assert limiter._acquire([user, group]) == 0.0
+    # 群组桶已空：整体超限，用户桶不扣除
+    assert limiter._acquire([user, group]) is None
+    assert limiter._buckets[("user", "1")].tokens == 4
+
+
+def test_acquire_defers_within_max_defer(clock):
+    limiter = make_limiter(action="defer", max_defer=2)
+    checks = [(("user", "1"), (1.0, 1.0))]
+    assert limiter._acquire(checks) == 0.0
+    assert limiter._acquire(checks) == pytest.approx(1.0)
+    # 延后的事件已预先扣除令牌，下一个需要等待更久
+    assert limiter._acquire(checks) == pytest.approx(2.0)
+    assert limiter._acquire(checks) is None
+
+
+def test_apply_counts_and_defers(clock, monkeypatch):
+    slept = []
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+
+    monkeypatch.setattr(rate_limiter_module.asyncio, "sleep", fake_sleep)
+    limiter = make_limiter(action="defer", max_defer=1)
+    checks = [(("user", "1"), (1.0, 1.0))]
+
+    async def scenario():
+        return [await limiter._apply(checks, "event") for _ in range(3)]
+
+    assert run(scenario()) == [True, True, False]
+    assert slept == [pytest.approx(1.0)]
+    assert limiter.allowed == 2
+    assert limiter.deferred["event"] == 1
+    assert limiter.dropped["event"] == 1
+    assert limiter.deferring == 0
+
+
+def test_sweep_removes_refilled_buckets(clock):
+    limiter = make_limiter(sweep_interval=10)
+    limiter._acquire([(("user", "1"), (1.0, 5.0))])
+    limiter._acquire([(("user", "2"), (0.01, 5.0))])
+    clock[0] += 10
+    limiter._acquire([(("user", "3"), (1.0, 5.0))])
+    assert set(limiter._buckets) == {("user", "2"), ("user", "3")}
+    assert limiter.evicted == 1
+
+
+def test_settings_updates_take_effect_immediately(workdir):
+    async def scenario():
+        await init_database()
+        try:
+            async with get_db_session() as session:
+                session.add(Group(group_id="100", group_name="测试群"))
+                await session.commit()
+
+            limiter = rate_limiter_module.rate_limiter
+            limiter.configure({"settings_ttl": 3600})
+            before = (await limiter._group_limits("100"))[:2]
+
+            await GroupService.update_group_settings("100", {"rate_limit": {"group": {"rate": 2, "burst": 4}}})
+            await PluginService.update_group_plugin_settings(
+                "echo", "100", {"rate_limit": {"user": {"rate": 1, "burst": 1}}}
+            )
+            after = (await limiter._group_limits("100"))[:2]
+
+            allowed = [await limiter.check_plugin("echo", "7", "100") for _ in range(2)]
+            return before, after, allowed
+        finally:
+            await close_database()
+
+    before, after, allowed = run(scenario())
+    assert before == ({}, {})
+    assert after == ({"group": (2.0, 4.0)}, {"echo": {"user": (1.0, 1.0)}})
+    assert allowed == [True, False]
@@ -0,0 +1,118 @@
+"""
+消息全文检索：MATCH 条件生成（trigram / bigram / 短词退回 LIKE）与实际查询
+"""
+import pytest
+
+from conftest import run
+from core.database import init_database, close_database
+from modules.log import search
+from modules.log.search import FTS_TABLE, FTS_BIGRAM_TABLE, bigram, match_clauses
+from modules.log.service import LogService
+
+
+def test_bigram_splits_cjk_runs_only():
+    assert bigram("今天天气 hello").split() == ["今天", "天天", "天气", "hello"]
+    assert bigram("好").split() == ["好"]
+
+
+def test_trigram_long_terms_use_main_index():
+    assert match_clauses("trigram", "hello 天气预报", True) == [(FTS_TABLE, '"hello" "天气预报"')]
+
+
+def test_trigram_two_char_cjk_terms_use_short_index():
+    assert match_clauses("trigram", "天气", True) == [(FTS_BIGRAM_TABLE, '"天气"')]
+    assert match_clauses("trigram", "世界 天气预报", True) == [
+        (FTS_TABLE, '"天气预报"'),
+        (FTS_BIGRAM_TABLE, '"世界"')
+    ]
+
+
+@pytest.mark.parametrize("q", ["好", "ok", "天气 a", "天气"])
+def test_trigram_falls_back_to_like(q):
+    # 单字、英文短词，或没有短词索引时退回 LIKE
+    has_bigram_table = q != "天气"
+    assert match_clauses("trigram", q, has_bigram_table) is None
+
+
+def test_bigram_mode_matches_phrases():
+    assert match_clauses("bigram", "天气预报 hello", False) == [(FTS_TABLE, '"天气 气预 预报" "hello"')]
+    assert match_clauses("bigram", "好", False) is None
+
+
+def test_no_index_falls_back_to_like():
+    assert match_clauses("", "天气预报", False) is None
+
+
+def test_search_messages(workdir):
+    contents = ["今天天气不错", "明天的天气预报", "世界你好", "hello world", "天真的孩子"]
+
+    async def scenario():
+        await init_database()
+        try:
+            await LogService.add_message_logs_bulk([
+                {"group_id": "1", "user_id": "2", "user_name": "u", "message_type": "group", "message_content": content}
+                for content in contents
+            ])
+            results = {}
+            for q in ("天气", "天气预报", "世界", "world", "天"):
+                page = await LogService.get_message_logs(q=q)
+                results[q] = (page["search_mode"], sorted(log["message_content"] for log in page["logs"]))
+            return results
+        finally:
+            await close_database()
+
+    results = run(scenario())
+    assert results["天气"] == ("fulltext", ["今天天气不错", "明天的天气预报"])
+    assert results["天气预报"] == ("fulltext", ["明天的天气预报"])
+    assert results["世界"] == ("fulltext", ["世界你好"])
+    assert results["world"] == ("fulltext", ["hello world"])
+    # 单字仍退回 LIKE
+    assert results["天"] == ("like", ["今天天气不错", "天真的孩子", "明天的天气预报"])
+
+
+@pytest.fixture(autouse=True)
+def reset_search_mode(monkeypatch):
+    # 模式检测结果按进程缓存，每个测试使用新的数据库
+    monkeypatch.setattr(search, "_mode", None)
+    monkeypatch.setattr(search, "_has_bigram_table", False)
+
+
+def test_bigram_index_is_maintained_without_triggers(workdir):
+    import sqlite3
+    from datetime import datetime, timedelta
+    from sqlalchemy import text
+    from core.database import get_db_session
+
+    async def scenario():
+        await init_database()
+        try:
+            async with get_db_session() as session:
+                triggers = (await session.execute(
+                    text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND sql LIKE '%fts_bigram%'")
+                )).scalars().all()
+            # 其它连接（没有注册 fts_bigram）也能写入和删除消息
+            external = sqlite3.connect("data/data.db")
+            external.execute("INSERT INTO message_logs (group_id, user_id, message_content, timestamp) VALUES ('1', '2', '外部写入', '2000-01-01 00:00:00')")
+            external.execute("DELETE FROM message_logs WHERE message_content = '外部写入'")
+            external.commit()
+            external.close()
+
+            old = datetime.now() - timedelta(days=30)
+            await LogService.add_message_logs_bulk([
+                {"group_id": "1", "user_id": "2", "message_content": "旧的天气消息", "timestamp": old},
+                {"group_id": "1", "user_id": "2", "message_content": "新的天气消息"}
+            ])
+            await LogService.add_message_log("1", "2", "u", "group", "单条天气消息")
+            before = sorted(log["message_content"] for log in (await LogService.get_message_logs(q="天气"))["logs"])
+            deleted = await LogService.delete_message_logs(datetime.now() - timedelta(days=1))
+            page = await LogService.get_message_logs(q="天气")
+            return triggers, before, deleted, page["search_mode"], sorted(log["message_content"] for log in page["logs"])
+        finally:
+            await close_database()
+
+    triggers, before, deleted, mode, after = run(scenario())
+    assert triggers == []
+    assert before == ["单条天气消息", "新的天气消息", "旧的天气消息"]
+    assert deleted == 1
+    assert mode == "fulltext"
+    assert after == ["单条天气消息", "新的天气消息"]
@@ -0,0 +1,63 @@
+"""
+插件使用记录：写回失败时积压有上限，且不再反复提前写回
+"""
+from sqlalchemy import func, select
+
+from conftest import run
+from core.database import init_database, close_database, get_db_session
+from core.flusher import _flushers
+from modules.plugin import usage_recorder
+from modules.plugin.models import Plugin, PluginUsageLog
+from modules.plugin.usage_recorder import PluginUsageRecorder
+
+
+def test_failed_flush_backlog_is_capped(workdir, monkeypatch):
+    attempts = []
+    original = usage_recorder.PluginService.add_usage_logs_bulk
+
+    async def failing(rows, session=None):
+        attempts.append(len(rows))
+        raise RuntimeError("database is locked")
+
+    async def scenario():
+        await init_database()
+        recorder = PluginUsageRecorder()
+        try:
+            async with get_db_session() as session:
+                session.add(Plugin(plugin_name="echo", usage_count=0))
+                await session.commit()
+
+            recorder.configure({"flush_interval": 3600, "max_pending": 2, "max_backlog": 3})
+            monkeypatch.setattr(usage_recorder.PluginService, "add_usage_logs_bulk", failing)
+            for i in range(2):
+                recorder.record("echo", str(i))
+            await recorder._flush_task
+
+            # 上次写回失败：之后的使用不再触发提前写回，积压丢弃最早的日志
+            for i in range(2, 6):
+                recorder.record("echo", str(i))
+            assert recorder._flush_task.done()
+            stats = recorder.get_stats()
+
+            monkeypatch.setattr(usage_recorder.PluginService, "add_usage_logs_bulk", original)
+            await recorder.flush_now()
+            async with get_db_session() as session:
+                users = (await session.execute(select(PluginUsageLog.user_id).order_by(PluginUsageLog.id))).scalars().all()
+                usage_count = (await session.execute(select(Plugin.usage_count))).scalar_one()
+                log_total = (await session.execute(select(func.count(PluginUsageLog.id)))).scalar_one()
+            return stats, users, usage_count, log_total, recorder.get_stats()
+        finally:
+            await recorder.stop()
+            _flushers.remove(recorder)
+            await close_database()
+
+    stats, users, usage_count, log_total, final = run(scenario())
+    assert attempts == [2]
+    assert stats["pending"] == 3
+    assert stats["dropped"] == 3
+    assert stats["retrying"] is True
+    assert users == ["3", "4", "5"]
+    assert log_total == 3
+    # 使用次数按插件累计，丢弃日志不影响计数
+    assert usage_count == 6
+    assert final["retrying"] is False
@@ -77,7 +77,7 @@ class LogsManager {
         }
 
         // 日期输入框回车搜索
-        ['#messageGroupId', '#messageUserId', '#messageStartDate', '#messageEndDate'].forEach(selector => {
+        ['#messageGroupId', '#messageUserId', '#messageKeyword', '#messageStartDate', '#messageEndDate'].forEach(selector => {
             const element = document.querySelector(selector);
             if (element) {
                 element.addEventListener('keypress', (e) => {
@@ -133,6 +133,7 @@ class LogsManager {
     getMessageLogsSearchParams() {
         const groupIdInput = document.getElementById('messageGroupId');
         const userIdInput = document.getElementById('messageUserId');
+        const keywordInput = document.getElementById('messageKeyword');
         const startDateInput = document.getElementById('messageStartDate');
         const endDateInput = document.getElementById('messageEndDate');
 
@@ -149,6 +150,10 @@ class LogsManager {
             params.user_id = userIdInput.value.trim();
         }
 
+        if (keywordInput && keywordInput.value.trim()) {
+            params.q = keywordInput.value.trim();
+        }
+
         if (startDate) {
             params.start_time = new Date(startDate + 'T00:00:00').toISOString();
         }
@@ -334,6 +339,8 @@ class LogsManager {
                 const groupId = log.group_id || '--';
                 const userName = log.user_name || log.user_id || '未知用户';
                 const messageContent = log.message_content || '';
+                // 搜索结果显示命中片段，高亮标记在转义后替换
+                const displayContent = log.snippet ? this.highlightSnippet(log.snippet) : this.escapeHtml(messageContent);
                 const timestamp = log.timestamp ? new Date(log.timestamp).toLocaleString() : '--';
 
                 row.innerHTML = `
@@ -341,7 +348,7 @@ class LogsManager {
                     <td>${this.escapeHtml(groupId)}</td>
                     <td>${this.escapeHtml(userName)}</td>
                     <td class="text-truncate" style="max-width: 300px;" title="${this.escapeHtml(messageContent)}">
-                        ${this.escapeHtml(messageContent)}
+                        ${displayContent}
                     </td>
                 `;
 
@@ -506,6 +513,12 @@ class LogsManager {
     }
 
     // 工具方法
+    highlightSnippet(snippet) {
+        return this.escapeHtml(snippet)
+            .replace(/\u0002/g, '<mark>')
+            .replace(/\u0003/g, '</mark>');
+    }
+
     escapeHtml(unsafe) {
         if (unsafe === null || unsafe === undefined) return '';
         return unsafe
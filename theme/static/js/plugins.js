@@ -158,6 +158,8 @@ class PluginsManager {
                 const description = plugin.description || '暂无描述';
                 const isEnabled = plugin.is_global_enabled !== false;
                 const isSafe = plugin.is_safe !== false;
+                const usageCount = plugin.usage_count || 0;
+                const performance = plugin.performance;
 
                 row.innerHTML = `
                     <td>
@@ -176,6 +178,8 @@ class PluginsManager {
                             '<span class="badge bg-danger">已禁用</span>'
                         }
                     </td>
+                    <td>${usageCount}</td>
+                    <td>${this.renderPerformanceSummary(performance)}</td>
                     <td>
                         <div class="btn-group btn-group-sm">
                             <button class="btn btn-outline-primary" onclick="pluginsManager.viewPluginDetail('${this.escapeHtml(pluginName)}')" title="查看详情">
@@ -199,10 +203,22 @@ class PluginsManager {
                 tbody.appendChild(row);
             });
         } else {
-            tbody.innerHTML = '<tr><td colspan="7" class="text-center text-muted">暂无插件数据</td></tr>';
+            tbody.innerHTML = '<tr><td colspan="9" class="text-center text-muted">暂无插件数据</td></tr>';
         }
     }
 
+    renderPerformanceSummary(performance) {
+        if (!performance) return '<span class="text-muted">--</span>';
+
+        const p95 = performance.p95_ms;
+        const level = p95 >= 1000 ? 'bg-danger' : p95 >= 100 ? 'bg-warning' : 'bg-success';
+        return `
+            <span class="text-muted small">${performance.calls} 次</span>
+            <span class="badge ${level}" title="P50 ${performance.p50_ms}ms / P99 ${performance.p99_ms}ms">P95 ${p95}ms</span>
+            ${performance.errors ? `<span class="badge bg-danger" title="异常次数">${performance.errors} 异常</span>` : ''}
+        `;
+    }
+
     renderPagination(total, page, pageSize) {
         const pagination = document.getElementById('pagination');
         if (!pagination) return;
@@ -274,6 +290,14 @@ class PluginsManager {
                 // 实际应该从API获取详细信息
             };
 
+            // 执行耗时统计
+            const response = await fetch(`/api/plugins/${encodeURIComponent(pluginName)}/performance`, {
+                credentials: 'include'
+            });
+            if (response.ok) {
+                pluginDetail.performance = await response.json();
+            }
+
             this.renderPluginDetailModal(pluginDetail);
         } catch (error) {
             console.error('Failed to load plugin detail:', error);
@@ -309,6 +333,7 @@ class PluginsManager {
                     </table>
                 </div>
             </div>
+            ${this.renderPerformanceDetail(pluginDetail.performance)}
             ${pluginDetail.description ? `
             <div class="row mt-3">
                 <div class="col-12">
@@ -322,6 +347,43 @@ class PluginsManager {
         new bootstrap.Modal(document.getElementById('pluginDetailModal')).show();
     }
 
+    renderPerformanceDetail(performance) {
+        if (!performance || !performance.calls) {
+            return '<div class="row mt-3"><div class="col-12"><h6>执行耗时</h6><p class="text-muted">暂无执行记录</p></div></div>';
+        }
+
+        const rows = performance.matchers.map(item => `
+            <tr>
+                <td><code>${this.escapeHtml(item.matcher)}</code></td>
+                <td>${item.calls}</td>
+                <td>${item.errors}</td>
+                <td>${item.avg_ms}</td>
+                <td>${item.p50_ms}</td>
+                <td>${item.p95_ms}</td>
+                <td>${item.p99_ms}</td>
+                <td>${item.max_ms}</td>
+            </tr>
+        `).join('');
+
+        return `
+            <div class="row mt-3">
+                <div class="col-12">
+                    <h6>执行耗时（毫秒）</h6>
+                    <p class="small text-muted">
+                        共执行 ${performance.calls} 次，异常 ${performance.errors} 次，
+                        P50 ${performance.p50_ms} / P95 ${performance.p95_ms} / P99 ${performance.p99_ms}
+                    </p>
+                    <table class="table table-sm">
+                        <thead>
+                            <tr><th>Matcher</th><th>次数</th><th>异常</th><th>平均</th><th>P50</th><th>P95</th><th>P99</th><th>最大</th></tr>
+                        </thead>
+                        <tbody>${rows}</tbody>
+                    </table>
+                </div>
+            </div>
+        `;
+    }
+
     showGroupSettings(pluginName) {
         const pluginNameInput = document.getElementById('settingsPluginName');
         const groupIdInput = document.getElementById('settingsGroupId');
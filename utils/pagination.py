@@ -0,0 +1,98 @@
+"""
+游标分页 - 按 (排序键, id) 定位下一页，避免深分页时 OFFSET 扫描前面的所有行
+
+游标是不透明字符串（base64 编码的 JSON），包含排序方式签名和最后一行的排序键值。
+排序列必须不为空（NULL 无法参与行值比较），并应有以 (排序列..., id) 开头的复合索引，
+这样排序和游标定位都直接走索引，不需要扫描整表后排序。
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, literal, or_, tuple_
+from sqlalchemy.sql import Select
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析，或与当前排序方式不匹配"""
+
+
+class SortKey(NamedTuple):
+    column: Any  # ORM 列（NOT NULL）
+    descending: bool = True
+
+    def value_of(self, row) -> Any:
+        return getattr(row, self.column.key)
+
+
+def _signature(keys: Sequence[SortKey]) -> str:
+    return ",".join(f"{key.column.key}:{'desc' if key.descending else 'asc'}" for key in keys)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(keys: Sequence[SortKey], row) -> str:
+    """根据某一行的排序键生成游标"""
+    payload = {"s": _signature(keys), "v": [_encode_value(key.value_of(row)) for key in keys]}
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(keys: Sequence[SortKey], cursor: str) -> List[Any]:
+    """解析游标，返回排序键值"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+        values = [_decode_value(value) for value in payload["v"]]
+        signature = payload["s"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("无效的分页游标") from e
+
+    if signature != _signature(keys) or len(values) != len(keys):
+        raise InvalidCursor("分页游标与当前排序方式不匹配")
+    return values
+
+
+def apply_cursor(query: Select, keys: Sequence[SortKey], cursor: Optional[str] = None) -> Select:
+    """按排序键排序；传入游标时只取游标之后的行"""
+    query = query.order_by(*[
+        key.column.desc() if key.descending else key.column.asc() for key in keys
+    ])
+    if not cursor:
+        return query
+
+    # 按列类型绑定参数，保证与库中存储格式（如 DateTime 字符串）一致
+    values = [literal(value, key.column.type) for key, value in zip(keys, decode_cursor(keys, cursor))]
+    if len({key.descending for key in keys}) == 1:
+        # 方向一致时使用行值比较，SQLite 可以直接在 (排序列..., id) 索引上定位
+        expressions = tuple_(*[key.column for key in keys])
+        return query.where(expressions < tuple_(*values) if keys[0].descending else expressions > tuple_(*values))
+
+    # 方向混合时展开为 (k1 > v1) OR (k1 = v1 AND k2 > v2) ...
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [keys[j].column == values[j] for j in range(i)]
+        beyond = key.column < values[i] if key.descending else key.column > values[i]
+        clauses.append(and_(*equal, beyond))
+    return query.where(or_(*clauses))
+
+
+def split_page(rows: Sequence[Any], keys: Sequence[SortKey], page_size: int) -> Tuple[List[Any], Optional[str]]:
+    """rows 需多查询一行（limit page_size + 1），据此判断是否还有下一页"""
+    rows = list(rows)
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(keys, rows[-1])
@@ -19,6 +19,9 @@ async def auth_middleware(request: Request):
     if not session_info:
         return RedirectResponse(url="/login")
 
+    # 供 login_required 等后续处理复用，避免重复验证
+    request.state.user = session_info
+
 
 def register_web_routes(app: FastAPI):
     """注册所有Web路由"""